@@ -0,0 +1,241 @@
+"""
+Control de admisión: límite de peticiones concurrentes por grupo de rutas.
+
+Cada grupo (`reads`, `writes`, `bulk`, `auth`) tiene un límite de peticiones en curso
+y una cola de espera acotada con un tiempo máximo. Una petición que no cabe en
+la cola, o que no consigue lugar antes de `max_wait`, recibe enseguida un 503
+con `Retry-After` en lugar de sumarse a la cola del pool de conexiones hasta
+que todo vence a la vez.
+
+Las lecturas públicas y las escrituras tienen grupos separados: una ráfaga de
+POST /orders/ no deja sin lugar a los GET baratos. El grupo de una ruta sale
+de ADMISSION_ROUTES y, si no figura ahí, del método: login y registro (bcrypt,
+cientos de ms cada uno) van a `auth` para no ocupar los lugares de los pedidos. Los límites se cambian en
+caliente con PUT /admin/admission/{pool} (solo con una key de operador).
+"""
+import asyncio
+import json
+import math
+import time
+from collections import deque
+from app import metrics
+from app.settings import settings
+
+READS = "reads"
+WRITES = "writes"
+BULK = "bulk"
+AUTH = "auth"
+
+SAFE_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+# Nunca se rechazan: monitoreo, documentación y el ajuste de los límites
+EXEMPT_ROUTES = frozenset({"/", "/metrics", "/docs", "/redoc", "/openapi.json"})
+EXEMPT_PREFIXES = ("/admin/",)
+
+shed_total = metrics.registry.counter(
+    "admission_shed_total", "Peticiones rechazadas con 503 por grupo y motivo (queue_full, timeout).",
+    ("pool", "reason"),
+)
+queue_wait = metrics.registry.histogram(
+    "admission_queue_wait_seconds", "Espera en la cola de admisión de las peticiones admitidas.", ("pool",)
+)
+
+
+def parse_routes(spec: str) -> dict[str, str]:
+    """`"/auth/*=auth, /orders/batch=bulk"` -> {"/auth/*": "auth", "/orders/batch": "bulk"}"""
+    routes = {}
+    for part in spec.split(","):
+        if "=" in part:
+            path, pool = part.split("=", 1)
+            routes[path.strip()] = pool.strip()
+    return routes
+
+
+# Ruta -> grupo; `/prefijo/*` cubre todas las rutas que empiezan así
+ROUTES = parse_routes(settings.ADMISSION_ROUTES)
+
+
+class Shed(Exception):
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class ConcurrencyLimiter:
+    """
+    Semáforo con cola FIFO acotada y espera máxima.
+
+    Al liberar un lugar se le pasa directamente al primero de la cola, así
+    una petición nueva no se adelanta a las que ya esperaban.
+    """
+
+    def __init__(self, name: str, limit: int, queue_size: int, max_wait: float):
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.max_wait = max_wait
+        self.active = 0
+        self._waiters: deque[asyncio.Future] = deque()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self) -> float:
+        """Ocupa un lugar y devuelve los segundos de espera; lanza Shed si no lo consigue."""
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            return 0.0
+        if len(self._waiters) >= self.queue_size:
+            raise Shed("queue_full")
+        start = time.perf_counter()
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.max_wait)
+        except BaseException as exc:
+            if waiter.done() and not waiter.cancelled():
+                # El lugar llegó justo al vencer o al cancelarse: se devuelve
+                self.release()
+            else:
+                waiter.cancel()
+                self._waiters.remove(waiter)
+            if isinstance(exc, asyncio.TimeoutError):
+                raise Shed("timeout") from None
+            raise
+        return time.perf_counter() - start
+
+    def release(self) -> None:
+        if self.active <= self.limit:
+            while self._waiters:
+                waiter = self._waiters.popleft()
+                if not waiter.done():
+                    # El lugar pasa al siguiente: `active` no cambia
+                    waiter.set_result(None)
+                    return
+        self.active -= 1
+
+    def configure(self, limit: int | None = None, queue_size: int | None = None, max_wait: float | None = None) -> None:
+        """
+        Cambia los límites en caliente. Al subir `limit` entran enseguida los
+        que esperaban; al bajarlo, las peticiones en curso terminan y los
+        lugares sobrantes no se vuelven a entregar.
+        """
+        if limit is not None:
+            self.limit = limit
+        if queue_size is not None:
+            self.queue_size = queue_size
+        if max_wait is not None:
+            self.max_wait = max_wait
+        while self.active < self.limit and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.active += 1
+                waiter.set_result(None)
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit, "queue_size": self.queue_size, "max_wait": self.max_wait,
+            "active": self.active, "queued": self.queued,
+        }
+
+
+def classify(method: str, path: str, routes: dict[str, str] = ROUTES) -> str | None:
+    """
+    Grupo de una petición, o None si no pasa por el control de admisión.
+
+    Gana la ruta exacta y después el prefijo más largo de `routes`; sin
+    coincidencias, los métodos seguros van a `reads` y el resto a `writes`.
+    """
+    if path in EXEMPT_ROUTES or path.startswith(EXEMPT_PREFIXES):
+        return None
+    pool = routes.get(path)
+    if pool is not None:
+        return pool
+    prefixes = [route for route in routes if route.endswith("*") and path.startswith(route[:-1])]
+    if prefixes:
+        return routes[max(prefixes, key=len)]
+    return READS if method in SAFE_METHODS else WRITES
+
+
+class AdmissionController:
+    def __init__(
+        self, pools: dict[str, ConcurrencyLimiter], retry_after: float, routes: dict[str, str] | None = None
+    ):
+        self.pools = pools
+        self.retry_after = retry_after
+        self.routes = routes or {}
+        unknown = set(self.routes.values()) - set(pools)
+        if unknown:
+            # Una ruta con un grupo inexistente quedaría sin límite
+            raise ValueError(f"Grupos de admisión desconocidos en las rutas: {sorted(unknown)}")
+
+    def classify(self, method: str, path: str) -> str | None:
+        return classify(method, path, self.routes)
+
+    def stats(self) -> dict:
+        return {name: pool.stats() for name, pool in self.pools.items()}
+
+
+class AdmissionMiddleware:
+    """Middleware ASGI puro: admite, encola o rechaza con 503 según el grupo de la ruta."""
+
+    def __init__(self, app, controller: AdmissionController):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        name = self.controller.classify(scope["method"], scope["path"]) if scope["type"] == "http" else None
+        pool = self.controller.pools.get(name)
+        if pool is None:
+            await self.app(scope, receive, send)
+            return
+        try:
+            waited = await pool.acquire()
+        except Shed as shed:
+            shed_total.inc(name, shed.reason)
+            await self._reject(send)
+            return
+        queue_wait.observe(waited, name)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            pool.release()
+
+    async def _reject(self, send) -> None:
+        body = json.dumps({"detail": "Servidor saturado, reintente más tarde"}).encode()
+        await send({"type": "http.response.start", "status": 503, "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(math.ceil(self.controller.retry_after)).encode()),
+        ]})
+        await send({"type": "http.response.body", "body": body})
+
+
+# Controlador de la aplicación (lo registra app.main); se ajusta en caliente desde /admin
+controller = AdmissionController(
+    {
+        READS: ConcurrencyLimiter(
+            READS, settings.ADMISSION_READS_LIMIT, settings.ADMISSION_READS_QUEUE, settings.ADMISSION_READS_MAX_WAIT
+        ),
+        WRITES: ConcurrencyLimiter(
+            WRITES, settings.ADMISSION_WRITES_LIMIT, settings.ADMISSION_WRITES_QUEUE, settings.ADMISSION_WRITES_MAX_WAIT
+        ),
+        BULK: ConcurrencyLimiter(
+            BULK, settings.ADMISSION_BULK_LIMIT, settings.ADMISSION_BULK_QUEUE, settings.ADMISSION_BULK_MAX_WAIT
+        ),
+        AUTH: ConcurrencyLimiter(
+            AUTH, settings.ADMISSION_AUTH_LIMIT, settings.ADMISSION_AUTH_QUEUE, settings.ADMISSION_AUTH_MAX_WAIT
+        ),
+    },
+    retry_after=settings.ADMISSION_RETRY_AFTER,
+    routes=ROUTES,
+)
+
+metrics.registry.callback(
+    "admission_pool", "Estado de los grupos de admisión (limit, active, queued...).", ("pool", "stat"),
+    lambda: {
+        (name, stat): value
+        for name, pool in controller.pools.items()
+        for stat, value in pool.stats().items()
+    },
+)
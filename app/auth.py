@@ -1,8 +1,9 @@
 # app/auth.py
 
+import time
 from datetime import datetime, timedelta, timezone
 from jose import jwt, JWTError
-from passlib.context import CryptContext
+from app.cache import TTLCache, MISSING
 from app.settings import settings
 
 # Exponemos las constantes para los tests
@@ -17,5 +18,78 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None):
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 
-# Hasher de contraseñas
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+def create_user_token(user, expires_delta: timedelta | None = None):
+    """
+    Genera el JWT de un usuario incluyendo su id (`uid`) y su versión de
+    token (`ver`), que permiten validarlo sin cargar el usuario de la base.
+    """
+    return create_access_token(
+        data={"sub": user.username, "uid": user.id, "ver": user.token_version},
+        expires_delta=expires_delta,
+    )
+
+
+# Tokens ya decodificados y versiones vigentes de token por usuario
+token_cache = TTLCache(maxsize=settings.AUTH_TOKEN_CACHE_SIZE, ttl=settings.AUTH_TOKEN_CACHE_TTL)
+user_version_cache = TTLCache(maxsize=settings.AUTH_USER_CACHE_SIZE, ttl=settings.AUTH_USER_VERSION_TTL)
+
+
+def decode_access_token(token: str) -> dict:
+    """
+    Decodifica y valida un JWT. Lanza JWTError si no es válido.
+
+    El resultado se cachea por el texto del token hasta su expiración, así un
+    token repetido no vuelve a pasar por la verificación de firma.
+    """
+    payload = token_cache.get(token)
+    if payload is not MISSING:
+        return payload
+    payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    ttl = settings.AUTH_TOKEN_CACHE_TTL
+    if "exp" in payload:
+        ttl = min(ttl, payload["exp"] - time.time())
+    if ttl > 0:
+        token_cache.set(token, payload, ttl=ttl)
+    return payload
+
+
+class TokenUser:
+    """Usuario autenticado a partir de los claims del token, sin consultar la base."""
+
+    __slots__ = ("id", "username", "token_version")
+
+    def __init__(self, id: int, username: str, token_version: int):
+        self.id = id
+        self.username = username
+        self.token_version = token_version
+
+
+def invalidate_user(user_id: int) -> None:
+    """Olvida la versión de token cacheada de un usuario (al modificarlo)."""
+    user_version_cache.pop(user_id)
+
+
+# API Keys válidas (key -> user_id) e inválidas recientes
+api_key_cache = TTLCache(maxsize=settings.API_KEY_CACHE_SIZE, ttl=settings.API_KEY_CACHE_TTL)
+api_key_negative_cache = TTLCache(
+    maxsize=settings.API_KEY_CACHE_SIZE, ttl=settings.API_KEY_NEGATIVE_CACHE_TTL
+)
+api_key_db_lookups = 0
+
+
+def invalidate_api_key(key: str) -> None:
+    """Olvida una API Key en ambas caches (al revocarla o crearla)."""
+    api_key_cache.pop(key)
+    api_key_negative_cache.pop(key)
+
+
+def api_key_cache_stats() -> dict:
+    avoided = api_key_cache.hits + api_key_negative_cache.hits
+    total = avoided + api_key_db_lookups
+    return {
+        "valid": api_key_cache.stats(),
+        "invalid": api_key_negative_cache.stats(),
+        "db_lookups": api_key_db_lookups,
+        "db_lookups_avoided": avoided,
+        "hit_rate": avoided / total if total else 0.0,
+    }
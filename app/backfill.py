@@ -0,0 +1,74 @@
+"""
+Completa `order_items.unit_price` y `orders.subtotal`/`orders.total` en pedidos
+creados antes de que se guardaran esos valores.
+
+    python -m app.backfill --chunk-size 1000
+
+Recorre los pedidos sin total por ID en tramos de `chunk-size`, con una
+transacción por tramo: se puede interrumpir y volver a lanzar, y retoma por los
+pedidos que aún no tienen total. El precio histórico no se conoce, así que los
+ítems sin precio toman el precio actual del producto.
+"""
+import argparse
+import asyncio
+from sqlalchemy import Numeric, cast, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app import migrations, models
+
+
+async def backfill_chunk(db: AsyncSession, after_id: int, chunk_size: int) -> int | None:
+    """
+    Completa los precios de hasta `chunk_size` pedidos sin total con ID mayor a
+    `after_id` y hace commit. Devuelve el último ID procesado o None si no quedan.
+    """
+    Order, OrderItem, Product = models.Order, models.OrderItem, models.Product
+    result = await db.execute(
+        select(Order.id)
+        .where(Order.total.is_(None), Order.id > after_id)
+        .order_by(Order.id)
+        .limit(chunk_size)
+    )
+    ids = result.scalars().all()
+    if not ids:
+        return None
+    first, last = ids[0], ids[-1]
+
+    await db.execute(
+        update(OrderItem)
+        .where(OrderItem.order_id.between(first, last), OrderItem.unit_price.is_(None))
+        .values(unit_price=select(Product.price).where(Product.id == OrderItem.product_id).scalar_subquery())
+    )
+    subtotal = (
+        select(func.coalesce(func.round(cast(func.sum(OrderItem.quantity * OrderItem.unit_price), Numeric), 2), 0))
+        .where(OrderItem.order_id == Order.id)
+        .scalar_subquery()
+    )
+    await db.execute(
+        update(Order)
+        .where(Order.id.between(first, last), Order.total.is_(None))
+        .values(subtotal=subtotal, total=subtotal)
+    )
+    await db.commit()
+    return last
+
+
+async def run(chunk_size: int) -> int:
+    """Aplica las migraciones pendientes y completa todos los pedidos. Devuelve la cantidad de tramos."""
+    applied = await migrations.migrate(models.engine)
+    if applied:
+        print(f"Migraciones aplicadas: {applied}")
+    processed, after_id = 0, 0
+    async with models.SessionLocal() as db:
+        while (last := await backfill_chunk(db, after_id, chunk_size)) is not None:
+            processed += 1
+            after_id = last
+            print(f"Tramo {processed}: pedidos hasta el ID {last}")
+    await models.engine.dispose()
+    return processed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    args = parser.parse_args()
+    asyncio.run(run(args.chunk_size))
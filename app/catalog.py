@@ -0,0 +1,134 @@
+import asyncio
+import hashlib
+import logging
+import time
+from bisect import bisect_right
+from app import crud
+from app.models import SessionLocal
+from app.responses import dumps
+from app.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Páginas renderizadas que se guardan por snapshot (la primera es la más pedida)
+MAX_CACHED_PAGES = 64
+
+
+def product_json(product) -> bytes:
+    """Un producto (fila id, name, price) con el JSON exacto de `ProductResponse`."""
+    return dumps({"id": product.id, "name": product.name, "price": float(product.price)})
+
+
+class CatalogSnapshot:
+    """
+    Copia inmutable del catálogo con cada producto ya serializado a JSON.
+
+    Las páginas se arman concatenando bytes y se guardan junto con su ETag,
+    que es un hash del contenido: dos procesos con el mismo catálogo generan
+    el mismo ETag.
+    """
+
+    __slots__ = ("version", "ids", "rows", "built_at", "_pages")
+
+    def __init__(self, version: int, ids: tuple[int, ...], rows: tuple[bytes, ...]):
+        self.version = version
+        self.ids = ids
+        self.rows = rows
+        self.built_at = time.monotonic()
+        self._pages: dict[tuple, tuple[bytes, str, int | None]] = {}
+
+    def page(self, after_id: int | None, limit: int) -> tuple[bytes, str, int | None]:
+        """Devuelve (cuerpo JSON, ETag, cursor siguiente) de una página."""
+        key = (after_id, limit)
+        cached = self._pages.get(key)
+        if cached is not None:
+            return cached
+        start = bisect_right(self.ids, after_id) if after_id is not None else 0
+        end = start + limit
+        body = b"[" + b",".join(self.rows[start:end]) + b"]"
+        etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+        next_cursor = self.ids[end - 1] if end < len(self.ids) else None
+        page = (body, etag, next_cursor)
+        if len(self._pages) < MAX_CACHED_PAGES:
+            self._pages[key] = page
+        return page
+
+
+class Catalog:
+    """
+    Mantiene el snapshot vigente del catálogo.
+
+    El snapshot se reconstruye en el camino de escritura (`refresh`) con una
+    sesión propia: la lectura no consulta la base salvo en el arranque en frío.
+    El snapshot nuevo se arma aparte y se publica con una sola asignación, así
+    las lecturas nunca esperan a una reconstrucción: siguen con el anterior
+    hasta que el nuevo está listo. Solo esperan si todavía no hay ninguno.
+    """
+
+    def __init__(self, session_factory):
+        self.session_factory = session_factory
+        self._snapshot: CatalogSnapshot | None = None
+        self._builds = 0
+        self._cold_start = asyncio.Lock()
+
+    @property
+    def version(self) -> int:
+        return self._snapshot.version if self._snapshot is not None else 0
+
+    async def _load(self, version: int) -> CatalogSnapshot:
+        ids: list[int] = []
+        rows: list[bytes] = []
+        after_id = None
+        chunk = settings.PRODUCTS_STREAM_CHUNK_SIZE
+        async with self.session_factory() as db:
+            while True:
+                products = await crud.list_products(db, after_id=after_id, limit=chunk)
+                for product in products:
+                    ids.append(product.id)
+                    rows.append(product_json(product))
+                if len(products) < chunk:
+                    break
+                after_id = ids[-1]
+        return CatalogSnapshot(version, tuple(ids), tuple(rows))
+
+    async def get(self) -> CatalogSnapshot:
+        snapshot = self._snapshot
+        if snapshot is not None:
+            return snapshot
+        # Arranque en frío: una sola construcción, las demás lecturas la esperan
+        async with self._cold_start:
+            return self._snapshot or await self.refresh()
+
+    async def refresh(self) -> CatalogSnapshot:
+        """
+        Construye un snapshot con el catálogo actual y lo publica. Si mientras
+        tanto terminó una reconstrucción que empezó después, gana esa: también
+        ve los cambios confirmados antes de esta llamada.
+        """
+        self._builds += 1
+        snapshot = await self._load(self._builds)
+        current = self._snapshot
+        if current is None or current.version < snapshot.version:
+            self._snapshot = snapshot
+            return snapshot
+        return current
+
+    def reset(self) -> None:
+        self._builds = 0
+        self._snapshot = None
+
+
+catalog = Catalog(SessionLocal)
+
+
+async def refresh_periodically(interval: float) -> None:
+    """
+    Recarga el snapshot cada `interval` segundos, para recoger productos creados
+    por otras instancias de la aplicación.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await catalog.refresh()
+        except Exception:
+            logger.exception("No se pudo recargar el snapshot del catálogo")
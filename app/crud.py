@@ -1,40 +1,42 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy.exc import IntegrityError
-from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy import ARRAY, Integer, any_, cast, delete, insert, literal, tuple_, update, Row
 from sqlalchemy.orm import selectinload
 from app import models, schemas
-from typing import List
-from passlib.context import CryptContext
+from typing import AsyncIterator, List, Sequence
+import base64
+import binascii
+import logging
 import uuid
-from app.queue import publish_order_created
+from datetime import date, datetime
+from app import outbox, auth, rollups
+from app.hashing import hasher
 from fastapi import HTTPException
 
-
-#Hasher para contraseñas
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+logger = logging.getLogger(__name__)
 
 # AUTH 
 
-def hash_password(password: str) -> str:
+async def hash_password(password: str) -> str:
     """Hashea una contraseña usando bcrypt."""
-    return pwd_context.hash(password)
+    return await hasher.hash(password)
 
 
 async def verify_user_password(db_user: models.User, plain_password: str) -> bool:
     try:
         if not db_user.hashed_password:
             return False
-        return pwd_context.verify(plain_password, db_user.hashed_password)
-    except Exception as e:
-        print("Error al verificar contraseña:", e)
+        return await hasher.verify(plain_password, db_user.hashed_password)
+    except Exception:
+        logger.warning("Error al verificar contraseña", exc_info=True)
         return False
     
 #  USERS 
 
 async def create_user(db: AsyncSession, user: schemas.UserCreate) -> models.User:
     """Crea un nuevo usuario en la base de datos."""
-    hashed_pw = hash_password(user.password)
+    hashed_pw = await hash_password(user.password)
     new_user = models.User(username=user.username, hashed_password=hashed_pw)
     db.add(new_user)
     await db.commit()
@@ -51,6 +53,21 @@ async def get_user_by_id(db: AsyncSession, user_id: int) -> models.User | None:
     result = await db.execute(select(models.User).where(models.User.id == user_id))
     return result.scalars().first()
     
+async def get_user_token_version(db: AsyncSession, user_id: int) -> int | None:
+    """Obtiene solo la versión de token de un usuario (None si no existe)."""
+    result = await db.execute(select(models.User.token_version).where(models.User.id == user_id))
+    return result.scalar_one_or_none()
+
+async def bump_token_version(db: AsyncSession, user_id: int) -> None:
+    """Invalida todos los tokens emitidos para un usuario."""
+    await db.execute(
+        update(models.User)
+        .where(models.User.id == user_id)
+        .values(token_version=models.User.token_version + 1)
+    )
+    await db.commit()
+    auth.invalidate_user(user_id)
+    
 #  API KEYS 
 
 async def create_api_key(db: AsyncSession, user_id: int) -> models.ApiKey:
@@ -60,7 +77,15 @@ async def create_api_key(db: AsyncSession, user_id: int) -> models.ApiKey:
     db.add(api_key)
     await db.commit()
     await db.refresh(api_key)
+    auth.invalidate_api_key(key)
     return api_key
+
+async def revoke_api_key(db: AsyncSession, key: str) -> bool:
+    """Revoca una API Key y la saca de la cache. Retorna False si no existía."""
+    result = await db.execute(delete(models.ApiKey).where(models.ApiKey.key == key))
+    await db.commit()
+    auth.invalidate_api_key(key)
+    return result.rowcount > 0
     
 async def get_api_key(db: AsyncSession, key: str) -> models.ApiKey | None:
     """Obtiene una API Key a partir de su valor."""
@@ -91,10 +116,32 @@ async def create_customer(db: AsyncSession, customer: schemas.CustomerCreate) ->
     await db.refresh(new_customer)
     return new_customer
     
+async def existing_customer_emails(db: AsyncSession, emails: set[str]) -> set[str]:
+    """Devuelve cuáles de los emails ya están registrados."""
+    result = await db.execute(
+        select(models.Customer.email).where(models.Customer.email.in_(list(emails)))
+    )
+    return set(result.scalars().all())
+
 async def get_customer_by_id(db: AsyncSession, customer_id: int) -> models.Customer | None:
     """Obtiene un cliente por su ID."""
     result = await db.execute(select(models.Customer).where(models.Customer.id == customer_id))
     return result.scalars().first()
+
+
+async def read_customer(db: AsyncSession, customer_id: int) -> dict | None:
+    """
+    Cliente como dict con las claves de `CustomerResponse`, listo para serializar.
+    Se leen columnas: no se crean entidades ni pasan por el identity map.
+    """
+    result = await db.execute(
+        select(models.Customer.id, models.Customer.full_name, models.Customer.email)
+        .where(models.Customer.id == customer_id)
+    )
+    row = result.first()
+    if row is None:
+        return None
+    return {"id": row.id, "full_name": row.full_name, "email": row.email}
  
 #  PRODUCTS 
 
@@ -110,50 +157,287 @@ async def create_product(db: AsyncSession, product: schemas.ProductCreate) -> mo
     await db.refresh(new_product)
     return new_product
     
-async def list_products(db: AsyncSession) -> List[models.Product]:
-    """Lista todos los productos disponibles."""
-    result = await db.execute(select(models.Product))
-    return result.scalars().all()
+async def existing_product_names(db: AsyncSession, names: set[str]) -> set[str]:
+    """Devuelve cuáles de los nombres de producto ya existen."""
+    result = await db.execute(
+        select(models.Product.name).where(models.Product.name.in_(list(names)))
+    )
+    return set(result.scalars().all())
+
+async def list_products(
+    db: AsyncSession, after_id: int | None = None, limit: int | None = None
+) -> Sequence[Row]:
+    """
+    Lista productos (id, name, price) ordenados por ID, como filas y no entidades.
+
+    Paginación por clave: `after_id` es el último ID de la página anterior.
+    """
+    query = select(models.Product.id, models.Product.name, models.Product.price).order_by(models.Product.id)
+    if after_id is not None:
+        query = query.where(models.Product.id > after_id)
+    if limit is not None:
+        query = query.limit(limit)
+    result = await db.execute(query)
+    return result.all()
+
+
+async def stream_products(
+    db: AsyncSession, after_id: int | None = None, chunk_size: int = 1000
+) -> AsyncIterator[Sequence[Row]]:
+    """
+    Recorre el catálogo con un cursor del lado del servidor y entrega los productos
+    en bloques de `chunk_size` filas.
+
+    Se leen columnas y no entidades, así las filas no quedan retenidas en el
+    identity map de la sesión y la memoria no crece con el tamaño del catálogo.
+    """
+    query = (
+        select(models.Product.id, models.Product.name, models.Product.price)
+        .order_by(models.Product.id)
+        .execution_options(yield_per=chunk_size)
+    )
+    if after_id is not None:
+        query = query.where(models.Product.id > after_id)
+    result = await db.stream(query)
+    async for rows in result.partitions():
+        yield rows
     
 #  ORDERS 
 
-async def create_order(db: AsyncSession, order: schemas.OrderCreate) -> models.Order:
+def _id_matches(db: AsyncSession, column, ids: list[int]):
+    """
+    Condición `column = ANY(:ids)` con un único parámetro array en Postgres:
+    el texto de la sentencia no cambia con la cantidad de ids y asyncpg reutiliza
+    el statement preparado. En otros motores se usa `IN (...)`.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        return column == any_(cast(literal(ids), ARRAY(Integer)))
+    return column.in_(ids)
+
+
+async def _validate_order_references(
+    db: AsyncSession, order: schemas.OrderCreate
+) -> dict[int, float]:
+    """
+    Comprueba en una sola consulta que existan el cliente y todos los productos del pedido.
+    Lanza HTTPException 400 indicando qué referencias no existen.
+
+    Returns:
+        El precio actual de cada producto del pedido, leído en la misma consulta.
+    """
+    product_ids = [item.product_id for item in order.items]
+    result = await db.execute(
+        select(models.Customer.id, models.Product.id, models.Product.price)
+        .select_from(models.Customer)
+        .outerjoin(models.Product, _id_matches(db, models.Product.id, product_ids))
+        .where(models.Customer.id == order.customer_id)
+    )
+    rows = result.all()
+    if not rows:
+        raise HTTPException(status_code=400, detail=f"No existe el cliente {order.customer_id}.")
+    prices = {product_id: price for _, product_id, price in rows if product_id is not None}
+    missing = set(product_ids) - prices.keys()
+    if missing:
+        raise HTTPException(status_code=400, detail=f"No existen los productos {sorted(missing)}.")
+    return prices
+
+
+def _order_subtotal(order: schemas.OrderCreate, prices: dict[int, float]) -> float:
+    return round(sum(prices[item.product_id] * item.quantity for item in order.items), 2)
+
+
+async def _insert_orders(
+    db: AsyncSession, orders: list[schemas.OrderCreate], prices: dict[int, float]
+) -> list[schemas.OrderResponse]:
+    """
+    Inserta pedidos ya validados, sus ítems y sus eventos de outbox con un
+    INSERT multi-fila por tabla. No hace commit.
+
+    Cada ítem guarda el precio unitario de `prices` y cada pedido su subtotal
+    y total, así el valor del pedido no cambia si luego cambia el precio.
+    Los pedidos se suman a los rollups de ventas en la misma transacción.
+    Las respuestas se arman con las filas de RETURNING, sin volver a leer.
+    """
+    subtotals = [_order_subtotal(order, prices) for order in orders]
+    # El orden de RETURNING debe coincidir con el de entrada para asociar cada id a su pedido
+    result = await db.execute(
+        insert(models.Order).returning(
+            models.Order.id, models.Order.created_at, sort_by_parameter_order=True
+        ),
+        [
+            # Sin impuestos ni descuentos por ahora: el total es el subtotal
+            {"customer_id": order.customer_id, "subtotal": subtotal, "total": subtotal}
+            for order, subtotal in zip(orders, subtotals)
+        ],
+    )
+    created = result.all()
+
+    # Cada fila trae order_id y product_id: aquí el orden de RETURNING no importa
+    result = await db.execute(
+        insert(models.OrderItem).returning(
+            models.OrderItem.id,
+            models.OrderItem.order_id,
+            models.OrderItem.product_id,
+            models.OrderItem.quantity,
+            models.OrderItem.unit_price,
+        ),
+        [
+            {
+                "order_id": order_id,
+                "product_id": item.product_id,
+                "quantity": item.quantity,
+                "unit_price": prices[item.product_id],
+            }
+            for (order_id, _), order in zip(created, orders)
+            for item in order.items
+        ],
+    )
+    items_by_order = _group_items(sorted(result.all()))
+
+    await db.execute(
+        insert(models.OutboxEvent),
+        [
+            {
+                "event_type": outbox.ORDER_CREATED,
+                "payload": {
+                    "order_id": order_id,
+                    "customer_id": order.customer_id,
+                    "total": subtotal,
+                    "items": [
+                        {
+                            "product_id": item.product_id,
+                            "quantity": item.quantity,
+                            "unit_price": prices[item.product_id],
+                        }
+                        for item in order.items
+                    ]
+                },
+            }
+            for (order_id, _), order, subtotal in zip(created, orders, subtotals)
+        ],
+    )
+    await rollups.record_orders(
+        db, [(created_at, order) for (_, created_at), order in zip(created, orders)], prices
+    )
+
+    return [
+        schemas.OrderResponse(
+            id=order_id,
+            customer_id=order.customer_id,
+            created_at=created_at,
+            subtotal=subtotal,
+            total=subtotal,
+            status=models.ORDER_PENDING,
+            items=items_by_order.get(order_id, []),
+        )
+        for (order_id, created_at), order, subtotal in zip(created, orders, subtotals)
+    ]
+
+
+def _group_items(rows) -> dict[int, list[schemas.OrderItemResponse]]:
+    """Agrupa filas (id, order_id, product_id, quantity, unit_price) por pedido."""
+    items_by_order: dict[int, list[schemas.OrderItemResponse]] = {}
+    for id, order_id, product_id, quantity, unit_price in rows:
+        items_by_order.setdefault(order_id, []).append(schemas.OrderItemResponse(
+            id=id, product_id=product_id, quantity=quantity, unit_price=unit_price
+        ))
+    return items_by_order
+
+
+async def create_order(db: AsyncSession, order: schemas.OrderCreate) -> schemas.OrderResponse:
     """
-    Crea un nuevo pedido y publica un mensaje en RabbitMQ.
+    Crea un nuevo pedido y registra el evento `order_created` en el outbox.
+
+    El cliente y los productos se validan antes de escribir, en la misma
+    consulta que obtiene los precios con los que se calcula el total. Los ítems se
+    insertan con un único INSERT multi-fila y la respuesta se arma con las filas
+    que devuelve RETURNING, sin volver a leer el pedido. El evento se escribe
+    en la misma transacción que el pedido; el relay del outbox lo publica en RabbitMQ.
 
     Args:
         db (AsyncSession): Sesión de base de datos.
         order (OrderCreate): Datos del pedido.
 
     Returns:
-        Order: Pedido creado.
+        OrderResponse: Pedido creado.
     """
-    new_order = models.Order(customer_id=order.customer_id)
-    db.add(new_order)
-    await db.flush()  
+    prices = await _validate_order_references(db, order)
+    [created] = await _insert_orders(db, [order], prices)
+    await db.commit()
+    outbox.notify()
+    return created
 
-    items = [
-        models.OrderItem(order_id=new_order.id, product_id=item.product_id, quantity=item.quantity)
-        for item in order.items
-    ]
-    db.add_all(items)
 
-    await db.commit()
+async def _existing_ids(db: AsyncSession, column, ids: set[int]) -> set[int]:
+    if not ids:
+        return set()
+    result = await db.execute(select(column).where(_id_matches(db, column, list(ids))))
+    return set(result.scalars().all())
 
-    #Solución al error MissingGreenlet
-    await db.refresh(new_order, attribute_names=["items"])
 
-    #Publicar en RabbitMQ
-    await publish_order_created({
-        "order_id": new_order.id,
-        "customer_id": new_order.customer_id,
-        "items": [
-            {"product_id": item.product_id, "quantity": item.quantity}
-            for item in order.items
-        ]
-    })
+async def _product_prices(db: AsyncSession, ids: set[int]) -> dict[int, float]:
+    """Precio actual de los productos que existan entre `ids`, en una consulta."""
+    if not ids:
+        return {}
+    result = await db.execute(
+        select(models.Product.id, models.Product.price)
+        .where(_id_matches(db, models.Product.id, list(ids)))
+    )
+    return dict(result.all())
+
 
-    return new_order
+async def create_orders_batch(
+    db: AsyncSession, orders: list[schemas.OrderCreate], chunk_size: int
+) -> schemas.OrderBatchResponse:
+    """
+    Crea muchos pedidos de una vez.
+
+    Valida todas las referencias con una consulta de clientes y otra de
+    productos (que trae también los precios) para todo el lote. Los pedidos válidos se escriben en
+    transacciones de `chunk_size` pedidos con INSERT multi-fila; un fallo en un
+    tramo no afecta a los demás. Cada pedido tiene su resultado o su error.
+    """
+    results: list[schemas.OrderBatchResult] = []
+    customers = await _existing_ids(db, models.Customer.id, {o.customer_id for o in orders})
+    prices = await _product_prices(db, {item.product_id for o in orders for item in o.items})
+
+    valid: list[tuple[int, schemas.OrderCreate]] = []
+    for index, order in enumerate(orders):
+        missing = sorted({item.product_id for item in order.items} - prices.keys())
+        if order.customer_id not in customers:
+            results.append(schemas.OrderBatchResult(
+                index=index, error=f"No existe el cliente {order.customer_id}."
+            ))
+        elif missing:
+            results.append(schemas.OrderBatchResult(
+                index=index, error=f"No existen los productos {missing}."
+            ))
+        else:
+            valid.append((index, order))
+
+    for start in range(0, len(valid), chunk_size):
+        chunk = valid[start:start + chunk_size]
+        try:
+            created = await _insert_orders(db, [order for _, order in chunk], prices)
+            await db.commit()
+        except SQLAlchemyError as e:
+            await db.rollback()
+            results.extend(
+                schemas.OrderBatchResult(index=index, error=f"Error al guardar el pedido: {type(e).__name__}")
+                for index, _ in chunk
+            )
+            continue
+        outbox.notify(len(created))
+        results.extend(
+            schemas.OrderBatchResult(index=index, order=response)
+            for (index, _), response in zip(chunk, created)
+        )
+
+    results.sort(key=lambda r: r.index)
+    created_count = sum(1 for r in results if r.order is not None)
+    return schemas.OrderBatchResponse(
+        created=created_count, failed=len(results) - created_count, results=results
+    )
 
 async def get_order_by_id(db: AsyncSession, order_id: int) -> models.Order | None:
     """Obtiene un pedido por su ID, incluyendo los ítems."""
@@ -163,3 +447,159 @@ async def get_order_by_id(db: AsyncSession, order_id: int) -> models.Order | Non
         .where(models.Order.id == order_id)
     )
     return result.scalars().first()
+
+
+async def read_order(db: AsyncSession, order_id: int) -> dict | None:
+    """
+    Pedido con sus ítems como dict con las claves de `OrderResponse`, listo
+    para serializar. Una sola consulta (LEFT JOIN con los ítems) y por columnas,
+    sin entidades.
+    """
+    result = await db.execute(
+        select(
+            models.Order.id, models.Order.customer_id, models.Order.created_at,
+            models.Order.subtotal, models.Order.total, models.Order.status,
+            models.OrderItem.id, models.OrderItem.product_id,
+            models.OrderItem.quantity, models.OrderItem.unit_price,
+        )
+        .outerjoin(models.OrderItem, models.OrderItem.order_id == models.Order.id)
+        .where(models.Order.id == order_id)
+        .order_by(models.OrderItem.id)
+    )
+    rows = result.all()
+    if not rows:
+        return None
+    id, customer_id, created_at, subtotal, total, status = rows[0][:6]
+    return {
+        "id": id,
+        "customer_id": customer_id,
+        "created_at": created_at,
+        "subtotal": subtotal,
+        "total": total,
+        "status": status,
+        "items": [
+            {"id": item_id, "product_id": product_id, "quantity": quantity, "unit_price": unit_price}
+            for *_, item_id, product_id, quantity, unit_price in rows
+            if item_id is not None
+        ],
+    }
+
+
+def encode_order_cursor(created_at: datetime, order_id: int) -> str:
+    """Cursor opaco con la posición (created_at, id) del último pedido de la página."""
+    raw = f"{created_at.isoformat()}|{order_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_order_cursor(cursor: str) -> tuple[datetime, int]:
+    """Inverso de `encode_order_cursor`. Lanza HTTPException 400 si el cursor no es válido."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, order_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(order_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=400, detail="Cursor inválido.")
+
+
+async def list_customer_orders(
+    db: AsyncSession,
+    customer_id: int,
+    before: tuple[datetime, int] | None = None,
+    limit: int = 50,
+) -> tuple[List[schemas.OrderResponse], tuple[datetime, int] | None]:
+    """
+    Pedidos de un cliente, del más reciente al más antiguo.
+
+    Paginación por clave sobre (created_at, id): `before` es la posición del
+    último pedido de la página anterior. La consulta recorre el índice
+    `ix_orders_customer_created_id` desde ese punto, así el costo no depende de
+    la profundidad de la página. Los ítems de toda la página se cargan con una
+    sola consulta.
+
+    Returns:
+        Los pedidos de la página y la posición para pedir la siguiente
+        (None si no hay más).
+    """
+    query = (
+        select(
+            models.Order.id, models.Order.created_at, models.Order.subtotal,
+            models.Order.total, models.Order.status,
+        )
+        .where(models.Order.customer_id == customer_id)
+        .order_by(models.Order.created_at.desc(), models.Order.id.desc())
+        .limit(limit + 1)
+    )
+    if before is not None:
+        query = query.where(tuple_(models.Order.created_at, models.Order.id) < tuple_(*before))
+    rows = (await db.execute(query)).all()
+    next_position = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_position = (rows[-1].created_at, rows[-1].id)
+
+    items_by_order: dict[int, list[schemas.OrderItemResponse]] = {}
+    if rows:
+        result = await db.execute(
+            select(
+                models.OrderItem.id,
+                models.OrderItem.order_id,
+                models.OrderItem.product_id,
+                models.OrderItem.quantity,
+                models.OrderItem.unit_price,
+            )
+            .where(_id_matches(db, models.OrderItem.order_id, [row.id for row in rows]))
+            .order_by(models.OrderItem.id)
+        )
+        items_by_order = _group_items(result.all())
+
+    orders = [
+        schemas.OrderResponse(
+            id=row.id,
+            customer_id=customer_id,
+            created_at=row.created_at,
+            subtotal=row.subtotal,
+            total=row.total,
+            status=row.status,
+            items=items_by_order.get(row.id, []),
+        )
+        for row in rows
+    ]
+    return orders, next_position
+
+#  ANALYTICS (solo lee los rollups de ventas)
+
+async def get_daily_sales(
+    db: AsyncSession, start: date | None = None, end: date | None = None
+) -> List[models.SalesDaily]:
+    """Ventas por día UTC entre `start` y `end` (inclusive), en orden cronológico."""
+    query = select(models.SalesDaily).order_by(models.SalesDaily.day)
+    if start is not None:
+        query = query.where(models.SalesDaily.day >= start)
+    if end is not None:
+        query = query.where(models.SalesDaily.day <= end)
+    result = await db.execute(query)
+    return result.scalars().all()
+
+
+async def get_product_sales(
+    db: AsyncSession, after_id: int | None = None, limit: int = 100
+) -> List[models.SalesProduct]:
+    """Ventas acumuladas por producto, paginadas por ID de producto."""
+    query = select(models.SalesProduct).order_by(models.SalesProduct.product_id).limit(limit)
+    if after_id is not None:
+        query = query.where(models.SalesProduct.product_id > after_id)
+    result = await db.execute(query)
+    return result.scalars().all()
+
+
+async def get_top_products(
+    db: AsyncSession, by: str = "revenue", limit: int = 10
+) -> List[models.SalesProduct]:
+    """Los `limit` productos con más ingresos (`by="revenue"`) o unidades (`by="units"`)."""
+    column = getattr(models.SalesProduct, by)
+    result = await db.execute(
+        select(models.SalesProduct)
+        .order_by(column.desc(), models.SalesProduct.product_id)
+        .limit(limit)
+    )
+    return result.scalars().all()
@@ -1,17 +1,19 @@
-from fastapi import Depends, Header, HTTPException, status
-from jose import JWTError, jwt
+import asyncio
+import hmac
+import uuid
+from fastapi import Depends, Header, HTTPException, Request, status
+from jose import JWTError
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.crud import get_user_by_username, get_api_key
-from app.models import User, SessionLocal
+from app import auth, replicas as replica_routing
+from app.cache import MISSING
+from app.crud import get_user_by_username, get_user_token_version, get_api_key
+from app.settings import settings
+from app.models import User, SessionLocal, replicas
 from collections.abc import AsyncGenerator 
 from fastapi.security import OAuth2PasswordBearer
 
 
-# Clave secreta y algoritmo para firmar JWT
-SECRET_KEY = "supersecreto"  # En producción, usar una clave más robusta desde entorno
-ALGORITHM = "HS256"
-
-
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
     """
     Provee una sesión asíncrona de base de datos para inyección de dependencias.
@@ -20,10 +22,50 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
         yield session
 
 
-async def get_current_user(token: str, db: AsyncSession) -> User:
+def read_session(request: Request) -> AsyncSession:
+    """
+    Sesión para lecturas: en una réplica sana, salvo que el cliente haya
+    escrito hace poco (read-your-writes), en cuyo caso va a la primaria.
+
+    No abre conexión: la sesión conecta con la primera consulta, así una
+    ruta que no llega a consultar la base no ocupa una conexión.
+    """
+    if replica_routing.reads_from_primary(request.cookies):
+        return replicas.primary_session()
+    return replicas.session()
+
+
+async def get_read_db(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    """
+    Como `get_db`, pero para endpoints de solo lectura: puede servirse desde una réplica.
+    Si la réplica falla, esa petición falla y la réplica se da de baja sin
+    esperar al próximo chequeo.
+    """
+    async with read_session(request) as session:
+        try:
+            yield session
+        except (DBAPIError, OSError, asyncio.TimeoutError):
+            if replicas.is_replica(session):
+                replicas.mark_down(session.bind)
+            raise
+
+
+async def _current_token_version(db: AsyncSession, user_id: int) -> int | None:
+    version = auth.user_version_cache.get(user_id)
+    if version is MISSING:
+        version = await get_user_token_version(db, user_id)
+        if version is not None:
+            auth.user_version_cache.set(user_id, version)
+    return version
+
+
+async def get_current_user(token: str, db: AsyncSession) -> User | auth.TokenUser:
     """
     Decodifica y valida el JWT recibido. Retorna el usuario autenticado.
     Lanza HTTPException si el token es inválido o el usuario no existe.
+
+    Si el token trae `uid` y `ver`, se valida solo con la firma y la versión de
+    token del usuario (cacheada), sin cargar el usuario de la base.
     """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -31,13 +73,20 @@ async def get_current_user(token: str, db: AsyncSession) -> User:
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = auth.decode_access_token(token)
         username: str = payload.get("sub")
         if username is None:
             raise credentials_exception
     except JWTError:
         raise credentials_exception
 
+    user_id = payload.get("uid")
+    token_version = payload.get("ver")
+    if settings.AUTH_STATELESS and user_id is not None and token_version is not None:
+        if await _current_token_version(db, user_id) != token_version:
+            raise credentials_exception
+        return auth.TokenUser(user_id, username, token_version)
+
     user = await get_user_by_username(db, username)
     if user is None:
         raise credentials_exception
@@ -54,6 +103,35 @@ async def get_current_user_dep(
     return await get_current_user(token, db)
 
 
+def _is_well_formed_api_key(key: str) -> bool:
+    # Las keys se generan con uuid4: lo demás se rechaza sin ir a la base
+    try:
+        return str(uuid.UUID(key)) == key
+    except ValueError:
+        return False
+
+
+async def is_valid_api_key(db: AsyncSession, key: str) -> bool:
+    """
+    True si la API Key existe. Las keys válidas se cachean un tiempo y las
+    inválidas un tiempo más corto, para no consultar la base en cada petición.
+    """
+    if auth.api_key_cache.get(key) is not MISSING:
+        return True
+    if auth.api_key_negative_cache.get(key) is not MISSING:
+        return False
+    if not _is_well_formed_api_key(key):
+        return False
+
+    auth.api_key_db_lookups += 1
+    api_key = await get_api_key(db, key)
+    if not api_key:
+        auth.api_key_negative_cache.set(key, True)
+        return False
+    auth.api_key_cache.set(key, api_key.user_id)
+    return True
+
+
 async def verify_api_key(
     x_api_key: str = Header(..., alias="X-API-Key"),
     db: AsyncSession = Depends(get_db)
@@ -62,6 +140,38 @@ async def verify_api_key(
     Verifica la validez de la API Key enviada en el header X-API-Key.
     Lanza HTTPException si no es válida.
     """
-    api_key = await get_api_key(db, x_api_key)
-    if not api_key:
+    if not await is_valid_api_key(db, x_api_key):
         raise HTTPException(status_code=403, detail="API Key inválida")
+
+
+async def is_authenticated(headers) -> bool:
+    """
+    True si los headers traen un JWT (Authorization: Bearer) y una API Key
+    válidos, con las mismas reglas y caches que get_current_user_dep y
+    verify_api_key. Para middlewares que responden antes de las dependencias.
+    """
+    scheme, _, token = headers.get("authorization", "").partition(" ")
+    api_key = headers.get("x-api-key")
+    if scheme.lower() != "bearer" or not token or not api_key:
+        return False
+    async with SessionLocal() as db:
+        if not await is_valid_api_key(db, api_key):
+            return False
+        try:
+            await get_current_user(token, db)
+        except HTTPException:
+            return False
+    return True
+
+
+async def verify_admin_key(x_admin_key: str | None = Header(None, alias="X-Admin-Key")):
+    """
+    Verifica una key de operador (settings.ADMIN_API_KEYS) en el header X-Admin-Key.
+
+    Las API Keys de usuario no sirven: cualquiera puede registrarse y generar una.
+    Sin keys de operador configuradas, las rutas que la piden quedan deshabilitadas.
+    """
+    if x_admin_key is None or not any(
+        hmac.compare_digest(x_admin_key.encode(), key.encode()) for key in settings.ADMIN_API_KEYS
+    ):
+        raise HTTPException(status_code=403, detail="Key de operador inválida")
@@ -1,18 +1,121 @@
-import httpx
+import asyncio
+import time
+from typing import TYPE_CHECKING
+from app import metrics
+from app.cache import TTLCache, MISSING
 from app.settings import settings
 
+if TYPE_CHECKING:
+    import httpx
+
+# Cliente compartido por la aplicación (lo gestiona el lifespan de app.main).
+# httpx se importa al crear el cliente, con la primera consulta al inventario.
+_client: "httpx.AsyncClient | None" = None
+
+# Inventario por id de producto; solo se cachean respuestas válidas
+inventory_cache = TTLCache(
+    maxsize=settings.INVENTORY_CACHE_SIZE,
+    ttl=settings.INVENTORY_CACHE_TTL,
+)
+_inflight: dict[int, asyncio.Task] = {}
+coalesced = 0
+
+
+def _new_client() -> "httpx.AsyncClient":
+    import httpx
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(settings.INVENTORY_TIMEOUT),
+        limits=httpx.Limits(
+            max_connections=settings.INVENTORY_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.INVENTORY_MAX_KEEPALIVE,
+            keepalive_expiry=settings.INVENTORY_KEEPALIVE_EXPIRY,
+        ),
+    )
+
+
+def get_client() -> "httpx.AsyncClient":
+    """Devuelve el cliente compartido, creándolo si todavía no existe."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _new_client()
+    return _client
+
+
+async def close_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+async def _fetch_inventory(product_id: int):
+    import httpx
+    client = get_client()
+    start = time.perf_counter()
+    try:
+        response = await client.get(f"{settings.INVENTORY_API_URL}/{product_id}")
+    except httpx.HTTPError:
+        metrics.inventory_upstream.observe(time.perf_counter() - start, "error")
+        raise
+    metrics.inventory_upstream.observe(time.perf_counter() - start, f"{response.status_code // 100}xx")
+    if response.status_code != 200:
+        return None
+    data = response.json()
+    inventory_cache.set(product_id, data)
+    return data
+
 
 async def get_inventory_for_product(product_id: int):
     """
     Consulta el inventario externo para un producto dado.
     Retorna el inventario como JSON o None si falla la consulta.
+
+    Las respuestas se cachean por id de producto. Las consultas concurrentes
+    para un mismo id comparten una única llamada al servicio externo.
     """
+    global coalesced
     if not settings.INVENTORY_API_URL:
         return {"error": "INVENTORY_API_URL no está definida"}
 
-    url = f"{settings.INVENTORY_API_URL}/{product_id}"
-    async with httpx.AsyncClient() as client:
-        response = await client.get(url)
-        if response.status_code != 200:
-            return None
-        return response.json()
+    cached = inventory_cache.get(product_id)
+    if cached is not MISSING:
+        return cached
+
+    task = _inflight.get(product_id)
+    if task is not None:
+        coalesced += 1
+    else:
+        task = asyncio.ensure_future(_fetch_inventory(product_id))
+        _inflight[product_id] = task
+        task.add_done_callback(lambda _: _inflight.pop(product_id, None))
+    # shield: si una petición se cancela, las demás siguen esperando el resultado
+    return await asyncio.shield(task)
+
+
+async def get_inventory_bulk(product_ids: list[int], concurrency: int) -> dict[int, dict]:
+    """
+    Consulta el inventario de varios productos en paralelo, con como mucho
+    `concurrency` llamadas simultáneas. Los ids repetidos se consultan una vez.
+
+    Retorna un mapa id -> {"inventory": ...} o {"error": ...}: un fallo en un
+    producto no hace fallar al resto.
+    """
+    import httpx
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def resolve(product_id: int) -> tuple[int, dict]:
+        async with semaphore:
+            try:
+                data = await get_inventory_for_product(product_id)
+            except (httpx.HTTPError, ValueError) as e:
+                return product_id, {"error": f"Error consultando inventario externo: {type(e).__name__}"}
+        if not data:
+            return product_id, {"error": "Producto no encontrado en inventario externo"}
+        return product_id, {"inventory": data}
+
+    results = await asyncio.gather(*(resolve(pid) for pid in dict.fromkeys(product_ids)))
+    return dict(results)
+
+
+def inventory_cache_stats() -> dict:
+    return {**inventory_cache.stats(), "coalesced": coalesced, "inflight": len(_inflight)}
@@ -0,0 +1,95 @@
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from app.settings import settings
+
+
+@functools.cache
+def get_pwd_context():
+    """
+    Hasher de contraseñas. passlib se importa en el primer uso, no al importar
+    la aplicación: solo lo necesitan el login y el alta de usuarios.
+    """
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+class PasswordHasher:
+    """
+    Ejecuta bcrypt en un pool de hilos acotado, fuera del event loop.
+
+    bcrypt libera el GIL mientras calcula, así que los hilos trabajan en paralelo
+    y el loop sigue atendiendo otras peticiones. Como mucho `max_workers` hashes
+    corren a la vez; el resto espera en la cola del pool.
+    """
+
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+        self._executor: ThreadPoolExecutor | None = None
+        # Los contadores cambian en el loop y en los hilos del pool: `+=` no es atómico
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.max_queue_depth = 0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="bcrypt")
+        return self._executor
+
+    def _call(self, fn, *args):
+        # Corre en el hilo del pool: ya salió de la cola
+        with self._lock:
+            self.queued -= 1
+            self.running += 1
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self.running -= 1
+                self.completed += 1
+
+    async def _run(self, fn, *args):
+        with self._lock:
+            self.queued += 1
+            self.max_queue_depth = max(self.max_queue_depth, self.queued)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), self._call, fn, *args)
+
+    @staticmethod
+    def _hash(password: str) -> str:
+        return get_pwd_context().hash(password)
+
+    @staticmethod
+    def _verify(password: str, hashed_password: str) -> bool:
+        return get_pwd_context().verify(password, hashed_password)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self._hash, password)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        return await self._run(self._verify, password, hashed_password)
+
+    def warm(self) -> None:
+        """Importa passlib en un hilo del pool, sin esperar: el primer login no lo paga."""
+        self._get_executor().submit(get_pwd_context)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "queued": self.queued,
+                "running": self.running,
+                "completed": self.completed,
+                "max_queue_depth": self.max_queue_depth,
+            }
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+hasher = PasswordHasher(settings.PASSWORD_HASH_WORKERS)
@@ -0,0 +1,308 @@
+"""
+Idempotency-Key para los POST de alta.
+
+Un cliente que reintenta un POST con la misma cabecera `Idempotency-Key`
+recibe la respuesta de la primera ejecución, guardada en la tabla
+`idempotency_keys`, sin que el pedido (o cliente, o producto) se cree otra vez.
+
+- La key se reserva con un INSERT (clave primaria): de varios duplicados
+  concurrentes, en cualquier instancia, solo uno ejecuta. En el mismo proceso
+  los demás esperan su resultado sin consultar la base; desde otra instancia
+  consultan la fila hasta que tenga respuesta (o responden 409 al vencer
+  IDEMPOTENCY_WAIT_TIMEOUT).
+- Las keys se guardan por API Key, ruta y valor de la cabecera, junto con un
+  hash del cuerpo: la misma key con otro cuerpo responde 422.
+- Antes de reservar o repetir una respuesta se validan el JWT y la API Key
+  (`authenticate`): sin credenciales válidas, o con la API Key revocada, la
+  petición sigue a la aplicación, que la rechaza, y nunca recibe una
+  respuesta guardada.
+- Solo se guardan respuestas definitivas. Con 5xx, 401, 403, 408 o 429 la
+  reserva se libera y el cliente puede reintentar con la misma key.
+- Una reserva sin respuesta vence a los IDEMPOTENCY_PENDING_TIMEOUT segundos
+  (la instancia que la tomó pudo caerse); las respuestas, a los IDEMPOTENCY_TTL.
+  Mientras la petición sigue en curso la reserva se renueva, así un lote
+  largo de /orders/batch no se vuelve a ejecutar en otra instancia.
+  Las filas vencidas se borran en segundo plano, por lotes.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import delete, insert, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.future import select
+from starlette.datastructures import Headers
+from app import metrics, models
+
+IDEMPOTENCY_HEADER = "idempotency-key"
+REPLAYED_HEADER = b"idempotent-replayed"
+MAX_KEY_LENGTH = 255
+
+# POST con cuerpo JSON acotado; las importaciones en streaming quedan fuera
+ROUTES = frozenset({"/orders/", "/orders/batch", "/customers/", "/products/"})
+
+# Respuestas que no se guardan: el mismo pedido puede salir bien al reintentar
+_RETRYABLE = frozenset({401, 403, 408, 429})
+
+logger = logging.getLogger(__name__)
+
+requests_total = metrics.registry.counter(
+    "idempotency_requests_total",
+    "POST con Idempotency-Key por resultado (executed, replayed, coalesced, conflict, mismatch, unauthenticated).",
+    ("outcome",),
+)
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def storage_key(api_key: str, path: str, idempotency_key: str) -> str:
+    """Hash de (API Key, ruta, key): no se guarda la API Key en claro."""
+    return hashlib.sha256(f"{api_key}\n{path}\n{idempotency_key}".encode()).hexdigest()
+
+
+class IdempotencyStore:
+    """Reserva, respuesta y purga de las filas de `idempotency_keys`."""
+
+    def __init__(self, session_factory, ttl: float, pending_timeout: float):
+        self.session_factory = session_factory
+        self.ttl = timedelta(seconds=ttl)
+        self.pending_timeout = timedelta(seconds=pending_timeout)
+
+    async def claim(self, key: str, fingerprint: str):
+        """
+        Reserva la key para esta petición y devuelve None, o devuelve la fila
+        vigente (fingerprint, status_code, content_type, body) si ya existe.
+        Una fila vencida cuenta como libre.
+        """
+        table = models.IdempotencyKey
+        async with self.session_factory() as db:
+            while True:
+                now = _now()
+                await db.execute(delete(table).where(table.key == key, table.expires_at <= now))
+                try:
+                    await db.execute(insert(table).values(
+                        key=key, fingerprint=fingerprint, expires_at=now + self.pending_timeout,
+                    ))
+                    await db.commit()
+                    return None
+                except IntegrityError:
+                    await db.rollback()
+                existing = await self._live(db, key, now)
+                if existing is not None:
+                    return existing
+                # La fila venció o se liberó entre el INSERT y la lectura: se reintenta
+
+    async def lookup(self, key: str):
+        async with self.session_factory() as db:
+            return await self._live(db, key, _now())
+
+    @staticmethod
+    async def _live(db, key: str, now: datetime):
+        table = models.IdempotencyKey
+        result = await db.execute(
+            select(table.fingerprint, table.status_code, table.content_type, table.body)
+            .where(table.key == key, table.expires_at > now)
+        )
+        return result.first()
+
+    async def complete(self, key: str, status_code: int, content_type: str | None, body: bytes) -> None:
+        table = models.IdempotencyKey
+        async with self.session_factory() as db:
+            await db.execute(update(table).where(table.key == key).values(
+                status_code=status_code, content_type=content_type, body=body,
+                expires_at=_now() + self.ttl,
+            ))
+            await db.commit()
+
+    async def extend(self, key: str) -> None:
+        """Renueva una reserva sin respuesta: la petición que la tomó sigue en curso."""
+        table = models.IdempotencyKey
+        async with self.session_factory() as db:
+            await db.execute(
+                update(table).where(table.key == key, table.status_code.is_(None))
+                .values(expires_at=_now() + self.pending_timeout)
+            )
+            await db.commit()
+
+    async def release(self, key: str) -> None:
+        """Libera una reserva sin respuesta, para que un reintento pueda ejecutar."""
+        table = models.IdempotencyKey
+        async with self.session_factory() as db:
+            await db.execute(delete(table).where(table.key == key, table.status_code.is_(None)))
+            await db.commit()
+
+    async def purge_expired(self, batch_size: int) -> int:
+        """Borra las filas vencidas de a `batch_size`, una transacción por lote."""
+        table = models.IdempotencyKey
+        total = 0
+        while True:
+            async with self.session_factory() as db:
+                expired = (
+                    select(table.key).where(table.expires_at <= _now()).limit(batch_size).scalar_subquery()
+                )
+                result = await db.execute(delete(table).where(table.key.in_(expired)))
+                await db.commit()
+            total += result.rowcount
+            if result.rowcount < batch_size:
+                return total
+
+
+async def purge_periodically(store: IdempotencyStore, interval: float, batch_size: int) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            purged = await store.purge_expired(batch_size)
+            if purged:
+                logger.info("Idempotency keys vencidas borradas", extra={"purged": purged})
+        except Exception:
+            logger.exception("No se pudieron borrar las idempotency keys vencidas")
+
+
+async def _send_json(send, status: int, detail: str) -> None:
+    body = json.dumps({"detail": detail}).encode()
+    await send({"type": "http.response.start", "status": status, "headers": [
+        (b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()),
+    ]})
+    await send({"type": "http.response.body", "body": body})
+
+
+class IdempotencyMiddleware:
+    """
+    Middleware ASGI puro para los POST de `routes` que traen `Idempotency-Key`.
+
+    `authenticate(headers)` devuelve si la petición pasaría la autenticación
+    de las rutas (p. ej. dependencies.is_authenticated).
+    """
+
+    def __init__(
+        self, app, store: IdempotencyStore, authenticate, routes=ROUTES,
+        wait_timeout: float = 10, poll_interval: float = 0.05,
+    ):
+        self.app = app
+        self.store = store
+        self.authenticate = authenticate
+        self.routes = routes
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self._inflight: dict[str, asyncio.Future] = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in self.routes:
+            await self.app(scope, receive, send)
+            return
+        headers = Headers(scope=scope)
+        idempotency_key = headers.get(IDEMPOTENCY_HEADER)
+        if idempotency_key is None:
+            await self.app(scope, receive, send)
+            return
+        if not idempotency_key or len(idempotency_key) > MAX_KEY_LENGTH:
+            await _send_json(send, 400, f"Idempotency-Key debe tener entre 1 y {MAX_KEY_LENGTH} caracteres")
+            return
+        if not await self.authenticate(headers):
+            # La aplicación responde 401/403, que no se guardan
+            requests_total.inc("unauthenticated")
+            await self.app(scope, receive, send)
+            return
+
+        chunks = []
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body"):
+                break
+        body = b"".join(chunks)
+        key = storage_key(headers.get("x-api-key", ""), scope["path"], idempotency_key)
+        fingerprint = hashlib.sha256(body).hexdigest()
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            # Duplicado concurrente en este proceso: espera a la primera petición
+            requests_total.inc("coalesced")
+            await asyncio.shield(inflight)
+            await self._respond(scope, receive, send, key, fingerprint, body)
+            return
+        self._inflight[key] = asyncio.get_running_loop().create_future()
+        try:
+            await self._respond(scope, receive, send, key, fingerprint, body)
+        finally:
+            self._inflight.pop(key).set_result(None)
+
+    async def _respond(self, scope, receive, send, key: str, fingerprint: str, body: bytes) -> None:
+        deadline = asyncio.get_running_loop().time() + self.wait_timeout
+        while True:
+            existing = await self.store.claim(key, fingerprint)
+            if existing is None:
+                await self._execute(scope, receive, send, key, body)
+                return
+            if existing.fingerprint != fingerprint:
+                requests_total.inc("mismatch")
+                await _send_json(send, 422, "Idempotency-Key ya usada con otro cuerpo")
+                return
+            if existing.status_code is not None:
+                requests_total.inc("replayed")
+                await self._replay(send, existing)
+                return
+            # Reservada por otra instancia que todavía no respondió
+            if asyncio.get_running_loop().time() >= deadline:
+                requests_total.inc("conflict")
+                await _send_json(send, 409, "Hay una petición en curso con esta Idempotency-Key")
+                return
+            await asyncio.sleep(self.poll_interval)
+
+    async def _execute(self, scope, receive, send, key: str, body: bytes) -> None:
+        requests_total.inc("executed")
+        body_sent = False
+        status = 500
+        content_type = None
+        response = []
+
+        async def receive_body():
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        async def send_and_capture(message):
+            nonlocal status, content_type
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                content_type = Headers(raw=message.get("headers", [])).get("content-type")
+            elif message["type"] == "http.response.body":
+                response.append(message.get("body", b""))
+            await send(message)
+
+        keepalive = asyncio.create_task(self._keep_claimed(key))
+        try:
+            await self.app(scope, receive_body, send_and_capture)
+        except BaseException:
+            await self.store.release(key)
+            raise
+        finally:
+            keepalive.cancel()
+        if status < 500 and status not in _RETRYABLE:
+            await self.store.complete(key, status, content_type, b"".join(response))
+        else:
+            await self.store.release(key)
+
+    async def _keep_claimed(self, key: str) -> None:
+        interval = self.store.pending_timeout.total_seconds() / 3
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.store.extend(key)
+            except Exception:
+                logger.exception("No se pudo renovar la reserva de una Idempotency-Key")
+
+    @staticmethod
+    async def _replay(send, stored) -> None:
+        headers = [(b"content-length", str(len(stored.body)).encode()), (REPLAYED_HEADER, b"true")]
+        if stored.content_type:
+            headers.append((b"content-type", stored.content_type.encode()))
+        await send({"type": "http.response.start", "status": stored.status_code, "headers": headers})
+        await send({"type": "http.response.body", "body": stored.body})
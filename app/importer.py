@@ -0,0 +1,189 @@
+import codecs
+import csv
+import json
+from dataclasses import dataclass
+from typing import AsyncIterator, Awaitable, Callable, Hashable
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app import crud, models, schemas
+
+CSV = "text/csv"
+
+
+async def iter_lines(chunks: AsyncIterator[bytes], max_length: int) -> AsyncIterator[str | None]:
+    """
+    Decodifica un cuerpo UTF-8 a medida que llega y lo entrega línea a línea.
+
+    Una línea de más de `max_length` caracteres se entrega como None y el resto
+    se descarta hasta el siguiente salto de línea, sin acumularlo: la memoria
+    queda acotada aunque el cuerpo no tenga saltos de línea.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    skipping = False
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            if skipping:
+                # Fin de una línea larga que ya se entregó como None
+                skipping = False
+                continue
+            yield line.rstrip("\r") if len(line) <= max_length else None
+        if len(pending) > max_length:
+            if not skipping:
+                yield None
+                skipping = True
+            pending = ""
+    pending += decoder.decode(b"", final=True)
+    if pending and not skipping:
+        yield pending.rstrip("\r") if len(pending) <= max_length else None
+
+
+async def iter_records(
+    chunks: AsyncIterator[bytes], content_type: str, max_line_length: int
+) -> AsyncIterator[tuple[int, dict | None, str | None]]:
+    """
+    Convierte el cuerpo en registros (número de línea, datos, error).
+
+    NDJSON: un objeto JSON por línea. CSV: la primera línea es la cabecera y
+    cada línea siguiente es un registro (no se admiten saltos de línea dentro
+    de un campo entrecomillado). Una línea de más de `max_line_length`
+    caracteres es un error de esa fila.
+    """
+    is_csv = content_type.startswith(CSV)
+    header: list[str] | None = None
+    line_no = 0
+    async for line in iter_lines(chunks, max_line_length):
+        line_no += 1
+        if line is None:
+            yield line_no, None, f"Línea demasiado larga (máximo {max_line_length} caracteres)."
+            continue
+        if not line.strip():
+            continue
+        if is_csv:
+            row = next(csv.reader([line]))
+            if header is None:
+                header = [column.strip() for column in row]
+                continue
+            if len(row) != len(header):
+                yield line_no, None, f"Se esperaban {len(header)} columnas y hay {len(row)}."
+                continue
+            yield line_no, dict(zip(header, row)), None
+        else:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                yield line_no, None, "JSON inválido."
+                continue
+            if not isinstance(record, dict):
+                yield line_no, None, "Cada línea debe ser un objeto JSON."
+                continue
+            yield line_no, record, None
+
+
+@dataclass
+class ImportSpec:
+    """Qué se importa: schema de validación, modelo destino y clave de duplicados."""
+
+    schema: type[BaseModel]
+    model: type
+    key: Callable[[BaseModel], Hashable]
+    existing: Callable[[AsyncSession, set], Awaitable[set]]
+    normalize: Callable[[BaseModel], dict] = lambda item: item.model_dump()
+
+
+def _validation_message(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in e['loc'])}: {e['msg']}" if e["loc"] else e["msg"]
+        for e in error.errors()
+    )
+
+
+async def run_import(
+    db: AsyncSession,
+    records: AsyncIterator[tuple[int, dict | None, str | None]],
+    spec: ImportSpec,
+    chunk_size: int,
+    max_errors: int,
+) -> schemas.ImportSummary:
+    """
+    Valida e inserta registros en tramos de `chunk_size`.
+
+    Por tramo se hace una consulta de duplicados contra la base, un INSERT
+    multi-fila y un commit. Solo se retiene un tramo en memoria y como mucho
+    `max_errors` errores detallados (el resto solo se cuenta).
+    """
+    summary = schemas.ImportSummary()
+    buffer: list[tuple[int, BaseModel]] = []
+
+    def fail(line: int, message: str) -> None:
+        summary.failed += 1
+        if len(summary.errors) < max_errors:
+            summary.errors.append(schemas.ImportRowError(line=line, error=message))
+
+    async def flush() -> None:
+        if not buffer:
+            return
+        existing = await spec.existing(db, {spec.key(item) for _, item in buffer})
+        seen = set(existing)
+        rows, lines = [], []
+        for line, item in buffer:
+            key = spec.key(item)
+            if key in seen:
+                summary.duplicates += 1
+                continue
+            seen.add(key)
+            rows.append(spec.normalize(item))
+            lines.append(line)
+        buffer.clear()
+        if not rows:
+            return
+        try:
+            await db.execute(insert(spec.model), rows)
+            await db.commit()
+        except SQLAlchemyError as e:
+            await db.rollback()
+            for line in lines:
+                fail(line, f"Error al guardar el registro: {type(e).__name__}")
+            return
+        summary.created += len(rows)
+
+    async for line, record, error in records:
+        summary.received += 1
+        if error is not None:
+            fail(line, error)
+            continue
+        try:
+            item = spec.schema.model_validate(record)
+        except ValidationError as e:
+            fail(line, _validation_message(e))
+            continue
+        buffer.append((line, item))
+        if len(buffer) >= chunk_size:
+            await flush()
+    await flush()
+    return summary
+
+
+def _normalize_customer(item: schemas.CustomerCreate) -> dict:
+    # Misma normalización que crud.create_customer
+    return {"full_name": item.full_name.strip(), "email": item.email.strip().lower()}
+
+
+CUSTOMERS = ImportSpec(
+    schema=schemas.CustomerCreate,
+    model=models.Customer,
+    key=lambda item: item.email.strip().lower(),
+    existing=crud.existing_customer_emails,
+    normalize=_normalize_customer,
+)
+
+PRODUCTS = ImportSpec(
+    schema=schemas.ProductCreate,
+    model=models.Product,
+    key=lambda item: item.name,
+    existing=crud.existing_product_names,
+)
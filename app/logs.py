@@ -0,0 +1,138 @@
+"""
+Logging estructurado (JSON) sin bloquear el event loop.
+
+Los handlers de la aplicación solo dejan el registro en una cola
+(`QueueHandler`); un hilo de fondo (`QueueListener`) los formatea y los
+escribe en stdout. Así la escritura en stdout, que puede bloquear si el
+consumidor es lento, nunca corre en el loop.
+
+Niveles por módulo con LOG_LEVELS (p. ej. `app.queue=DEBUG,sqlalchemy.engine=INFO`)
+y muestreo de DEBUG con LOG_DEBUG_SAMPLE_RATE. El SQL se registra por el
+logger `sqlalchemy.engine` (SQL_ECHO), también a través de la cola.
+"""
+import itertools
+import logging
+import logging.handlers
+import queue
+import sys
+import time
+import orjson
+
+# Atributos propios de LogRecord: el resto son campos pasados con `extra=`
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+_listener: logging.handlers.QueueListener | None = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Una línea JSON por registro, con los campos de `extra=` al primer nivel."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created))
+            + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return orjson.dumps(entry, default=str).decode()
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """
+        Deja el registro listo para otro hilo: mensaje ya interpolado y la
+        traza como texto. No se formatea aquí: el JSON se arma en el listener.
+        """
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class DebugSampler(logging.Filter):
+    """Deja pasar uno de cada `1 / rate` registros DEBUG; los demás niveles pasan siempre."""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.every = max(1, round(1 / rate)) if rate > 0 else 0
+        self._seen = itertools.count()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG:
+            return True
+        if not self.every:
+            return False
+        return next(self._seen) % self.every == 0
+
+
+def parse_levels(spec: str) -> dict[str, str]:
+    """`"app.queue=DEBUG, sqlalchemy.engine=INFO"` -> {"app.queue": "DEBUG", ...}"""
+    levels = {}
+    for part in spec.split(","):
+        if "=" in part:
+            name, level = part.split("=", 1)
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def setup_logging(
+    level: str = "INFO",
+    module_levels: dict[str, str] | None = None,
+    debug_sample_rate: float = 1.0,
+    sql_echo: bool = False,
+    json_output: bool = True,
+    stream=None,
+) -> logging.handlers.QueueListener:
+    """
+    Instala el pipeline: root -> QueueHandler -> cola -> QueueListener -> stdout.
+    Se puede llamar de nuevo (reemplaza la configuración anterior).
+    """
+    global _listener
+    stop_logging()
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(
+        JsonFormatter() if json_output
+        else logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s")
+    )
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    handler = _QueueHandler(records)
+    handler.addFilter(DebugSampler(debug_sample_rate))
+
+    root = logging.getLogger()
+    root.addHandler(handler)
+    root.setLevel(level.upper())
+
+    # SQL: por logging y no con echo=True, que escribe en stdout desde el loop
+    logging.getLogger("sqlalchemy.engine").setLevel(logging.INFO if sql_echo else logging.WARNING)
+    for name, module_level in (module_levels or {}).items():
+        logging.getLogger(name).setLevel(module_level)
+
+    _listener = logging.handlers.QueueListener(records, output, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def stop_logging() -> None:
+    """
+    Quita el QueueHandler del root y detiene el hilo de escritura después de
+    vaciar la cola: sin lector, los registros posteriores se acumularían en ella.
+    """
+    global _listener
+    root = logging.getLogger()
+    for existing in [h for h in root.handlers if isinstance(h, _QueueHandler)]:
+        root.removeHandler(existing)
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -1,23 +1,140 @@
-from fastapi import FastAPI
-from app.models import Base, engine
-from app.routers import user, customer, product, order, auth
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response
+from app.models import SessionLocal, engine, replicas, warm_pool
+from app.routers import user, customer, product, order, auth, analytics, admin
+from app import queue, outbox, external, metrics, logs, idempotency, admission, migrations
+from app import auth as auth_utils
+from app.dependencies import is_authenticated
+from app.replicas import ReadYourWritesMiddleware, check_periodically
+from app.hashing import hasher
+from app.catalog import catalog, refresh_periodically
+from app.settings import settings
 from fastapi.security import OAuth2PasswordBearer
 
-app = FastAPI(title="E-commerce Challenge")
+
+logger = logging.getLogger(__name__)
+
+
+async def start_messaging(retry_delay: float = 1, max_delay: float = 30) -> None:
+    """
+    Conecta el publicador de RabbitMQ y lanza el relay del outbox, reintentando
+    hasta que el broker responda. Corre en segundo plano: la aplicación atiende
+    mientras tanto y los eventos de pedidos esperan en el outbox.
+    """
+    while True:
+        try:
+            publisher = await queue.start_publisher()
+            break
+        except Exception:
+            logger.exception("No se pudo conectar con RabbitMQ; reintento en %s s", retry_delay)
+            await asyncio.sleep(retry_delay)
+            retry_delay = min(retry_delay * 2, max_delay)
+    if publisher is not None:
+        outbox.start_relay(publisher.publish_many)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    logs.setup_logging(
+        level=settings.LOG_LEVEL,
+        module_levels=logs.parse_levels(settings.LOG_LEVELS),
+        debug_sample_rate=settings.LOG_DEBUG_SAMPLE_RATE,
+        sql_echo=settings.SQL_ECHO,
+        json_output=settings.LOG_JSON,
+    )
+    logger.info(
+        "Iniciando aplicación",
+        extra={"env": settings.ENV, "testing": settings.TESTING, "inventory_api_url": settings.INVENTORY_API_URL},
+    )
+    # Una lectura de schema_version (sin create_all) mientras se abren las conexiones del pool
+    await asyncio.gather(
+        migrations.ensure_schema(engine, apply=settings.DB_MIGRATE_ON_STARTUP),
+        warm_pool(engine, settings.DB_POOL_WARM_CONNECTIONS),
+    )
+    await catalog.refresh()
+    refresher = None
+    if settings.CATALOG_REFRESH_INTERVAL > 0:
+        refresher = asyncio.create_task(
+            refresh_periodically(settings.CATALOG_REFRESH_INTERVAL)
+        )
+    health_checker = None
+    if replicas.engines:
+        await replicas.check(settings.REPLICA_HEALTH_TIMEOUT)
+        health_checker = asyncio.create_task(check_periodically(
+            replicas, settings.REPLICA_HEALTH_INTERVAL, settings.REPLICA_HEALTH_TIMEOUT
+        ))
+    purger = None
+    if settings.IDEMPOTENCY_ENABLED:
+        purger = asyncio.create_task(idempotency.purge_periodically(
+            idempotency_store, settings.IDEMPOTENCY_PURGE_INTERVAL, settings.IDEMPOTENCY_PURGE_BATCH_SIZE
+        ))
+    messaging = asyncio.create_task(start_messaging())
+    hasher.warm()
+    try:
+        yield
+    finally:
+        messaging.cancel()
+        await asyncio.gather(messaging, return_exceptions=True)
+        if refresher is not None:
+            refresher.cancel()
+            await asyncio.gather(refresher, return_exceptions=True)
+        if health_checker is not None:
+            health_checker.cancel()
+            await asyncio.gather(health_checker, return_exceptions=True)
+        if purger is not None:
+            purger.cancel()
+            await asyncio.gather(purger, return_exceptions=True)
+        # Primero se vacía el outbox y luego se cierra el publicador
+        await outbox.stop_relay()
+        await queue.stop_publisher()
+        await external.close_client()
+        hasher.shutdown()
+        await replicas.dispose()
+        logs.stop_logging()
+
+
+idempotency_store = idempotency.IdempotencyStore(
+    SessionLocal, ttl=settings.IDEMPOTENCY_TTL, pending_timeout=settings.IDEMPOTENCY_PENDING_TIMEOUT
+)
+
+app = FastAPI(title="E-commerce Challenge", lifespan=lifespan)
+if settings.IDEMPOTENCY_ENABLED:
+    app.add_middleware(
+        idempotency.IdempotencyMiddleware,
+        store=idempotency_store, authenticate=is_authenticated, wait_timeout=settings.IDEMPOTENCY_WAIT_TIMEOUT,
+    )
+if replicas.engines:
+    app.add_middleware(ReadYourWritesMiddleware, window=settings.READ_YOUR_WRITES_WINDOW)
+# Dentro del middleware de métricas: los 503 por saturación también se miden
+if settings.ADMISSION_ENABLED:
+    app.add_middleware(admission.AdmissionMiddleware, controller=admission.controller)
+if settings.METRICS_ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware)
+
+metrics.register_stats("inventory_cache", "Cache del inventario externo.", external.inventory_cache_stats)
+metrics.register_stats("api_key_cache", "Caches de API Keys válidas e inválidas.", auth_utils.api_key_cache_stats)
+metrics.register_stats("auth_token_cache", "Cache de JWT decodificados.", auth_utils.token_cache.stats)
+metrics.register_stats("auth_user_version_cache", "Cache de versiones de token por usuario.", auth_utils.user_version_cache.stats)
+metrics.register_stats("password_hasher", "Pool de hilos de bcrypt.", hasher.stats)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
-@app.on_event("startup")
-async def on_startup():
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
 
 
 app.include_router(user.router, prefix="/users", tags=["Users"])
-app.include_router(auth.router, prefix="/auth", tags=["Auth"])  
+app.include_router(auth.router, prefix="/auth", tags=["Auth"])
 app.include_router(customer.router, prefix="/customers", tags=["Customers"])
 app.include_router(product.router, prefix="/products", tags=["Products"])
 app.include_router(order.router, prefix="/orders", tags=["Orders"])
+app.include_router(analytics.router, prefix="/analytics", tags=["Analytics"])
+app.include_router(admin.router, prefix="/admin", tags=["Admin"])
 
 
 @app.get("/")
 def read_root():
     return {"message": "API operativa"}
+
+
+@app.get("/metrics", include_in_schema=False)
+def read_metrics():
+    return Response(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
@@ -0,0 +1,324 @@
+"""
+Métricas en formato de texto de Prometheus, servidas en GET /metrics.
+
+Todo se registra desde el event loop (los eventos del pool de SQLAlchemy
+también corren en ese hilo, dentro de greenlets), así que basta con sumar en
+listas y dicts sin locks. Los histogramas guardan la cuenta de cada bucket y
+las acumulan recién al exportar. Los valores que ya llevan otros módulos
+(caches, hasher, pool) se leen en el momento del scrape.
+"""
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Iterable
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+
+    def header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name, help, labelnames=()):
+        super().__init__(name, help, labelnames)
+        self.values: dict[tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self) -> list[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+            for labels, value in self.values.items()
+        ]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels, amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) - amount
+
+    def set(self, *labels, value: float) -> None:
+        self.values[labels] = value
+
+
+class CallbackGauge(Metric):
+    """Gauge cuyo valor se calcula al exportar: `read` devuelve {labels: valor}."""
+    kind = "gauge"
+
+    def __init__(self, name, help, labelnames, read: Callable[[], dict[tuple, float]]):
+        super().__init__(name, help, labelnames)
+        self.read = read
+
+    def render(self) -> list[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+            for labels, value in self.read().items()
+        ]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [cuenta por bucket (+Inf al final), suma]
+        self.series: dict[tuple, list] = {}
+
+    def observe(self, value: float, *labels) -> None:
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def render(self) -> list[str]:
+        lines = []
+        for labels, (counts, total) in self.series.items():
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {_format_value(total)}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: list[Metric] = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, help, labelnames=()) -> Counter:
+        return self.register(Counter(name, help, labelnames))
+
+    def gauge(self, name, help, labelnames=()) -> Gauge:
+        return self.register(Gauge(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def callback(self, name, help, labelnames, read) -> CallbackGauge:
+        return self.register(CallbackGauge(name, help, labelnames, read))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            try:
+                body = metric.render()
+            except Exception:
+                # Una fuente que falla no deja sin métricas al resto
+                continue
+            lines.extend(metric.header())
+            lines.extend(body)
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_duration = registry.histogram(
+    "http_request_duration_seconds", "Duración de las peticiones HTTP.", ("route", "method", "status")
+)
+http_in_flight = registry.gauge(
+    "http_requests_in_flight", "Peticiones HTTP en curso.", ("method",)
+)
+http_statements = registry.histogram(
+    "http_request_db_statements", "Sentencias SQL ejecutadas por petición.", ("route", "method"),
+    buckets=COUNT_BUCKETS,
+)
+db_statements = registry.counter(
+    "db_statements_total", "Sentencias SQL ejecutadas.", ("engine",)
+)
+pool_wait = registry.histogram(
+    "db_pool_checkout_wait_seconds", "Espera para obtener una conexión del pool.", ("engine",)
+)
+pool_events = registry.counter(
+    "db_pool_events_total", "Eventos del pool de conexiones (connect, checkout, checkin, invalidate).",
+    ("engine", "event"),
+)
+queue_publish = registry.histogram(
+    "queue_publish_duration_seconds", "Publicación en RabbitMQ hasta la confirmación del broker.",
+    ("operation", "outcome"),
+)
+inventory_upstream = registry.histogram(
+    "inventory_upstream_duration_seconds", "Llamadas al servicio externo de inventario.", ("outcome",)
+)
+
+# Contador de sentencias de la petición en curso (lo fija el middleware)
+_request_statements: ContextVar[list[int] | None] = ContextVar("request_statements", default=None)
+
+
+# --- Base de datos ---
+
+_engines: dict[str, object] = {}
+
+
+def _timed_pool(name: str) -> type[AsyncAdaptedQueuePool]:
+    class TimedQueuePool(AsyncAdaptedQueuePool):
+        """Pool que mide cuánto espera cada checkout (conexión libre o nueva)."""
+
+        def _do_get(self):
+            start = time.perf_counter()
+            try:
+                return super()._do_get()
+            finally:
+                pool_wait.observe(time.perf_counter() - start, name)
+
+    return TimedQueuePool
+
+
+def pool_options(url: str, name: str) -> dict:
+    """
+    Argumentos extra para `create_async_engine` que miden la espera del pool.
+    SQLite en memoria usa su propio pool y no se instrumenta.
+    """
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:"):
+        return {}
+    return {"poolclass": _timed_pool(name)}
+
+
+def instrument_engine(engine, name: str) -> None:
+    """Cuenta sentencias (totales y por petición) y eventos del pool de un engine async."""
+    sync_engine = engine.sync_engine
+    _engines[name] = engine
+
+    # Eventos de dialecto y no de conexión: un listener de conexión activa el
+    # despacho de todos los eventos de ejecución en cada sentencia
+    def _statement(*args):
+        db_statements.inc(name)
+        holder = _request_statements.get()
+        if holder is not None:
+            holder[0] += 1
+
+    event.listen(sync_engine, "do_execute", _statement)
+    event.listen(sync_engine, "do_executemany", _statement)
+    event.listen(sync_engine, "do_execute_no_params", _statement)
+
+    for pool_event in ("connect", "checkout", "checkin", "invalidate"):
+        event.listen(sync_engine.pool, pool_event, _pool_listener(name, pool_event))
+
+
+def _pool_listener(name: str, pool_event: str):
+    def listener(*args):
+        pool_events.inc(name, pool_event)
+    return listener
+
+
+def _pool_usage() -> dict[tuple, float]:
+    values = {}
+    for name, engine in _engines.items():
+        pool = engine.pool
+        if not isinstance(pool, AsyncAdaptedQueuePool):
+            continue
+        values[(name, "size")] = pool.size()
+        values[(name, "checkedout")] = pool.checkedout()
+        values[(name, "checkedin")] = pool.checkedin()
+        # QueuePool cuenta el overflow desde -size: solo interesan las conexiones extra
+        values[(name, "overflow")] = max(pool.overflow(), 0)
+    return values
+
+
+registry.callback(
+    "db_pool_connections", "Estado del pool: tamaño, conexiones en uso, overflow y libres.",
+    ("engine", "state"), _pool_usage,
+)
+
+
+def _flatten(stats: dict, prefix: str = "") -> dict[tuple, float]:
+    values = {}
+    for key, value in stats.items():
+        if isinstance(value, dict):
+            values.update(_flatten(value, f"{prefix}{key}_"))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            values[(f"{prefix}{key}",)] = value
+    return values
+
+
+def register_stats(name: str, help: str, read: Callable[[], dict]) -> None:
+    """
+    Exporta un dict de estadísticas (cache, hasher...) como gauge `{name}{stat=...}`.
+    Los dicts anidados se aplanan con el nombre de la clave como prefijo.
+    """
+    registry.callback(name, help, ("stat",), lambda: _flatten(read()))
+
+
+# --- HTTP ---
+
+def _route_label(scope) -> str:
+    route = scope.get("route")
+    # Sin ruta (404) se agrupa para no crear una serie por cada URL desconocida
+    return getattr(route, "path", None) or "unmatched"
+
+
+class MetricsMiddleware:
+    """Middleware ASGI puro: duración, peticiones en curso y sentencias SQL por petición."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        method = scope["method"]
+        status = 500
+        holder = [0]
+        token = _request_statements.set(holder)
+        http_in_flight.inc(method)
+        start = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            http_in_flight.dec(method)
+            _request_statements.reset(token)
+            route = _route_label(scope)
+            http_duration.observe(elapsed, route, method, status)
+            http_statements.observe(holder[0], route, method)
+
@@ -0,0 +1,160 @@
+"""
+Migraciones de esquema versionadas.
+
+    python -m app.migrations          # aplica las pendientes
+    python -m app.migrations --check  # sale con 1 si el esquema no está al día
+
+Las migraciones aplicadas quedan en la tabla `schema_version`, una fila por
+versión. Al arrancar, la aplicación solo lee la última fila (una consulta)
+en lugar de inspeccionar todas las tablas con `create_all`; si el esquema
+está atrasado aplica lo que falta, o no arranca si DB_MIGRATE_ON_STARTUP=false.
+
+Varias instancias que arrancan a la vez no aplican dos veces la misma
+migración: en PostgreSQL se toma un advisory lock de transacción y se vuelve
+a leer la versión antes de aplicar. Cada migración corre en la misma
+transacción que registra su versión.
+
+La versión 1 crea las tablas que falten con los modelos actuales: en una
+base nueva ya deja el esquema completo, así que las migraciones siguientes
+deben comprobar si su cambio ya está hecho (como `_add_late_columns` o los
+índices con IF NOT EXISTS).
+"""
+import argparse
+import asyncio
+import logging
+from sqlalchemy import String, inspect, insert, select
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+from sqlalchemy.schema import CreateIndex
+from app import models
+
+logger = logging.getLogger(__name__)
+
+# Clave del advisory lock que serializa las migraciones entre instancias (PostgreSQL)
+LOCK_KEY = 4_240_025
+
+
+async def _create_tables(conn: AsyncConnection) -> None:
+    await conn.run_sync(models.Base.metadata.create_all)
+
+
+# Columnas e índices agregados a tablas que ya existían en bases creadas con create_all
+LATE_COLUMNS = (
+    models.User.__table__.c.token_version,
+    models.OrderItem.__table__.c.unit_price,
+    models.Order.__table__.c.subtotal,
+    models.Order.__table__.c.total,
+    models.Order.__table__.c.status,
+)
+# Historial de pedidos por cliente
+LATE_INDEXES = sorted(
+    models.Order.__table__.indexes | models.OrderItem.__table__.indexes, key=lambda index: index.name
+)
+
+
+async def _add_late_columns(conn: AsyncConnection) -> None:
+    def existing(sync_conn):
+        inspector = inspect(sync_conn)
+        return {
+            (column.table.name, c["name"])
+            for column in LATE_COLUMNS
+            for c in inspector.get_columns(column.table.name)
+        }
+
+    present = await conn.run_sync(existing)
+    for column in LATE_COLUMNS:
+        if (column.table.name, column.name) in present:
+            continue
+        ddl = f"{column.name} {column.type.compile(dialect=conn.dialect)}"
+        if column.server_default is not None:
+            default = column.server_default.arg
+            ddl += f" DEFAULT '{default}'" if isinstance(column.type, String) else f" DEFAULT {default}"
+        if not column.nullable:
+            ddl += " NOT NULL"
+        await conn.exec_driver_sql(f"ALTER TABLE {column.table.name} ADD COLUMN {ddl}")
+        logger.info("Columna agregada", extra={"column": f"{column.table.name}.{column.name}"})
+    for index in LATE_INDEXES:
+        await conn.execute(CreateIndex(index, if_not_exists=True))
+
+
+# (versión, descripción, paso): solo se agregan al final, nunca se modifican
+MIGRATIONS = (
+    (1, "Esquema inicial", _create_tables),
+    (2, "Columnas e índices agregados después del esquema inicial", _add_late_columns),
+)
+LATEST = MIGRATIONS[-1][0]
+
+
+async def current_version(engine: AsyncEngine) -> int:
+    """Última versión aplicada, con una sola lectura; 0 si la base no tiene migraciones."""
+    table = models.SchemaVersion
+    async with engine.connect() as conn:
+        try:
+            result = await conn.execute(
+                select(table.version).order_by(table.version.desc()).limit(1)
+            )
+        except DBAPIError:
+            # Sin tabla schema_version: base vacía o creada antes de las migraciones
+            return 0
+        return result.scalar() or 0
+
+
+async def migrate(engine: AsyncEngine) -> list[int]:
+    """Aplica las migraciones pendientes y devuelve las versiones aplicadas."""
+    table = models.SchemaVersion
+    applied = []
+    async with engine.begin() as conn:
+        if conn.dialect.name == "postgresql":
+            await conn.exec_driver_sql(f"SELECT pg_advisory_xact_lock({LOCK_KEY})")
+        await conn.run_sync(table.__table__.create, checkfirst=True)
+        result = await conn.execute(select(table.version).order_by(table.version.desc()).limit(1))
+        version = result.scalar() or 0
+        for number, description, step in MIGRATIONS:
+            if number <= version:
+                continue
+            await step(conn)
+            await conn.execute(insert(table).values(version=number, description=description))
+            logger.info("Migración aplicada", extra={"version": number, "description": description})
+            applied.append(number)
+    return applied
+
+
+async def ensure_schema(engine: AsyncEngine, apply: bool = True) -> int:
+    """
+    Comprueba la versión del esquema al arrancar. Con el esquema al día es una
+    sola lectura. Si está atrasado aplica las migraciones (o lanza RuntimeError
+    con `apply=False`). Una versión más nueva que la del código (despliegue
+    en curso) solo se registra como advertencia.
+    """
+    version = await current_version(engine)
+    if version == LATEST:
+        return version
+    if version > LATEST:
+        logger.warning("El esquema es más nuevo que el código", extra={"schema": version, "code": LATEST})
+        return version
+    if not apply:
+        raise RuntimeError(
+            f"Esquema en la versión {version}, se espera {LATEST}: ejecutar python -m app.migrations"
+        )
+    await migrate(engine)
+    return LATEST
+
+
+async def run(check: bool) -> int:
+    try:
+        version = await current_version(models.engine)
+        if check:
+            print(f"Esquema en la versión {version} (última: {LATEST})")
+            return 0 if version >= LATEST else 1
+        applied = await migrate(models.engine)
+        print(f"Migraciones aplicadas: {applied}" if applied else f"Esquema al día (versión {version})")
+        return 0
+    finally:
+        await models.engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--check", action="store_true", help="solo informa si hay migraciones pendientes")
+    args = parser.parse_args()
+    raise SystemExit(asyncio.run(run(args.check)))
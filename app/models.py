@@ -1,23 +1,88 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, func
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, Date, DateTime, JSON, Index, LargeBinary, func
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
 from sqlalchemy.orm import relationship, declarative_base, validates
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
 from typing import AsyncGenerator
+import asyncio
 import os
 
 #Conexión a DB
 from app.settings import settings
-
-engine = create_async_engine(settings.DATABASE_URL, echo=True, future=True)
+from app.replicas import ReadReplicas
+from app import metrics
+
+# Sin echo=True: el SQL se registra por logging (settings.SQL_ECHO), fuera del event loop
+engine = create_async_engine(
+    settings.DATABASE_URL, future=True,
+    **metrics.pool_options(settings.DATABASE_URL, "primary"),
+)
+metrics.instrument_engine(engine, "primary")
 SessionLocal = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+
+
+async def warm_pool(engine, connections: int) -> int:
+    """
+    Abre hasta `connections` conexiones a la vez y las devuelve al pool, así las
+    primeras peticiones no pagan el connect. Devuelve cuántas se abrieron.
+    """
+    size = getattr(engine.pool, "size", None)
+    if size is not None:
+        connections = min(connections, size())
+    if connections <= 0:
+        return 0
+    opened = await asyncio.gather(
+        *(engine.connect().start() for _ in range(connections)), return_exceptions=True
+    )
+    conns = [conn for conn in opened if not isinstance(conn, BaseException)]
+    await asyncio.gather(*(conn.close() for conn in conns))
+    return len(conns)
+
+#Réplicas de lectura: sin réplicas configuradas, ReadSessionLocal usa la primaria
+replica_engines = [
+    create_async_engine(url, future=True, **metrics.pool_options(url, f"replica{i}"))
+    for i, url in enumerate(settings.DATABASE_REPLICA_URLS, start=1)
+]
+for i, replica_engine in enumerate(replica_engines, start=1):
+    metrics.instrument_engine(replica_engine, f"replica{i}")
+replicas = ReadReplicas(replica_engines, SessionLocal)
+ReadSessionLocal = replicas.session
+# Columnas o índices nuevos en tablas existentes necesitan además una migración en
+# app.migrations: create_all solo crea las tablas que faltan
 Base = declarative_base()
 
+
+class server_now(FunctionElement):
+    """
+    Fecha y hora actual del servidor de base de datos.
+
+    En SQLite, CURRENT_TIMESTAMP guarda segundos sin fracción y no se compara
+    bien con los DateTime que escribe SQLAlchemy (con microsegundos); aquí se
+    genera el mismo formato para que la paginación por fecha funcione igual.
+    """
+    type = DateTime(timezone=True)
+    inherit_cache = True
+
+
+@compiles(server_now)
+def _server_now_default(element, compiler, **kw):
+    return "now()"
+
+
+@compiles(server_now, "sqlite")
+def _server_now_sqlite(element, compiler, **kw):
+    return "(STRFTIME('%Y-%m-%d %H:%M:%f000', 'now'))"
+
+
 #Modelo User con validación
 class User(Base):
     __tablename__ = "users"
     id = Column(Integer, primary_key=True, index=True)
     username = Column(String, unique=True, nullable=False)
     hashed_password = Column(String, nullable=False)
+    # Se incrementa al modificar el usuario para invalidar sus tokens
+    token_version = Column(Integer, nullable=False, default=0, server_default="0")
     api_keys = relationship("ApiKey", back_populates="user")
 
     @validates("username")
@@ -74,21 +139,37 @@ class Customer(Base):
         return value
 
 #Orden
+# Estados de un pedido: lo crea la API y lo confirma el worker de la cola `orders`
+ORDER_PENDING = "pending"
+ORDER_CONFIRMED = "confirmed"
+
+
 class Order(Base):
     __tablename__ = "orders"
     id = Column(Integer, primary_key=True)
     customer_id = Column(Integer, ForeignKey("customers.id"))
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), server_default=server_now())
+    # Calculados al crear el pedido con los precios de ese momento
+    subtotal = Column(Float, nullable=True)
+    total = Column(Float, nullable=True)
+    status = Column(String(20), nullable=False, default=ORDER_PENDING, server_default=ORDER_PENDING)
     customer = relationship("Customer", back_populates="orders")
     items = relationship("OrderItem", back_populates="order", cascade="all, delete")
 
+    # Historial de un cliente, del más reciente al más antiguo, sin ordenar en memoria
+    __table_args__ = (
+        Index("ix_orders_customer_created_id", customer_id, created_at.desc(), id.desc()),
+    )
+
 #Ítem de Orden con validación de cantidad
 class OrderItem(Base):
     __tablename__ = "order_items"
     id = Column(Integer, primary_key=True)
-    order_id = Column(Integer, ForeignKey("orders.id"))
+    order_id = Column(Integer, ForeignKey("orders.id"), index=True)
     product_id = Column(Integer, ForeignKey("products.id"))
     quantity = Column(Integer, nullable=False)
+    # Precio del producto al momento del pedido
+    unit_price = Column(Float, nullable=True)
 
     order = relationship("Order", back_populates="items")
     product = relationship("Product")
@@ -99,6 +180,52 @@ class OrderItem(Base):
             raise ValueError("La cantidad debe ser mayor a 0.")
         return value
 
+#Outbox de eventos: se escribe en la misma transacción que el pedido
+class OutboxEvent(Base):
+    __tablename__ = "outbox"
+    id = Column(Integer, primary_key=True)
+    event_type = Column(String, nullable=False)
+    payload = Column(JSON, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+#Rollups de ventas: se actualizan en la misma transacción que crea el pedido
+class SalesDaily(Base):
+    __tablename__ = "sales_daily"
+    day = Column(Date, primary_key=True)  # Día UTC de created_at
+    orders = Column(Integer, nullable=False, default=0)
+    units = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0)
+
+class SalesProduct(Base):
+    __tablename__ = "sales_product"
+    product_id = Column(Integer, ForeignKey("products.id"), primary_key=True)
+    orders = Column(Integer, nullable=False, default=0)
+    units = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0)
+
+    # Top-N sin ordenar toda la tabla
+    __table_args__ = (
+        Index("ix_sales_product_revenue", revenue.desc()),
+        Index("ix_sales_product_units", units.desc()),
+    )
+
+#Idempotency-Key de los POST de alta: respuesta guardada para repetirla en los reintentos
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+    key = Column(String, primary_key=True)  # sha256 de API Key + ruta + cabecera
+    fingerprint = Column(String, nullable=False)  # sha256 del cuerpo
+    status_code = Column(Integer, nullable=True)  # NULL mientras la primera petición está en curso
+    content_type = Column(String, nullable=True)
+    body = Column(LargeBinary, nullable=True)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+#Versiones de esquema aplicadas (app.migrations): una fila por migración
+class SchemaVersion(Base):
+    __tablename__ = "schema_version"
+    version = Column(Integer, primary_key=True, autoincrement=False)
+    description = Column(String, nullable=False)
+    applied_at = Column(DateTime(timezone=True), nullable=False, server_default=server_now())
+
 #Async session getter
 async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
     async with SessionLocal() as session:
@@ -0,0 +1,137 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable
+from sqlalchemy import delete
+from sqlalchemy.future import select
+from app import models
+from app.settings import settings
+
+ORDER_CREATED = "order_created"
+
+logger = logging.getLogger(__name__)
+
+
+class OutboxRelay:
+    """
+    Publica en lotes los eventos guardados en la tabla `outbox`.
+
+    Se despierta cuando se acumulan `batch_size` eventos nuevos o cada
+    `flush_interval` segundos, lo que ocurra primero. Las filas se reclaman con
+    `FOR UPDATE SKIP LOCKED`, así varias instancias de la app pueden compartir
+    el trabajo sin publicar dos veces el mismo lote. Una fila solo se borra
+    después de que el broker confirmó su publicación.
+    """
+
+    def __init__(
+        self,
+        session_factory,
+        publish_many: Callable[[list[dict]], Awaitable[None]],
+        batch_size: int = 100,
+        flush_interval: float = 0.2,
+    ):
+        self.session_factory = session_factory
+        self.publish_many = publish_many
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending = 0
+        self._batch_ready = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    def notify(self, count: int = 1) -> None:
+        """Avisa de eventos recién confirmados en la base de datos."""
+        self._pending += count
+        if self._pending >= self.batch_size:
+            self._batch_ready.set()
+
+    async def relay_once(self) -> int:
+        """Reclama, publica y borra un lote. Devuelve la cantidad de eventos publicados."""
+        async with self.session_factory() as db:
+            result = await db.execute(
+                select(models.OutboxEvent)
+                .order_by(models.OutboxEvent.id)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            events = result.scalars().all()
+            if not events:
+                await db.rollback()
+                return 0
+            try:
+                await self.publish_many([event.payload for event in events])
+            except Exception:
+                await db.rollback()
+                raise
+            await db.execute(
+                delete(models.OutboxEvent).where(
+                    models.OutboxEvent.id.in_([event.id for event in events])
+                )
+            )
+            await db.commit()
+            return len(events)
+
+    async def drain(self) -> int:
+        """Publica lotes hasta vaciar el outbox."""
+        total = 0
+        while True:
+            published = await self.relay_once()
+            total += published
+            if published < self.batch_size:
+                return total
+
+    async def run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._batch_ready.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._batch_ready.clear()
+            self._pending = 0
+            try:
+                await self.drain()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Error publicando eventos del outbox; se reintentará")
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        """Detiene el bucle y publica lo que quede pendiente."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        try:
+            await self.drain()
+        except Exception:
+            logger.exception("Quedaron eventos sin publicar en el outbox")
+
+
+# Relay compartido por la aplicación (lo gestiona el lifespan de app.main)
+relay: OutboxRelay | None = None
+
+
+def notify(count: int = 1) -> None:
+    if relay is not None:
+        relay.notify(count)
+
+
+def start_relay(publish_many: Callable[[list[dict]], Awaitable[None]]) -> OutboxRelay:
+    global relay
+    relay = OutboxRelay(
+        models.SessionLocal,
+        publish_many,
+        batch_size=settings.OUTBOX_BATCH_SIZE,
+        flush_interval=settings.OUTBOX_FLUSH_INTERVAL_MS / 1000,
+    )
+    relay.start()
+    return relay
+
+
+async def stop_relay() -> None:
+    global relay
+    if relay is not None:
+        await relay.stop()
+        relay = None
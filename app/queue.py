@@ -1,18 +1,129 @@
+import asyncio
 import json
-import aio_pika
+import time
+from typing import TYPE_CHECKING
+from app import metrics
 from app.settings import settings
 
 RABBITMQ_URL = settings.RABBITMQ_URL
+ORDERS_QUEUE = "orders"
 
-async def publish_order_created(order_data: dict):
-    connection = await aio_pika.connect_robust(RABBITMQ_URL)
-    async with connection:
-        channel = await connection.channel()
-        queue = await channel.declare_queue("orders", durable=True)
-        await channel.default_exchange.publish(
-            aio_pika.Message(
-                body=json.dumps(order_data).encode(),
-                content_type="application/json"
-            ),
-            routing_key=queue.name,
+# aio_pika se importa al abrir la conexión: la aplicación arranca sin cargarlo
+if TYPE_CHECKING:
+    import aio_pika
+    from aio_pika.pool import Pool
+
+
+def _build_message(order_data: dict) -> "aio_pika.Message":
+    import aio_pika
+    return aio_pika.Message(
+        body=json.dumps(order_data).encode(),
+        content_type="application/json",
+        delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
+    )
+
+
+class OrderPublisher:
+    """
+    Publicador de larga vida para la cola de pedidos.
+
+    Mantiene una única conexión robusta y un pool de canales con confirmaciones
+    del broker. La cola se declara una sola vez al arrancar. Los eventos de
+    pedidos llegan por el relay del outbox (`publish_many`), que reintenta lo que
+    el broker no confirmó.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        queue_name: str = ORDERS_QUEUE,
+        pool_size: int = 4,
+    ):
+        self.url = url
+        self.queue_name = queue_name
+        self.pool_size = pool_size
+        self._connection = None
+        self._channels: "Pool | None" = None
+
+    @property
+    def running(self) -> bool:
+        return self._connection is not None
+
+    async def start(self) -> None:
+        """Abre la conexión y declara la cola."""
+        import aio_pika
+        from aio_pika.pool import Pool
+        self._connection = await aio_pika.connect_robust(self.url)
+        self._channels = Pool(self._open_channel, max_size=self.pool_size)
+        async with self._channels.acquire() as channel:
+            await channel.declare_queue(self.queue_name, durable=True)
+
+    async def _open_channel(self):
+        return await self._connection.channel(publisher_confirms=True)
+
+    async def publish(self, order_data: dict) -> None:
+        """Publica un mensaje y espera la confirmación del broker."""
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            async with self._channels.acquire() as channel:
+                await channel.default_exchange.publish(
+                    _build_message(order_data), routing_key=self.queue_name
+                )
+            outcome = "ok"
+        finally:
+            metrics.queue_publish.observe(time.perf_counter() - start, "single", outcome)
+
+    async def publish_many(self, batch: list[dict]) -> None:
+        """
+        Publica un lote en un mismo canal y espera todas las confirmaciones.
+        Lanza la primera excepción si algún mensaje no fue confirmado.
+        """
+        start = time.perf_counter()
+        async with self._channels.acquire() as channel:
+            results = await asyncio.gather(
+                *(
+                    channel.default_exchange.publish(
+                        _build_message(order_data), routing_key=self.queue_name
+                    )
+                    for order_data in batch
+                ),
+                return_exceptions=True,
+            )
+        failed = [result for result in results if isinstance(result, BaseException)]
+        metrics.queue_publish.observe(
+            time.perf_counter() - start, "batch", "error" if failed else "ok"
         )
+        if failed:
+            raise failed[0]
+
+    async def stop(self) -> None:
+        """Cierra canales y conexión."""
+        if not self.running:
+            return
+        await self._channels.close()
+        await self._connection.close()
+        self._connection = None
+
+
+# Publicador compartido por la aplicación (lo gestiona el lifespan de app.main)
+publisher: OrderPublisher | None = None
+
+
+async def start_publisher() -> OrderPublisher | None:
+    global publisher
+    if not RABBITMQ_URL:
+        return None
+    publisher = OrderPublisher(
+        RABBITMQ_URL,
+        pool_size=settings.RABBITMQ_CHANNEL_POOL_SIZE,
+    )
+    await publisher.start()
+    return publisher
+
+
+async def stop_publisher() -> None:
+    global publisher
+    if publisher is not None:
+        await publisher.stop()
+        publisher = None
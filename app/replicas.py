@@ -0,0 +1,117 @@
+"""
+Enrutamiento de lecturas a réplicas.
+
+`ReadReplicas` reparte las sesiones de lectura entre las réplicas sanas y cae
+a la primaria si no queda ninguna. Una réplica se da de baja cuando falla una
+lectura o el chequeo periódico, y vuelve cuando el chequeo pasa.
+
+`ReadYourWritesMiddleware` marca con una cookie a los clientes que acaban de
+escribir: mientras dure la ventana, sus lecturas van a la primaria y no ven
+datos atrasados por el retraso de replicación.
+"""
+import asyncio
+import logging
+import time
+from itertools import count
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+logger = logging.getLogger(__name__)
+
+READ_PRIMARY_COOKIE = "read_primary_until"
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+class ReadReplicas:
+    def __init__(self, engines: list[AsyncEngine], primary_factory: sessionmaker):
+        self.engines = list(engines)
+        self.healthy = list(engines)
+        self._primary_factory = primary_factory
+        self._factories = {
+            engine: sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+            for engine in self.engines
+        }
+        self._turn = count()
+
+    def session(self) -> AsyncSession:
+        """Sesión en la siguiente réplica sana (round robin) o en la primaria si no hay."""
+        healthy = self.healthy
+        if not healthy:
+            return self._primary_factory()
+        engine = healthy[next(self._turn) % len(healthy)]
+        return self._factories[engine]()
+
+    def primary_session(self) -> AsyncSession:
+        return self._primary_factory()
+
+    def is_replica(self, session: AsyncSession) -> bool:
+        return session.bind in self._factories
+
+    def mark_down(self, engine: AsyncEngine) -> None:
+        if engine in self.healthy:
+            logger.warning("Réplica %s fuera de servicio", engine.url.render_as_string())
+            self.healthy = [e for e in self.healthy if e is not engine]
+
+    def mark_up(self, engine: AsyncEngine) -> None:
+        if engine not in self.healthy:
+            logger.warning("Réplica %s de nuevo en servicio", engine.url.render_as_string())
+            # Se conserva el orden de configuración
+            self.healthy = [e for e in self.engines if e in self.healthy or e is engine]
+
+    async def check(self, timeout: float) -> None:
+        """Ejecuta SELECT 1 en cada réplica y actualiza cuáles están sanas."""
+        async def ping(engine: AsyncEngine) -> None:
+            try:
+                async with asyncio.timeout(timeout):
+                    async with engine.connect() as conn:
+                        await conn.execute(text("SELECT 1"))
+            except Exception:
+                self.mark_down(engine)
+            else:
+                self.mark_up(engine)
+
+        await asyncio.gather(*(ping(engine) for engine in self.engines))
+
+    async def dispose(self) -> None:
+        for engine in self.engines:
+            await engine.dispose()
+
+
+async def check_periodically(replicas: ReadReplicas, interval: float, timeout: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        await replicas.check(timeout)
+
+
+def reads_from_primary(cookies: dict[str, str]) -> bool:
+    """True si el cliente escribió hace menos de READ_YOUR_WRITES_WINDOW segundos."""
+    try:
+        return float(cookies.get(READ_PRIMARY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+class ReadYourWritesMiddleware:
+    """Agrega la cookie `read_primary_until` a las escrituras que terminan bien."""
+
+    def __init__(self, app, window: float):
+        self.app = app
+        self.window = window
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in SAFE_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_cookie(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                until = time.time() + self.window
+                cookie = (
+                    f"{READ_PRIMARY_COOKIE}={until:.3f}; Max-Age={int(self.window) + 1}; "
+                    "Path=/; HttpOnly; SameSite=Lax"
+                )
+                message["headers"] = [*message.get("headers", []), (b"set-cookie", cookie.encode())]
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
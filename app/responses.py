@@ -0,0 +1,24 @@
+"""
+Serialización JSON con orjson para las lecturas que no pasan por `response_model`.
+
+Las rutas de lectura arman dicts con las claves en el orden de su esquema y los
+devuelven en `FastJSONResponse`: FastAPI no valida ni convierte la respuesta
+otra vez, y el cuerpo es el mismo que produciría con el esquema (sin
+espacios, UTF-8 sin escapar, fechas en ISO 8601 con "Z" para UTC).
+
+Única diferencia: un float menor que 1e-4 o mayor o igual que 1e16 se escribe
+con otra notación del mismo número (`1e16` en lugar de `1e+16`).
+"""
+import orjson
+from fastapi.responses import JSONResponse
+
+_OPTIONS = orjson.OPT_UTC_Z
+
+
+def dumps(data) -> bytes:
+    return orjson.dumps(data, option=_OPTIONS)
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        return dumps(content)
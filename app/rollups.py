@@ -0,0 +1,141 @@
+"""
+Rollups de ventas por día y por producto.
+
+`record_orders` suma los pedidos recién insertados a `sales_daily` y
+`sales_product` dentro de la transacción del pedido, con un upsert multi-fila
+por tabla. `rebuild` recalcula ambas tablas desde `orders`/`order_items`:
+
+    python -m app.rollups
+"""
+import argparse
+import asyncio
+from collections import defaultdict
+from datetime import date, datetime, timezone
+from typing import Sequence
+from sqlalchemy import delete, func, insert, select, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from app import models, schemas
+
+COUNTERS = ("orders", "units", "revenue")
+
+
+def utc_day(created_at: datetime) -> date:
+    """Día UTC de un created_at (SQLite devuelve datetimes sin zona, ya en UTC)."""
+    if created_at.tzinfo is not None:
+        created_at = created_at.astimezone(timezone.utc)
+    return created_at.date()
+
+
+async def _upsert(db: AsyncSession, model, key: str, totals: dict) -> None:
+    """INSERT ... ON CONFLICT DO UPDATE sumando los contadores a las filas existentes."""
+    if not totals:
+        return
+    dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+    table = model.__table__
+    # Claves ordenadas: transacciones concurrentes bloquean las filas en el mismo orden
+    stmt = dialect.insert(table).values([
+        {key: k, **dict(zip(COUNTERS, totals[k]))} for k in sorted(totals)
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[key],
+        set_={c: table.c[c] + stmt.excluded[c] for c in COUNTERS},
+    )
+    await db.execute(stmt)
+
+
+async def record_orders(
+    db: AsyncSession,
+    orders: Sequence[tuple[datetime, schemas.OrderCreate]],
+    prices: dict[int, float],
+) -> None:
+    """
+    Suma pedidos recién insertados a los rollups. No hace commit.
+
+    Se agregan en memoria antes de escribir, así un lote de pedidos cuesta un
+    upsert por tabla. Va al final de la transacción para que los bloqueos sobre
+    las filas del rollup duren lo menos posible.
+    """
+    daily: dict[date, list] = defaultdict(lambda: [0, 0, 0.0])
+    per_product: dict[int, list] = defaultdict(lambda: [0, 0, 0.0])
+    for created_at, order in orders:
+        day = daily[utc_day(created_at)]
+        day[0] += 1
+        for item in order.items:
+            amount = prices[item.product_id] * item.quantity
+            day[1] += item.quantity
+            day[2] += amount
+            product = per_product[item.product_id]
+            product[0] += 1
+            product[1] += item.quantity
+            product[2] += amount
+    await _upsert(db, models.SalesDaily, "day", daily)
+    await _upsert(db, models.SalesProduct, "product_id", per_product)
+
+
+def _day_expr(db: AsyncSession):
+    created_at = models.Order.created_at
+    if db.get_bind().dialect.name == "postgresql":
+        return func.date(func.timezone("UTC", created_at))
+    return func.date(created_at)
+
+
+async def rebuild(db: AsyncSession) -> None:
+    """
+    Recalcula los rollups desde cero en una transacción.
+
+    En Postgres se bloquean antes las tablas de rollup: los pedidos que se
+    estén creando esperan a que termine y se suman después, sin perderse ni
+    contarse dos veces.
+    """
+    Order, OrderItem = models.Order, models.OrderItem
+    if db.get_bind().dialect.name == "postgresql":
+        await db.execute(text("LOCK TABLE sales_daily, sales_product IN EXCLUSIVE MODE"))
+    await db.execute(delete(models.SalesDaily))
+    await db.execute(delete(models.SalesProduct))
+
+    amount = OrderItem.quantity * OrderItem.unit_price
+    items = (
+        select(
+            OrderItem.order_id,
+            func.sum(OrderItem.quantity).label("units"),
+            func.sum(amount).label("revenue"),
+        )
+        .group_by(OrderItem.order_id)
+        .subquery()
+    )
+    day = _day_expr(db)
+    await db.execute(insert(models.SalesDaily).from_select(
+        ["day", "orders", "units", "revenue"],
+        select(
+            day,
+            func.count(Order.id),
+            func.coalesce(func.sum(items.c.units), 0),
+            func.coalesce(func.sum(items.c.revenue), 0),
+        )
+        .select_from(Order)
+        .outerjoin(items, items.c.order_id == Order.id)
+        .group_by(day),
+    ))
+    await db.execute(insert(models.SalesProduct).from_select(
+        ["product_id", "orders", "units", "revenue"],
+        select(
+            OrderItem.product_id,
+            func.count(),
+            func.sum(OrderItem.quantity),
+            func.coalesce(func.sum(amount), 0),
+        ).group_by(OrderItem.product_id),
+    ))
+    await db.commit()
+
+
+async def main():
+    async with models.SessionLocal() as db:
+        await rebuild(db)
+    print("Rollups de ventas recalculados.")
+    await models.engine.dispose()
+
+
+if __name__ == "__main__":
+    argparse.ArgumentParser(description=__doc__).parse_args()
+    asyncio.run(main())
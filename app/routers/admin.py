@@ -0,0 +1,36 @@
+from typing import Dict
+from fastapi import APIRouter, Depends, HTTPException
+from app import schemas
+from app.admission import controller
+from app.dependencies import get_current_user_dep, verify_api_key, verify_admin_key
+
+router = APIRouter(dependencies=[Depends(get_current_user_dep), Depends(verify_api_key)])
+
+# Estado del control de admisión (protegido)
+@router.get("/admission", response_model=Dict[str, schemas.AdmissionPool])
+async def get_admission():
+    """
+    Límites, peticiones en curso y en cola de cada grupo de admisión.
+
+    Requiere autenticación y una API Key.
+    """
+    return controller.stats()
+
+
+# Ajustar un grupo de admisión en caliente (solo operadores)
+@router.put("/admission/{pool}", response_model=schemas.AdmissionPool, dependencies=[Depends(verify_admin_key)])
+async def update_admission(pool: str, update: schemas.AdmissionPoolUpdate):
+    """
+    Cambia el límite, el tamaño de la cola o la espera máxima de un grupo
+    (`reads`, `writes`, `bulk` o `auth`). Los campos omitidos no cambian.
+
+    El cambio vale para esta instancia y hasta que se reinicie.
+
+    Requiere autenticación, una API Key y una key de operador en X-Admin-Key
+    (ADMIN_API_KEYS); sin keys de operador configuradas responde 403.
+    """
+    limiter = controller.pools.get(pool)
+    if limiter is None:
+        raise HTTPException(status_code=404, detail="Grupo de admisión desconocido")
+    limiter.configure(**update.model_dump(exclude_none=True))
+    return limiter.stats()
@@ -0,0 +1,55 @@
+from datetime import date
+from typing import List, Literal
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from app import schemas, crud
+from app.dependencies import get_read_db, get_current_user_dep, verify_api_key
+
+router = APIRouter(dependencies=[Depends(get_current_user_dep), Depends(verify_api_key)])
+
+# Ingresos por día (protegido)
+@router.get("/revenue/daily", response_model=List[schemas.DailySales])
+async def daily_revenue(
+    start: date | None = None,
+    end: date | None = None,
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    Pedidos, unidades e ingresos por día (UTC) entre `start` y `end`, inclusive.
+
+    Se lee del rollup `sales_daily`, que se actualiza al crear cada pedido.
+
+    Requiere autenticación y una API Key.
+    """
+    return await crud.get_daily_sales(db, start, end)
+
+
+# Ventas por producto (protegido)
+@router.get("/products", response_model=List[schemas.ProductSales])
+async def product_sales(
+    after_id: int | None = None,
+    limit: int = Query(100, ge=1, le=1000),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    Pedidos, unidades e ingresos acumulados por producto, paginados por ID:
+    para la página siguiente se envía el último `product_id` como `after_id`.
+
+    Requiere autenticación y una API Key.
+    """
+    return await crud.get_product_sales(db, after_id, limit)
+
+
+# Productos más vendidos (protegido)
+@router.get("/products/top", response_model=List[schemas.ProductSales])
+async def top_products(
+    by: Literal["revenue", "units"] = "revenue",
+    limit: int = Query(10, ge=1, le=100),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    Los productos con más ingresos (`by=revenue`) o más unidades vendidas (`by=units`).
+
+    Requiere autenticación y una API Key.
+    """
+    return await crud.get_top_products(db, by, limit)
@@ -7,9 +7,10 @@ from app.dependencies import get_db
 from app import crud, auth as auth_utils
 from datetime import timedelta
 from app.settings import settings
-import traceback
+import logging
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 @router.post("/login")
 async def login(
@@ -20,41 +21,26 @@ async def login(
     Inicia sesión con nombre de usuario y contraseña.
     Retorna un JWT válido para autenticación en los endpoints protegidos.
     """
+    logger.debug("Login recibido", extra={"username": form_data.username})
     try:
-        print("📥 Login recibido")
-        print("👤 Username:", form_data.username)
-        # ⚠️ En producción evita loguear contraseñas en texto claro
-        print("🔑 Password:", form_data.password)
-
         user = await crud.get_user_by_username(db, form_data.username)
-
-        if user:
-            print("✅ Usuario encontrado:", user.username)
-        else:
-            print("❌ Usuario no encontrado")
-
-        password_ok = False
-        if user:
-            password_ok = await crud.verify_user_password(user, form_data.password)
-            print("🔐 ¿Contraseña válida?", password_ok)
-
-        if not user or not password_ok:
+        password_ok = bool(user) and await crud.verify_user_password(user, form_data.password)
+        if not password_ok:
+            logger.info(
+                "Login rechazado",
+                extra={"username": form_data.username, "reason": "password" if user else "user"},
+            )
             # No será atrapado por el except general
             raise HTTPException(status_code=400, detail="Credenciales inválidas")
 
         access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-        token = auth_utils.create_access_token(
-            data={"sub": user.username},
-            expires_delta=access_token_expires
-        )
-
-        print("✅ Token generado")
+        token = auth_utils.create_user_token(user, expires_delta=access_token_expires)
+        logger.debug("Token generado", extra={"user_id": user.id})
         return {"access_token": token, "token_type": "bearer"}
 
     except HTTPException:
         # Las excepciones intencionadas de 400 pasan tal cual
         raise
-    except Exception as e:
-        print("🔥 ERROR INTERNO EN LOGIN:", e)
-        traceback.print_exc()
+    except Exception:
+        logger.exception("Error interno en login", extra={"username": form_data.username})
         raise HTTPException(status_code=500, detail="Error interno")
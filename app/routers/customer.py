@@ -1,7 +1,9 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from app import schemas, crud
-from app.dependencies import get_db, get_current_user_dep, verify_api_key
+from app import schemas, crud, importer
+from app.settings import settings
+from app.dependencies import get_db, get_read_db, get_current_user_dep, verify_api_key
+from app.responses import FastJSONResponse
 from fastapi.security import OAuth2PasswordBearer
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
@@ -33,15 +35,67 @@ async def create_customer(
     return customer
 
 
+# Importar clientes en masa (protegido)
+@router.post(
+    "/import",
+    response_model=schemas.ImportSummary,
+    dependencies=[Depends(get_current_user_dep), Depends(verify_api_key)]
+)
+async def import_customers(request: Request, db: AsyncSession = Depends(get_db)):
+    """
+    Importa clientes desde un cuerpo NDJSON (`application/x-ndjson`) o CSV
+    (`text/csv`, con cabecera `full_name,email`).
+
+    El archivo se procesa a medida que llega, sin cargarlo entero en memoria.
+    Los emails ya registrados o repetidos se cuentan como duplicados.
+    Devuelve los totales y los errores por línea.
+
+    Requiere autenticación y una API Key.
+    """
+    records = importer.iter_records(
+        request.stream(), request.headers.get("content-type", ""), settings.IMPORT_MAX_LINE_LENGTH
+    )
+    return await importer.run_import(
+        db, records, importer.CUSTOMERS, settings.IMPORT_CHUNK_SIZE, settings.IMPORT_MAX_ERRORS
+    )
+
+
 # Obtener cliente por ID (público)
 @router.get("/{customer_id}", response_model=schemas.CustomerResponse)
-async def get_customer(customer_id: int, db: AsyncSession = Depends(get_db)):
+async def get_customer(customer_id: int, db: AsyncSession = Depends(get_read_db)):
     """
     Obtiene información de un cliente por su ID.
 
     No requiere autenticación.
     """
-    customer = await crud.get_customer_by_id(db, customer_id)
+    customer = await crud.read_customer(db, customer_id)
     if not customer:
         raise HTTPException(status_code=404, detail="Cliente no encontrado")
-    return customer
+    # Ya tiene la forma de CustomerResponse: se serializa sin validarlo otra vez
+    return FastJSONResponse(customer)
+
+
+# Historial de pedidos de un cliente (público)
+@router.get("/{customer_id}/orders", response_model=schemas.OrderPage)
+async def list_customer_orders(
+    customer_id: int,
+    cursor: str | None = None,
+    limit: int = Query(settings.ORDERS_PAGE_SIZE, ge=1, le=settings.ORDERS_MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    Lista los pedidos de un cliente con sus ítems, del más reciente al más antiguo.
+
+    Para pedir la página siguiente se envía el `next_cursor` de la respuesta
+    como `cursor`. Cuando no hay más pedidos, `next_cursor` es null.
+
+    No requiere autenticación.
+    """
+    before = crud.decode_order_cursor(cursor) if cursor else None
+    orders, next_position = await crud.list_customer_orders(db, customer_id, before, limit)
+    if not orders and before is None and not await crud.get_customer_by_id(db, customer_id):
+        raise HTTPException(status_code=404, detail="Cliente no encontrado")
+    return schemas.OrderPage(
+        orders=orders,
+        next_cursor=crud.encode_order_cursor(*next_position) if next_position else None,
+    )
@@ -1,8 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from app import schemas, crud
-from app.dependencies import get_db, get_current_user_dep, verify_api_key
+from app.dependencies import get_db, get_read_db, get_current_user_dep, verify_api_key
+from app.responses import FastJSONResponse
 from typing import List
+from app.settings import settings
 
 router = APIRouter()
 
@@ -26,16 +28,43 @@ async def create_order(order_in: schemas.OrderCreate, db: AsyncSession = Depends
     return order
     
 
+#Crear pedidos en lote (protegido)
+@router.post(
+    "/batch",
+    response_model=schemas.OrderBatchResponse,
+    dependencies=[Depends(get_current_user_dep), Depends(verify_api_key)]
+)
+async def create_orders_batch(orders_in: List[schemas.OrderCreate], db: AsyncSession = Depends(get_db)):
+    """
+    Crea muchos pedidos en una sola petición (integraciones con marketplaces).
+
+    Devuelve un resultado por pedido, en el mismo orden del cuerpo: el pedido
+    creado o el motivo del rechazo. Los pedidos con referencias inexistentes no
+    impiden crear el resto.
+
+    Requiere autenticación y una API Key.
+    """
+    if not orders_in:
+        raise HTTPException(status_code=400, detail="Debe enviar al menos un pedido.")
+    if len(orders_in) > settings.ORDER_BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Se permiten como máximo {settings.ORDER_BATCH_MAX_SIZE} pedidos por lote.",
+        )
+    return await crud.create_orders_batch(db, orders_in, settings.ORDER_BATCH_CHUNK_SIZE)
+
+
 #Obtener pedido por ID (público)
 @router.get("/{order_id}", response_model=schemas.OrderResponse)
-async def get_order(order_id: int, db: AsyncSession = Depends(get_db)):
+async def get_order(order_id: int, db: AsyncSession = Depends(get_read_db)):
     """
     Obtiene un pedido existente por su ID.
 
     No requiere autenticación.
     """
-    order = await crud.get_order_by_id(db, order_id)
+    order = await crud.read_order(db, order_id)
     if not order:
         raise HTTPException(status_code=404, detail="Pedido no encontrado")
-    return order
+    # Ya tiene la forma de OrderResponse: se serializa sin validarlo otra vez
+    return FastJSONResponse(order)
     
\ No newline at end of file
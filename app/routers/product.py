@@ -1,9 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from app import schemas, crud
-from app.dependencies import get_db, get_current_user_dep, verify_api_key
-from typing import List
-from app.external import get_inventory_for_product
+from app import schemas, crud, importer
+from app.dependencies import get_db, get_read_db, read_session, get_current_user_dep, verify_api_key
+from app.catalog import catalog, product_json
+from typing import Dict, List
+from app.external import get_inventory_for_product, get_inventory_bulk, inventory_cache_stats
 from app.settings import settings
 
 router = APIRouter()
@@ -26,18 +28,122 @@ async def create_product(product_in: schemas.ProductCreate, db: AsyncSession = D
 
     """
     product = await crud.create_product(db, product_in)
+    # Nueva versión del catálogo: se reconstruye aquí y no en la lectura
+    await catalog.refresh()
     return product
     
+NDJSON = "application/x-ndjson"
+
+
+async def _stream_products_ndjson(request: Request, after_id: int | None):
+    # La sesión del endpoint se cierra antes de enviar el cuerpo: el stream abre la suya
+    async with read_session(request) as session:
+        async for rows in crud.stream_products(session, after_id, settings.PRODUCTS_STREAM_CHUNK_SIZE):
+            yield b"".join(product_json(row) + b"\n" for row in rows)
+
+
+#Importar productos en masa (protegido)
+@router.post(
+    "/import",
+    response_model=schemas.ImportSummary,
+    dependencies=[Depends(get_current_user_dep), Depends(verify_api_key)]
+)
+async def import_products(request: Request, db: AsyncSession = Depends(get_db)):
+    """
+    Importa productos desde un cuerpo NDJSON (`application/x-ndjson`) o CSV
+    (`text/csv`, con cabecera `name,price`).
+
+    El archivo se procesa a medida que llega, sin cargarlo entero en memoria.
+    Los nombres ya existentes o repetidos se cuentan como duplicados.
+    Devuelve los totales y los errores por línea.
+
+    Requiere autenticación y una API Key.
+    """
+    records = importer.iter_records(
+        request.stream(), request.headers.get("content-type", ""), settings.IMPORT_MAX_LINE_LENGTH
+    )
+    summary = await importer.run_import(
+        db, records, importer.PRODUCTS, settings.IMPORT_CHUNK_SIZE, settings.IMPORT_MAX_ERRORS
+    )
+    if summary.created:
+        await catalog.refresh()
+    return summary
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+
 #Listar productos (público)
 @router.get("/", response_model=List[schemas.ProductResponse])
-async def list_products(db: AsyncSession = Depends(get_db)):
+async def list_products(
+    request: Request,
+    after_id: int | None = Query(None, ge=0, description="Último ID de la página anterior"),
+    limit: int = Query(settings.PRODUCTS_PAGE_SIZE, ge=1, le=settings.PRODUCTS_MAX_PAGE_SIZE),
+):
     """
-    Lista todos los productos disponibles.
+    Lista los productos disponibles, paginados por ID.
+
+    Se sirve desde un snapshot del catálogo en memoria, sin consultar la base.
+    Si hay más productos, la cabecera `X-Next-Cursor` trae el `after_id` de la
+    página siguiente. Cada respuesta lleva un `ETag`; si el cliente lo reenvía
+    en `If-None-Match` y el catálogo no cambió, recibe un 304 sin cuerpo.
+    Con `Accept: application/x-ndjson` se transmite el catálogo completo
+    (a partir de `after_id`) como un producto por línea.
 
     No requiere autenticación.
     """
-    return await crud.list_products(db)
+    if NDJSON in request.headers.get("accept", ""):
+        return StreamingResponse(_stream_products_ndjson(request, after_id), media_type=NDJSON)
+
+    snapshot = await catalog.get()
+    body, etag, next_cursor = snapshot.page(after_id, limit)
+    headers = {"ETag": etag, "X-Catalog-Version": str(snapshot.version)}
+    if next_cursor is not None:
+        headers["X-Next-Cursor"] = str(next_cursor)
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
     
+#Consultar inventario externo de varios productos (público)
+@router.get("/inventory", response_model=Dict[int, schemas.InventoryResult])
+async def get_inventory_many(
+    ids: str = Query(..., description="IDs de producto separados por coma, p. ej. 1,2,3")
+):
+    """
+    Consulta en paralelo el inventario externo de varios productos.
+
+    Devuelve un resultado por id: `inventory` si la consulta fue bien o `error`
+    si falló, sin que un fallo invalide al resto.
+
+    No requiere autenticación.
+    """
+    try:
+        product_ids = [int(part) for part in ids.split(",") if part.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Los ids deben ser números enteros separados por coma")
+    if not product_ids or any(pid <= 0 for pid in product_ids):
+        raise HTTPException(status_code=400, detail="Debe indicar al menos un id de producto válido")
+    if len(set(product_ids)) > settings.INVENTORY_BULK_MAX_IDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Se permiten como máximo {settings.INVENTORY_BULK_MAX_IDS} productos por consulta",
+        )
+    return await get_inventory_bulk(product_ids, settings.INVENTORY_BULK_CONCURRENCY)
+
+#Métricas de la cache de inventario (público)
+@router.get("/inventory/stats")
+async def get_inventory_stats():
+    """
+    Devuelve aciertos, fallos, desalojos y consultas coalescidas de la cache de inventario.
+
+    No requiere autenticación.
+    """
+    return inventory_cache_stats()
+
 #Consultar inventario externo
 @router.get("/{product_id}")
 async def get_inventory(product_id: int):
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, EmailStr, Field, validator
 from typing import List
-from datetime import datetime
+from datetime import date, datetime
 from pydantic import field_validator
 # CUSTOMER
 
@@ -103,6 +103,11 @@ class ProductResponse(BaseModel):
         from_attributes = True
 
 
+class InventoryResult(BaseModel):
+    inventory: dict | None = None
+    error: str | None = None
+
+
 # ORDER ITEM
 
 class OrderItemCreate(BaseModel):
@@ -113,6 +118,7 @@ class OrderItemResponse(BaseModel):
     id: int
     product_id: int
     quantity: int
+    unit_price: float | None = None
 
     class Config:
         from_attributes = True
@@ -149,7 +155,80 @@ class OrderResponse(BaseModel):
     id: int
     customer_id: int
     created_at: datetime
+    subtotal: float | None = None
+    total: float | None = None
+    status: str = "pending"
     items: List[OrderItemResponse]
 
     class Config:
         from_attributes = True
+
+
+class OrderPage(BaseModel):
+    orders: List[OrderResponse]
+    next_cursor: str | None = None
+
+
+class OrderBatchResult(BaseModel):
+    index: int
+    order: OrderResponse | None = None
+    error: str | None = None
+
+
+class OrderBatchResponse(BaseModel):
+    created: int
+    failed: int
+    results: List[OrderBatchResult]
+
+
+# ANALYTICS
+
+class DailySales(BaseModel):
+    day: date
+    orders: int
+    units: int
+    revenue: float
+
+    class Config:
+        from_attributes = True
+
+
+class ProductSales(BaseModel):
+    product_id: int
+    orders: int
+    units: int
+    revenue: float
+
+    class Config:
+        from_attributes = True
+
+
+# IMPORTACIÓN MASIVA
+
+class ImportRowError(BaseModel):
+    line: int
+    error: str
+
+
+class ImportSummary(BaseModel):
+    received: int = 0
+    created: int = 0
+    duplicates: int = 0
+    failed: int = 0
+    errors: List[ImportRowError] = []
+
+
+# CONTROL DE ADMISIÓN
+
+class AdmissionPoolUpdate(BaseModel):
+    limit: int | None = Field(None, ge=1, description="Peticiones en curso permitidas")
+    queue_size: int | None = Field(None, ge=0, description="Peticiones que pueden esperar lugar")
+    max_wait: float | None = Field(None, gt=0, description="Segundos máximos de espera en la cola")
+
+
+class AdmissionPool(BaseModel):
+    limit: int
+    queue_size: int
+    max_wait: float
+    active: int
+    queued: int
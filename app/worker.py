@@ -0,0 +1,312 @@
+"""
+Worker de la cola `orders`: confirma los pedidos publicados por la API.
+
+    python -m app.worker --prefetch 200 --concurrency 4 --batch-size 100
+
+Cada mensaje `order_created` pasa su pedido de `pending` a `confirmed`. Los
+mensajes se agrupan en lotes (hasta `batch-size` mensajes o
+WORKER_FLUSH_INTERVAL_MS, lo que ocurra primero) y cada lote es un único
+UPDATE ... WHERE id IN (...) en su propia transacción. El ack al broker se
+envía recién después del commit: si el worker se corta a mitad de un lote, el
+broker reentrega esos mensajes. Confirmar es idempotente, así que una
+reentrega no cambia nada.
+
+`prefetch` acota los mensajes sin ack que el broker entrega a la vez (y con
+eso el buffer del worker); `concurrency` es la cantidad de lotes que se
+procesan en paralelo, cada uno con su sesión.
+
+Los mensajes venenosos (cuerpo que no es JSON, sin `order_id` válido o de un
+pedido que no existe) se copian a la cola `orders.dead` con el motivo en la
+cabecera `x-error` y se quitan de `orders`. Si falla la base, el lote se
+reintenta por mitades para aislar los mensajes que fallan solos: esos vuelven a
+`orders` después de WORKER_RETRY_DELAY segundos con el intento en la cabecera
+`x-retry-count`, y al llegar a WORKER_MAX_RETRIES van a la cola de muertos. Así
+un mensaje que la base rechaza no hace reintentar para siempre al resto de su
+lote.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import signal
+import aio_pika
+from sqlalchemy import update
+from sqlalchemy.future import select
+from app import logs, models
+from app.queue import ORDERS_QUEUE
+from app.settings import settings
+
+DEAD_LETTER_QUEUE = f"{ORDERS_QUEUE}.dead"
+RETRY_HEADER = "x-retry-count"
+# orders.id es INTEGER: un ID mayor hace fallar la consulta de todo el lote
+MAX_ORDER_ID = 2**31 - 1
+
+logger = logging.getLogger(__name__)
+
+
+class PoisonMessage(Exception):
+    """Mensaje que nunca se va a poder procesar: va a la cola de mensajes muertos."""
+
+
+def parse_order_id(body: bytes) -> int:
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        raise PoisonMessage("invalid_json") from None
+    order_id = payload.get("order_id") if isinstance(payload, dict) else None
+    if type(order_id) is not int or not 0 < order_id <= MAX_ORDER_ID:
+        raise PoisonMessage("invalid_order_id")
+    return order_id
+
+
+def retry_count(message) -> int:
+    """
+    Intentos fallidos anteriores del mensaje: la cabecera `x-retry-count`, o 1
+    si el broker lo reentrega sin ella (p. ej. se cortó el worker que lo tenía).
+    """
+    count = (message.headers or {}).get(RETRY_HEADER)
+    if type(count) is int and count >= 0:
+        return count
+    return 1 if message.redelivered else 0
+
+
+async def confirm_orders(db, order_ids: list[int]) -> set[int]:
+    """
+    Pasa a `confirmed` los pedidos pendientes de `order_ids` con un solo UPDATE
+    y devuelve cuáles de esos IDs existen. No hace commit.
+    """
+    result = await db.execute(select(models.Order.id).where(models.Order.id.in_(order_ids)))
+    existing = set(result.scalars().all())
+    await db.execute(
+        update(models.Order)
+        .where(models.Order.id.in_(order_ids), models.Order.status == models.ORDER_PENDING)
+        .values(status=models.ORDER_CONFIRMED)
+    )
+    return existing
+
+
+class OrderWorker:
+    """Consumidor de la cola de pedidos con lotes, ack después del commit y cola de muertos."""
+
+    def __init__(
+        self,
+        url: str,
+        session_factory,
+        queue_name: str = ORDERS_QUEUE,
+        dead_letter_queue: str = DEAD_LETTER_QUEUE,
+        prefetch: int = 200,
+        concurrency: int = 4,
+        batch_size: int = 100,
+        flush_interval: float = 0.05,
+        retry_delay: float = 1,
+        max_retries: int = 5,
+    ):
+        self.url = url
+        self.session_factory = session_factory
+        self.queue_name = queue_name
+        self.dead_letter_queue = dead_letter_queue
+        self.prefetch = prefetch
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retry_delay = retry_delay
+        self.max_retries = max_retries
+        self.processed = 0
+        self.dead_lettered = 0
+        self.retried = 0
+        self.batches = 0
+        self._buffer: asyncio.Queue = asyncio.Queue()
+        self._connection = None
+        self._channel = None
+        self._queue = None
+        self._consumer_tag = None
+        self._workers: list[asyncio.Task] = []
+
+    @property
+    def running(self) -> bool:
+        return self._connection is not None
+
+    async def start(self) -> None:
+        """Abre la conexión, declara las colas y empieza a consumir."""
+        self._connection = await aio_pika.connect_robust(self.url)
+        # Con confirmaciones: un mensaje muerto se quita de `orders` solo si llegó a `orders.dead`
+        self._channel = await self._connection.channel(publisher_confirms=True)
+        await self._channel.set_qos(prefetch_count=self.prefetch)
+        self._queue = await self._channel.declare_queue(self.queue_name, durable=True)
+        await self._channel.declare_queue(self.dead_letter_queue, durable=True)
+        self._workers = [asyncio.create_task(self._run()) for _ in range(self.concurrency)]
+        self._consumer_tag = await self._queue.consume(self._buffer.put)
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._buffer.get()]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(await asyncio.wait_for(self._buffer.get(), deadline - loop.time()))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                await self.process(batch)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # P. ej. un publish a la cola de muertos sin confirmar o un ack que falla
+                logger.exception("Error procesando un lote de %s mensajes; se reintentan", len(batch))
+                await self._retry(batch)
+            finally:
+                for _ in batch:
+                    self._buffer.task_done()
+
+    async def process(self, messages: list) -> None:
+        """Confirma los pedidos de un lote con un UPDATE y un commit, y recién entonces hace ack."""
+        valid = []
+        for message in messages:
+            try:
+                valid.append((parse_order_id(message.body), message))
+            except PoisonMessage as exc:
+                await self._dead_letter(message, str(exc))
+        failed = await self._confirm(valid) if valid else []
+        if failed:
+            await self._retry(failed)
+
+    async def _confirm(self, valid: list[tuple[int, object]]) -> list:
+        """
+        Confirma `valid` (pares de ID y mensaje) en una transacción. Si falla,
+        prueba cada mitad por separado y devuelve los mensajes que fallaron solos.
+        """
+        try:
+            async with self.session_factory() as db:
+                existing = await confirm_orders(db, [order_id for order_id, _ in valid])
+                await db.commit()
+        except Exception:
+            if len(valid) == 1:
+                logger.exception("No se pudo confirmar el pedido %s", valid[0][0])
+                return [valid[0][1]]
+            middle = len(valid) // 2
+            return await self._confirm(valid[:middle]) + await self._confirm(valid[middle:])
+        self.batches += 1
+        for order_id, message in valid:
+            if order_id in existing:
+                await message.ack()
+                self.processed += 1
+            else:
+                await self._dead_letter(message, "unknown_order")
+        return []
+
+    async def _retry(self, messages: list) -> None:
+        """
+        Después de WORKER_RETRY_DELAY, vuelve a publicar en la cola los mensajes
+        que no tuvieron ack ni nack, con un intento más en `x-retry-count`, o los
+        manda a la cola de muertos si ya agotaron los reintentos. Si quedaran sin
+        resolver ocuparían su lugar del prefetch mientras el canal siga abierto,
+        y con `prefetch` de ellos el worker se detiene.
+        """
+        await asyncio.sleep(self.retry_delay)
+        for message in messages:
+            if message.processed:
+                continue
+            retries = retry_count(message) + 1
+            try:
+                if retries > self.max_retries:
+                    await self._dead_letter(message, "max_retries")
+                    continue
+                await self._publish(message, self.queue_name, {RETRY_HEADER: retries})
+                await message.ack()
+                self.retried += 1
+            except Exception:
+                logger.exception("No se pudo reintentar un mensaje; vuelve a la cola")
+                if not message.processed:
+                    await self._nack(message)
+
+    async def _nack(self, message) -> None:
+        try:
+            await message.nack(requeue=True)
+        except Exception:
+            logger.exception("No se pudo devolver un mensaje a la cola")
+
+    async def _publish(self, message, routing_key: str, headers: dict) -> None:
+        # Canal con confirmaciones: recién después se hace ack del original
+        await self._channel.default_exchange.publish(
+            aio_pika.Message(
+                body=message.body,
+                content_type=message.content_type,
+                headers={**(message.headers or {}), **headers},
+                delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
+            ),
+            routing_key=routing_key,
+        )
+
+    async def _dead_letter(self, message, reason: str) -> None:
+        await self._publish(
+            message, self.dead_letter_queue, {"x-error": reason, "x-original-queue": self.queue_name}
+        )
+        await message.ack()
+        self.dead_lettered += 1
+        logger.warning("Mensaje enviado a %s", self.dead_letter_queue, extra={"reason": reason})
+
+    async def stop(self, timeout: float | None = None) -> None:
+        """Deja de consumir, termina los lotes en curso (con un tiempo máximo) y cierra."""
+        if not self.running:
+            return
+        await self._queue.cancel(self._consumer_tag)
+        try:
+            await asyncio.wait_for(self._buffer.join(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Cierre con %s mensajes sin procesar; el broker los reentrega", self._buffer.qsize())
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        await self._connection.close()
+        self._connection = None
+
+
+async def run(args) -> None:
+    logs.setup_logging(
+        level=settings.LOG_LEVEL,
+        module_levels=logs.parse_levels(settings.LOG_LEVELS),
+        debug_sample_rate=settings.LOG_DEBUG_SAMPLE_RATE,
+        sql_echo=settings.SQL_ECHO,
+        json_output=settings.LOG_JSON,
+    )
+    worker = OrderWorker(
+        settings.RABBITMQ_URL,
+        models.SessionLocal,
+        prefetch=args.prefetch,
+        concurrency=args.concurrency,
+        batch_size=args.batch_size,
+        flush_interval=settings.WORKER_FLUSH_INTERVAL_MS / 1000,
+        retry_delay=settings.WORKER_RETRY_DELAY,
+        max_retries=settings.WORKER_MAX_RETRIES,
+    )
+    await worker.start()
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stopping.set)
+    logger.info(
+        "Worker de pedidos iniciado",
+        extra={"prefetch": args.prefetch, "concurrency": args.concurrency, "batch_size": args.batch_size},
+    )
+    try:
+        await stopping.wait()
+    finally:
+        await worker.stop(timeout=settings.WORKER_SHUTDOWN_TIMEOUT)
+        logger.info("Worker de pedidos detenido", extra={
+            "processed": worker.processed, "retried": worker.retried, "dead_lettered": worker.dead_lettered,
+        })
+        await models.engine.dispose()
+        logs.stop_logging()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--prefetch", type=int, default=settings.WORKER_PREFETCH)
+    parser.add_argument("--concurrency", type=int, default=settings.WORKER_CONCURRENCY)
+    parser.add_argument("--batch-size", type=int, default=settings.WORKER_BATCH_SIZE)
+    args = parser.parse_args()
+    if not settings.RABBITMQ_URL:
+        parser.error("RABBITMQ_URL no está configurada (¿ENV de testing?)")
+    asyncio.run(run(args))
@@ -0,0 +1,123 @@
+"""
+Agregación en vivo sobre order_items frente a lectura de los rollups de ventas.
+
+Carga pedidos repartidos en un año en un SQLite temporal, reconstruye los
+rollups con `app.rollups.rebuild` y mide ingresos por día, unidades por
+producto y top-10 por ingresos con ambas estrategias.
+
+    python -m bench.bench_analytics --orders 300000 --items 3 --products 2000
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+os.environ.setdefault(
+    "DATABASE_URL", f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/bench_analytics.db"
+)
+
+from sqlalchemy import func, insert, select  # noqa: E402
+
+from app import crud, models, rollups  # noqa: E402
+
+CHUNK = 20_000
+
+
+async def setup(orders: int, items: int, products: int):
+    models.engine.echo = False
+    async with models.engine.begin() as conn:
+        await conn.run_sync(models.Base.metadata.drop_all)
+        await conn.run_sync(models.Base.metadata.create_all)
+    rng = random.Random(42)
+    prices = {i: round(rng.uniform(1, 100), 2) for i in range(1, products + 1)}
+    start = datetime(2025, 1, 1)
+    async with models.SessionLocal() as db:
+        db.add(models.Customer(full_name="Bench", email="bench@example.com"))
+        await db.execute(insert(models.Product), [
+            {"id": i, "name": f"Producto {i}", "price": price} for i, price in prices.items()
+        ])
+        for first in range(1, orders + 1, CHUNK):
+            ids = range(first, min(first + CHUNK, orders + 1))
+            order_rows, item_rows = [], []
+            for i in ids:
+                chosen = rng.sample(range(1, products + 1), items)
+                lines = [(p, rng.randint(1, 5)) for p in chosen]
+                subtotal = round(sum(prices[p] * q for p, q in lines), 2)
+                order_rows.append({
+                    "id": i, "customer_id": 1, "subtotal": subtotal, "total": subtotal,
+                    "created_at": start + timedelta(seconds=rng.randrange(365 * 86400)),
+                })
+                item_rows.extend(
+                    {"order_id": i, "product_id": p, "quantity": q, "unit_price": prices[p]}
+                    for p, q in lines
+                )
+            await db.execute(insert(models.Order), order_rows)
+            await db.execute(insert(models.OrderItem), item_rows)
+            await db.commit()
+        await rollups.rebuild(db)
+
+
+def live_queries():
+    Order, OrderItem, Product = models.Order, models.OrderItem, models.Product
+    day = func.date(Order.created_at)
+    revenue = func.sum(OrderItem.quantity * Product.price)
+    return {
+        "ingresos por día": select(day, func.count(func.distinct(Order.id)), func.sum(OrderItem.quantity), revenue)
+            .join(OrderItem, OrderItem.order_id == Order.id)
+            .join(Product, Product.id == OrderItem.product_id)
+            .group_by(day).order_by(day),
+        "unidades por producto": select(OrderItem.product_id, func.count(), func.sum(OrderItem.quantity), revenue)
+            .join(Product, Product.id == OrderItem.product_id)
+            .group_by(OrderItem.product_id).order_by(OrderItem.product_id),
+        "top 10 por ingresos": select(OrderItem.product_id, revenue.label("revenue"))
+            .join(Product, Product.id == OrderItem.product_id)
+            .group_by(OrderItem.product_id).order_by(revenue.desc()).limit(10),
+    }
+
+
+async def timed(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+async def main(args):
+    start = time.perf_counter()
+    await setup(args.orders, args.items, args.products)
+    print(f"carga de {args.orders} pedidos y rebuild: {time.perf_counter() - start:.1f}s")
+
+    rollup_reads = {
+        "ingresos por día": lambda db: crud.get_daily_sales(db),
+        "unidades por producto": lambda db: crud.get_product_sales(db, limit=args.products),
+        "top 10 por ingresos": lambda db: crud.get_top_products(db, "revenue", 10),
+    }
+    print(f"{'consulta':<24} {'en vivo (ms)':>13} {'rollup (ms)':>12} {'x':>8}")
+    async with models.SessionLocal() as db:
+        for name, query in live_queries().items():
+            async def live():
+                (await db.execute(query)).all()
+
+            async def rollup():
+                await rollup_reads[name](db)
+                db.expunge_all()
+
+            live_ms = await timed(live, args.repeat)
+            rollup_ms = await timed(rollup, args.repeat)
+            print(f"{name:<24} {live_ms:>13.2f} {rollup_ms:>12.2f} {live_ms / rollup_ms:>8.1f}")
+    await models.engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--orders", type=int, default=300_000)
+    parser.add_argument("--items", type=int, default=3)
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    asyncio.run(main(parser.parse_args()))
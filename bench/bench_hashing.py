@@ -0,0 +1,98 @@
+"""
+p99 de GET /products/ mientras corren logins concurrentes.
+
+Compara bcrypt ejecutado dentro del event loop (como antes) con el pool de
+hilos de `app.hashing`. El catálogo se sirve desde el snapshot en memoria,
+así que la latencia medida es la del propio event loop.
+
+    python -m bench.bench_hashing --logins 40 --reads 200
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from unittest.mock import AsyncMock
+
+import httpx
+
+from app import crud, models
+from app.hashing import get_pwd_context, hasher
+from app.main import app
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def inline_verify(password, hashed_password):
+    # Comportamiento anterior: bcrypt bloquea el loop
+    return get_pwd_context().verify(password, hashed_password)
+
+
+async def run(client, user, logins: int, reads: int, interval: float = 0.005) -> list[float]:
+    """
+    Lee el catálogo a ritmo fijo durante toda la ráfaga de logins (y al menos
+    `reads` veces). La latencia se mide desde el instante en que la lectura
+    debía salir, así un loop bloqueado cuenta para todas las lecturas retrasadas.
+    """
+    latencies = []
+    done = asyncio.Event()
+
+    async def read(intended):
+        resp = await client.get("/products/")
+        assert resp.status_code == 200
+        latencies.append((time.perf_counter() - intended) * 1000)
+
+    async def reader():
+        tasks = []
+        start = time.perf_counter()
+        while not done.is_set() or len(tasks) < reads:
+            intended = start + len(tasks) * interval
+            delay = intended - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(read(intended)))
+        await asyncio.gather(*tasks)
+
+    async def login():
+        assert await crud.verify_user_password(user, "secret123")
+
+    async def burst():
+        await asyncio.gather(*(login() for _ in range(logins)))
+        done.set()
+
+    await asyncio.gather(reader(), burst())
+    return latencies
+
+
+async def main(args):
+    crud.list_products = AsyncMock(return_value=[
+        models.Product(id=i, name=f"Producto {i}", price=10.0 + i) for i in range(1, 51)
+    ])
+    user = type("U", (), {"hashed_password": get_pwd_context().hash("secret123")})()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await client.get("/products/")  # construye el snapshot
+
+        baseline = await run(client, user, 0, args.reads)
+        pooled = await run(client, user, args.logins, args.reads)
+        original = hasher.verify
+        hasher.verify = inline_verify
+        inline = await run(client, user, args.logins, args.reads)
+        hasher.verify = original
+
+    for name, samples in (("sin logins", baseline), ("bcrypt en loop", inline), ("bcrypt en pool", pooled)):
+        print(
+            f"{name:<15} p50={statistics.median(samples):8.3f}ms "
+            f"p99={percentile(samples, 99):8.3f}ms max={max(samples):8.3f}ms n={len(samples)}"
+        )
+    print("hasher:", hasher.stats())
+    hasher.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--logins", type=int, default=40)
+    parser.add_argument("--reads", type=int, default=200)
+    asyncio.run(main(parser.parse_args()))
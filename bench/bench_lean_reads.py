@@ -0,0 +1,140 @@
+"""
+Lecturas con ORM + response_model frente al camino por columnas + orjson.
+
+Monta junto a las rutas reales las versiones anteriores de GET /customers/{id}
+y GET /orders/{id} (entidades, selectinload y validación de `response_model`)
+y compara, por petición, tiempo de CPU y memoria asignada (tracemalloc), y que
+los cuerpos sean idénticos byte a byte. También mide la reconstrucción del
+snapshot del catálogo (base de GET /products/) con entidades y con filas.
+
+    python -m bench.bench_lean_reads --requests 2000 --items 50 --products 10000
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+os.environ.setdefault(
+    "DATABASE_URL", f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/bench_lean_reads.db"
+)
+
+import httpx  # noqa: E402
+from fastapi import Depends, HTTPException  # noqa: E402
+from sqlalchemy import insert, select  # noqa: E402
+
+from app import crud, models, schemas  # noqa: E402
+from app.catalog import CatalogSnapshot, catalog  # noqa: E402
+from app.dependencies import get_read_db  # noqa: E402
+from app.main import app  # noqa: E402
+
+
+async def legacy_get_customer(customer_id: int, db=Depends(get_read_db)):
+    customer = await crud.get_customer_by_id(db, customer_id)
+    if not customer:
+        raise HTTPException(status_code=404, detail="Cliente no encontrado")
+    return customer
+
+
+async def legacy_get_order(order_id: int, db=Depends(get_read_db)):
+    order = await crud.get_order_by_id(db, order_id)
+    if not order:
+        raise HTTPException(status_code=404, detail="Pedido no encontrado")
+    return order
+
+
+async def legacy_catalog_load(db) -> CatalogSnapshot:
+    """Snapshot como se armaba antes: entidades y un modelo pydantic por producto."""
+    result = await db.execute(select(models.Product).order_by(models.Product.id))
+    ids, rows = [], []
+    for product in result.scalars().all():
+        data = schemas.ProductResponse.model_validate(product)
+        ids.append(data.id)
+        rows.append(data.model_dump_json().encode())
+    return CatalogSnapshot(0, tuple(ids), tuple(rows))
+
+
+async def setup(items: int, products: int):
+    async with models.engine.begin() as conn:
+        await conn.run_sync(models.Base.metadata.drop_all)
+        await conn.run_sync(models.Base.metadata.create_all)
+    async with models.SessionLocal() as db:
+        db.add(models.Customer(id=1, full_name="José Núñez", email="jose@example.com"))
+        await db.execute(insert(models.Product), [
+            {"id": i, "name": f"Producto {i}", "price": round(1 + i * 0.37, 2)} for i in range(1, products + 1)
+        ])
+        await db.execute(insert(models.Order), [{
+            "id": 1, "customer_id": 1, "subtotal": 123.45, "total": 123.45,
+            "created_at": datetime(2025, 8, 1, 12, 0, 0, 123456, tzinfo=timezone.utc),
+        }])
+        await db.execute(insert(models.OrderItem), [
+            {"order_id": 1, "product_id": i, "quantity": 2, "unit_price": round(1 + i * 0.37, 2)}
+            for i in range(1, items + 1)
+        ])
+        await db.commit()
+
+
+async def per_request(client, path: str, requests: int) -> tuple[float, float, bytes]:
+    """(µs de CPU por petición, bytes asignados por petición, cuerpo)."""
+    body = (await client.get(path)).content
+    cpu = time.process_time()
+    for _ in range(requests):
+        await client.get(path)
+    cpu_us = (time.process_time() - cpu) / requests * 1e6
+
+    samples = min(requests, 200)
+    allocated = 0
+    tracemalloc.start()
+    for _ in range(samples):
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        await client.get(path)
+        # Memoria de una petición: pico menos lo que ya estaba vivo antes
+        allocated += tracemalloc.get_traced_memory()[1] - before
+    tracemalloc.stop()
+    return cpu_us, allocated / samples, body
+
+
+async def catalog_build_ms(load) -> float:
+    best = float("inf")
+    for _ in range(3):
+        async with models.SessionLocal() as db:
+            start = time.process_time()
+            await load(db)
+            best = min(best, (time.process_time() - start) * 1000)
+    return best
+
+
+async def main(args):
+    await setup(args.items, args.products)
+    app.router.add_api_route("/legacy/customers/{customer_id}", legacy_get_customer,
+                             response_model=schemas.CustomerResponse)
+    app.router.add_api_route("/legacy/orders/{order_id}", legacy_get_order,
+                             response_model=schemas.OrderResponse)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for name, path in (("customer", "/customers/1"), (f"order ({args.items} ítems)", "/orders/1")):
+            old_cpu, old_mem, old_body = await per_request(client, "/legacy" + path, args.requests)
+            new_cpu, new_mem, new_body = await per_request(client, path, args.requests)
+            print(f"{name:<18} CPU {old_cpu:8.1f} -> {new_cpu:8.1f} µs/petición ({new_cpu / old_cpu - 1:+.0%})  "
+                  f"memoria {old_mem / 1024:7.1f} -> {new_mem / 1024:7.1f} KiB  "
+                  f"cuerpo idéntico: {old_body == new_body}")
+
+    old_ms = await catalog_build_ms(legacy_catalog_load)
+    new_ms = await catalog_build_ms(catalog._load)
+    async with models.SessionLocal() as db:
+        same = (await legacy_catalog_load(db)).rows == (await catalog._load(db)).rows
+    print(f"snapshot catálogo ({args.products} productos): {old_ms:.1f} -> {new_ms:.1f} ms de CPU, "
+          f"filas idénticas: {same}")
+    await models.engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--items", type=int, default=50)
+    parser.add_argument("--products", type=int, default=10000)
+    asyncio.run(main(parser.parse_args()))
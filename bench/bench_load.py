@@ -0,0 +1,303 @@
+"""
+Prueba de carga de la aplicación completa con percentiles por endpoint.
+
+Levanta `app.main:app` con su lifespan (catálogo, relay del outbox, publicador)
+contra la base de DATABASE_URL (por defecto un SQLite temporal; también sirve
+una Postgres local), con un broker RabbitMQ falso en proceso y un servicio de
+inventario simulado con `httpx.MockTransport`. Corre los escenarios pedidos con
+`--concurrency` clientes simultáneos y escribe throughput y p50/p95/p99 de cada
+endpoint en JSON.
+
+Escenarios:
+    browse  catálogo paginado, inventario de un producto y de varios
+    login   POST /auth/login (bcrypt con las rondas reales: --login-iterations)
+    orders  alta de pedidos de 1 a 3 productos
+    read    pedido por id, historial del cliente y cliente por id
+
+Con `--baseline` compara contra un reporte anterior y termina con código 1 si
+algún endpoint empeora más que `--threshold` en p95, p99 o throughput.
+
+    python -m bench.bench_load --iterations 300 --concurrency 20 --output load.json
+    python -m bench.bench_load --baseline load.json --threshold 0.25
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from collections import defaultdict
+
+os.environ.setdefault(
+    "DATABASE_URL", f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/bench_load.db"
+)
+# Fuera de "testing" para que arranquen el publicador y el cliente de inventario
+os.environ.setdefault("ENV", "bench")
+os.environ.setdefault("INVENTORY_API_URL", "http://inventory.bench/products")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import aio_pika  # noqa: E402
+import httpx  # noqa: E402
+from sqlalchemy import insert  # noqa: E402
+
+from app import external, models  # noqa: E402
+from app.main import app  # noqa: E402
+from bench.bench_queue import FakeBroker  # noqa: E402
+
+SCENARIOS = ("browse", "login", "orders", "read")
+PASSWORD = "secret123"
+# Por debajo de estas muestras el p99 son las 2-3 peores peticiones: solo ruido
+MIN_P99_SAMPLES = 500
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class Recorder:
+    """Latencias y errores por endpoint (etiqueta "MÉTODO /ruta/{param}")."""
+
+    def __init__(self, client: httpx.AsyncClient):
+        self.client = client
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.errors: dict[str, int] = defaultdict(int)
+
+    async def call(self, label: str, method: str, url: str, expected=(200,), **kwargs) -> httpx.Response:
+        start = time.perf_counter()
+        resp = await self.client.request(method, url, **kwargs)
+        self.latencies[label].append((time.perf_counter() - start) * 1000)
+        if resp.status_code not in expected:
+            self.errors[label] += 1
+        return resp
+
+    def report(self, elapsed: float) -> dict:
+        endpoints = {}
+        for label, samples in sorted(self.latencies.items()):
+            endpoints[label] = {
+                "requests": len(samples),
+                "errors": self.errors[label],
+                "rps": round(len(samples) / elapsed, 1),
+                "mean_ms": round(statistics.fmean(samples), 3),
+                "p50_ms": round(percentile(samples, 50), 3),
+                "p95_ms": round(percentile(samples, 95), 3),
+                "p99_ms": round(percentile(samples, 99), 3),
+                "max_ms": round(max(samples), 3),
+            }
+        return {"duration_s": round(elapsed, 3), "endpoints": endpoints}
+
+
+class LoadState:
+    """Datos sembrados y credenciales que comparten los escenarios."""
+
+    def __init__(self, rng: random.Random):
+        self.rng = rng
+        self.username = f"load{uuid.uuid4().hex[:8]}"
+        self.headers: dict[str, str] = {}
+        self.customer_ids: list[int] = []
+        self.product_ids: list[int] = []
+        self.order_ids: list[int] = []
+
+    def order_payload(self) -> dict:
+        products = self.rng.sample(self.product_ids, self.rng.randint(1, 3))
+        return {
+            "customer_id": self.rng.choice(self.customer_ids),
+            "items": [{"product_id": pid, "quantity": self.rng.randint(1, 5)} for pid in products],
+        }
+
+
+async def browse(rec: Recorder, state: LoadState):
+    after_id = state.rng.choice([0, *state.product_ids[::50]])
+    await rec.call("GET /products/", "GET", "/products/", params={"after_id": after_id, "limit": 50})
+    pid = state.rng.choice(state.product_ids)
+    await rec.call("GET /products/{product_id}", "GET", f"/products/{pid}")
+    ids = ",".join(str(p) for p in state.rng.sample(state.product_ids, 5))
+    await rec.call("GET /products/inventory", "GET", "/products/inventory", params={"ids": ids})
+
+
+async def login(rec: Recorder, state: LoadState):
+    await rec.call(
+        "POST /auth/login", "POST", "/auth/login",
+        data={"username": state.username, "password": PASSWORD},
+    )
+
+
+async def orders(rec: Recorder, state: LoadState):
+    resp = await rec.call(
+        "POST /orders/", "POST", "/orders/", expected=(201,),
+        json=state.order_payload(), headers=state.headers,
+    )
+    if resp.status_code == 201:
+        state.order_ids.append(resp.json()["id"])
+
+
+async def read(rec: Recorder, state: LoadState):
+    await rec.call("GET /orders/{order_id}", "GET", f"/orders/{state.rng.choice(state.order_ids)}")
+    customer_id = state.rng.choice(state.customer_ids)
+    await rec.call(
+        "GET /customers/{customer_id}/orders", "GET", f"/customers/{customer_id}/orders",
+        params={"limit": 20},
+    )
+    await rec.call("GET /customers/{customer_id}", "GET", f"/customers/{customer_id}")
+
+
+async def seed(client: httpx.AsyncClient, state: LoadState, customers: int, products: int, orders_count: int):
+    """Clientes y productos directo en la base; usuario, API Key y pedidos iniciales por la API."""
+    run = uuid.uuid4().hex[:8]
+    async with models.SessionLocal() as db:
+        state.customer_ids = list((await db.execute(
+            insert(models.Customer).returning(models.Customer.id),
+            [{"full_name": f"Cliente {i}", "email": f"load{i}-{run}@example.com"} for i in range(customers)],
+        )).scalars())
+        state.product_ids = list((await db.execute(
+            insert(models.Product).returning(models.Product.id),
+            [{"name": f"Producto {run} {i}", "price": round(state.rng.uniform(1, 100), 2)} for i in range(products)],
+        )).scalars())
+        await db.commit()
+
+    resp = await client.post("/users/", json={"username": state.username, "password": PASSWORD})
+    resp.raise_for_status()
+    resp = await client.post(f"/users/{resp.json()['id']}/api-key")
+    resp.raise_for_status()
+    api_key = resp.json()["key"]
+    resp = await client.post("/auth/login", data={"username": state.username, "password": PASSWORD})
+    resp.raise_for_status()
+    token = resp.json()["access_token"]
+    state.headers = {"Authorization": f"Bearer {token}", "X-API-Key": api_key}
+    for _ in range(orders_count):
+        resp = await client.post("/orders/", json=state.order_payload(), headers=state.headers)
+        resp.raise_for_status()
+        state.order_ids.append(resp.json()["id"])
+
+
+def _inventory_stub(latency: float):
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(latency)
+        product_id = int(request.url.path.rsplit("/", 1)[-1])
+        return httpx.Response(200, json={"id": product_id, "stock": 100})
+
+    return lambda: httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+async def run_scenario(client, state, scenario, iterations: int, concurrency: int) -> dict:
+    rec = Recorder(client)
+    remaining = iter(range(iterations))
+
+    async def worker():
+        for _ in remaining:
+            await scenario(rec, state)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return rec.report(time.perf_counter() - start)
+
+
+def compare(baseline: dict, current: dict, threshold: float, min_delta_ms: float) -> list[str]:
+    """
+    Regresiones de `current` frente a `baseline`: p95/p99 que suben más de
+    `threshold` (y más de `min_delta_ms`, para no saltar por ruido en
+    latencias de microsegundos), o throughput que baja más de `threshold`.
+    El p99 solo se compara con al menos MIN_P99_SAMPLES peticiones.
+    """
+    regressions = []
+    for name, scenario in baseline["scenarios"].items():
+        for label, before in scenario["endpoints"].items():
+            after = current["scenarios"].get(name, {}).get("endpoints", {}).get(label)
+            if after is None:
+                continue
+            keys = ["p95_ms"]
+            if min(before["requests"], after["requests"]) >= MIN_P99_SAMPLES:
+                keys.append("p99_ms")
+            for key in keys:
+                if (after[key] > before[key] * (1 + threshold)
+                        and after[key] - before[key] > min_delta_ms):
+                    regressions.append(f"{name} {label}: {key} {before[key]} -> {after[key]}")
+            if after["rps"] < before["rps"] * (1 - threshold):
+                regressions.append(f"{name} {label}: rps {before['rps']} -> {after['rps']}")
+            if after["errors"] > before["errors"]:
+                regressions.append(f"{name} {label}: errores {before['errors']} -> {after['errors']}")
+    return regressions
+
+
+def print_report(report: dict):
+    print(f"{'escenario':<8} {'endpoint':<38} {'req':>6} {'err':>4} {'rps':>8} "
+          f"{'p50':>8} {'p95':>8} {'p99':>8}")
+    for name, scenario in report["scenarios"].items():
+        for label, stats in scenario["endpoints"].items():
+            print(f"{name:<8} {label:<38} {stats['requests']:>6} {stats['errors']:>4} {stats['rps']:>8.1f} "
+                  f"{stats['p50_ms']:>8.2f} {stats['p95_ms']:>8.2f} {stats['p99_ms']:>8.2f}")
+
+
+async def main(args) -> dict:
+    broker = FakeBroker(args.broker_rtt_ms / 1000)
+    aio_pika.connect_robust = broker.connect_robust
+    external._new_client = _inventory_stub(args.inventory_latency_ms / 1000)
+
+    async with models.engine.begin() as conn:
+        await conn.run_sync(models.Base.metadata.create_all)
+
+    state = LoadState(random.Random(args.seed))
+    report = {
+        "config": {
+            "database": models.engine.dialect.name,
+            "concurrency": args.concurrency,
+            "iterations": args.iterations,
+            "login_iterations": args.login_iterations,
+            "scenarios": args.scenarios,
+        },
+        "scenarios": {},
+    }
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            await seed(client, state, args.customers, args.products, args.seed_orders)
+            scenarios = {"browse": browse, "login": login, "orders": orders, "read": read}
+            for name in args.scenarios:
+                iterations = args.login_iterations if name == "login" else args.iterations
+                report["scenarios"][name] = await run_scenario(
+                    client, state, scenarios[name], iterations, args.concurrency
+                )
+    report["config"]["published_messages"] = broker.published
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", type=lambda s: s.split(","), default=list(SCENARIOS))
+    parser.add_argument("--iterations", type=int, default=300, help="iteraciones por escenario")
+    parser.add_argument("--login-iterations", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--customers", type=int, default=200)
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--seed-orders", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--broker-rtt-ms", type=float, default=1.0)
+    parser.add_argument("--inventory-latency-ms", type=float, default=5.0)
+    parser.add_argument("--output", help="archivo JSON del reporte (por defecto stdout)")
+    parser.add_argument("--baseline", help="reporte JSON anterior con el que comparar")
+    parser.add_argument("--threshold", type=float, default=0.25, help="empeoramiento relativo tolerado")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0)
+    args = parser.parse_args()
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"escenarios desconocidos: {', '.join(sorted(unknown))}")
+
+    report = asyncio.run(main(args))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print_report(report)
+    else:
+        print(json.dumps(report, indent=2))
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(json.load(f), report, args.threshold, args.min_delta_ms)
+        if regressions:
+            print("Regresiones frente al baseline:", *regressions, sep="\n  ", file=sys.stderr)
+            sys.exit(1)
+        print(f"Sin regresiones frente a {args.baseline} (umbral {args.threshold:.0%})", file=sys.stderr)
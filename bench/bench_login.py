@@ -0,0 +1,130 @@
+"""
+Logins por segundo con el logging anterior (print en cada paso y echo=True
+del engine) frente al pipeline JSON con cola de `app.logs`.
+
+La salida estándar se redirige a un archivo con buffer por línea, como queda
+stdout en un contenedor con PYTHONUNBUFFERED. La contraseña del usuario se
+hashea con pocas rondas de bcrypt para que el costo del hash no tape el del
+logging.
+
+    python -m bench.bench_login --logins 2000 --concurrency 20
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+import traceback
+from datetime import timedelta
+
+os.environ.setdefault(
+    "DATABASE_URL", f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/bench_login.db"
+)
+
+import httpx  # noqa: E402
+from fastapi import Depends, HTTPException  # noqa: E402
+from fastapi.security import OAuth2PasswordRequestForm  # noqa: E402
+
+from app import auth as auth_utils, crud, logs, models  # noqa: E402
+from app.dependencies import get_db  # noqa: E402
+from app.hashing import get_pwd_context  # noqa: E402
+from app.main import app  # noqa: E402
+from app.settings import settings  # noqa: E402
+
+
+async def legacy_login(form_data: OAuth2PasswordRequestForm = Depends(), db=Depends(get_db)):
+    """Login tal como estaba: siete print por petición, uno con la contraseña."""
+    try:
+        print("📥 Login recibido")
+        print("👤 Username:", form_data.username)
+        print("🔑 Password:", form_data.password)
+        user = await crud.get_user_by_username(db, form_data.username)
+        if user:
+            print("✅ Usuario encontrado:", user.username)
+        else:
+            print("❌ Usuario no encontrado")
+        password_ok = False
+        if user:
+            password_ok = await crud.verify_user_password(user, form_data.password)
+            print("🔐 ¿Contraseña válida?", password_ok)
+        if not user or not password_ok:
+            raise HTTPException(status_code=400, detail="Credenciales inválidas")
+        token = auth_utils.create_user_token(
+            user, expires_delta=timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+        )
+        print("✅ Token generado")
+        return {"access_token": token, "token_type": "bearer"}
+    except HTTPException:
+        raise
+    except Exception as e:
+        print("🔥 ERROR INTERNO EN LOGIN:", e)
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail="Error interno")
+
+
+async def setup():
+    async with models.engine.begin() as conn:
+        await conn.run_sync(models.Base.metadata.drop_all)
+        await conn.run_sync(models.Base.metadata.create_all)
+    async with models.SessionLocal() as db:
+        db.add(models.User(username="bench", hashed_password=get_pwd_context().hash("secret123", rounds=4)))
+        await db.commit()
+
+
+async def run(path: str, logins: int, concurrency: int) -> tuple[float, list[float]]:
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def login():
+            async with semaphore:
+                start = time.perf_counter()
+                resp = await client.post(path, data={"username": "bench", "password": "secret123"})
+                latencies.append((time.perf_counter() - start) * 1000)
+                assert resp.status_code == 200, resp.text
+
+        start = time.perf_counter()
+        await asyncio.gather(*(login() for _ in range(logins)))
+        return logins / (time.perf_counter() - start), latencies
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def main(args):
+    real_stdout = sys.stdout
+    sink = open(os.path.join(tempfile.mkdtemp(), "stdout.log"), "w", buffering=1)
+    sys.stdout = sink
+    try:
+        await setup()
+        app.router.add_api_route("/auth/legacy-login", legacy_login, methods=["POST"])
+
+        # Antes: print + SQL con echo=True (handler de SQLAlchemy sobre stdout)
+        models.engine.echo = True
+        legacy = await run("/auth/legacy-login", args.logins, args.concurrency)
+        models.engine.echo = False
+
+        # Ahora: JSON por la cola; SQL_ECHO según el flag, DEBUG muestreado
+        logs.setup_logging(level="INFO", debug_sample_rate=0.01, sql_echo=args.sql_echo, stream=sink)
+        current = await run("/auth/login", args.logins, args.concurrency)
+        logs.stop_logging()
+    finally:
+        sys.stdout = real_stdout
+        sink.close()
+
+    for name, (rate, latencies) in (("print + echo", legacy), ("cola JSON", current)):
+        print(f"{name:<13} {rate:8.1f} logins/s  p50={statistics.median(latencies):7.2f}ms "
+              f"p99={percentile(latencies, 99):7.2f}ms")
+    await models.engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--logins", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--sql-echo", action="store_true", help="registrar también el SQL en el pipeline nuevo")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,115 @@
+"""
+Costo de registrar métricas.
+
+1. Middleware HTTP: llamadas ASGI directas a una app mínima, con y sin
+   `MetricsMiddleware`, para aislar el costo por petición.
+2. Eventos del engine: SELECT 1 contra SQLite con y sin `instrument_engine`,
+   para el costo por sentencia.
+3. GET /customers/{id} de la aplicación completa contra SQLite, con y sin
+   middleware, para ver el costo relativo en una ruta real.
+
+    python -m bench.bench_metrics --requests 20000
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+os.environ.setdefault(
+    "DATABASE_URL", f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/bench_metrics.db"
+)
+
+import httpx  # noqa: E402
+from sqlalchemy import text  # noqa: E402
+from sqlalchemy.ext.asyncio import create_async_engine  # noqa: E402
+
+from app import metrics, models  # noqa: E402
+from app.main import app  # noqa: E402
+
+ROUNDS = 5
+
+
+async def _noop_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+async def _receive():
+    return {"type": "http.request", "body": b""}
+
+
+async def _send(message):
+    pass
+
+
+async def asgi_per_request_us(asgi, requests: int) -> float:
+    scope = {"type": "http", "method": "GET", "path": "/ping", "headers": []}
+    best = float("inf")
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        for _ in range(requests):
+            await asgi(dict(scope), _receive, _send)
+        best = min(best, (time.perf_counter() - start) / requests * 1e6)
+    return best
+
+
+async def statement_us(instrumented: bool, statements: int) -> float:
+    url = f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/stmts.db"
+    engine = create_async_engine(url, **(metrics.pool_options(url, "bench") if instrumented else {}))
+    if instrumented:
+        metrics.instrument_engine(engine, "bench")
+    best = float("inf")
+    async with engine.connect() as conn:
+        for _ in range(ROUNDS):
+            start = time.perf_counter()
+            for _ in range(statements):
+                await conn.execute(text("SELECT 1"))
+            best = min(best, (time.perf_counter() - start) / statements * 1e6)
+    await engine.dispose()
+    return best
+
+
+async def app_latency_ms(asgi, requests: int) -> float:
+    transport = httpx.ASGITransport(app=asgi)
+    samples = []
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for _ in range(requests):
+            start = time.perf_counter()
+            resp = await client.get("/customers/1")
+            samples.append((time.perf_counter() - start) * 1000)
+            assert resp.status_code == 200
+    return statistics.median(samples)
+
+
+async def main(args):
+    bare = await asgi_per_request_us(_noop_app, args.requests)
+    wrapped = await asgi_per_request_us(metrics.MetricsMiddleware(_noop_app), args.requests)
+    print(f"middleware:  {bare:7.2f} µs sin métricas, {wrapped:7.2f} µs con métricas "
+          f"(+{wrapped - bare:.2f} µs por petición)")
+
+    plain = await statement_us(False, args.statements)
+    counted = await statement_us(True, args.statements)
+    print(f"sentencias:  {plain:7.2f} µs sin eventos,  {counted:7.2f} µs con eventos "
+          f"(+{counted - plain:.2f} µs por sentencia)")
+
+    models.engine.echo = False
+    async with models.engine.begin() as conn:
+        await conn.run_sync(models.Base.metadata.create_all)
+    async with models.SessionLocal() as db:
+        db.add(models.Customer(full_name="Bench", email="bench@example.com"))
+        await db.commit()
+    # app.middleware_stack ya incluye MetricsMiddleware; la ruta sin él es app.router
+    without = await app_latency_ms(app.router, args.app_requests)
+    with_metrics = await app_latency_ms(app, args.app_requests)
+    print(f"GET /customers/{{id}}: p50 {without:.3f} ms sin middleware, {with_metrics:.3f} ms con middleware")
+    await models.engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--statements", type=int, default=5000)
+    parser.add_argument("--app-requests", type=int, default=2000)
+    asyncio.run(main(parser.parse_args()))
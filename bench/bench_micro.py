@@ -0,0 +1,244 @@
+"""
+Microbenchmarks de validación, conversión desde ORM e hidratación, con historial.
+
+Casos, cada uno con 1, 100 y 10k ítems o filas (--sizes):
+
+    order_create_validate          schemas.OrderCreate desde el JSON de entrada
+    order_response_from_attributes schemas.OrderResponse desde un models.Order con sus ítems
+    order_response_render          lo que hace FastAPI con response_model: validar,
+                                   volcar en modo JSON y serializar con json.dumps
+    product_response_from_attributes  List[ProductResponse] desde models.Product
+    product_response_render        ídem + volcado y json.dumps
+    list_products_orm              crud.list_products (entidades en el identity map)
+    list_products_columns          la misma consulta por columnas, como referencia
+
+Cada resultado es el mejor de --rounds rondas (timeit con autorange). Los casos
+de base de datos corren contra un SQLite temporal e incluyen el costo de
+`run_until_complete`, igual en todas las corridas.
+
+Cada corrida se agrega como una línea JSON a --history, con el commit y un
+hash de app/schemas.py y app/models.py, y se compara con la corrida anterior.
+Con --check termina con código 1 si algún caso empeora más que --threshold.
+
+    python -m bench.bench_micro
+    python -m bench.bench_micro --sizes 1,100 --check --threshold 0.1
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import timeit
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import List
+
+os.environ.setdefault(
+    "DATABASE_URL", f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/bench_micro.db"
+)
+
+import pydantic  # noqa: E402
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+from sqlalchemy import insert, select  # noqa: E402
+
+from app import crud, models, schemas  # noqa: E402
+
+ROOT = Path(__file__).resolve().parent.parent
+TRACKED_FILES = ("app/schemas.py", "app/models.py")
+DEFAULT_HISTORY = ROOT / "bench" / "results" / "micro.jsonl"
+
+products_adapter = TypeAdapter(List[schemas.ProductResponse])
+
+
+def render(adapter: TypeAdapter, value) -> bytes:
+    """Camino de FastAPI con response_model: validar, volcar a JSON y JSONResponse.render."""
+    content = adapter.dump_python(adapter.validate_python(value), mode="json")
+    return json.dumps(
+        jsonable_encoder(content), ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def order_payload(size: int) -> dict:
+    return {
+        "customer_id": 1,
+        "items": [{"product_id": i, "quantity": 1 + i % 5} for i in range(1, size + 1)],
+    }
+
+
+def orm_order(size: int) -> models.Order:
+    order = models.Order(
+        id=1, customer_id=1, created_at=datetime(2025, 1, 1, tzinfo=timezone.utc),
+        subtotal=10.0 * size, total=10.0 * size, status=models.ORDER_PENDING,
+    )
+    order.items = [
+        models.OrderItem(id=i, order_id=1, product_id=i, quantity=1, unit_price=10.0)
+        for i in range(1, size + 1)
+    ]
+    return order
+
+
+def orm_products(size: int) -> list[models.Product]:
+    return [models.Product(id=i, name=f"Producto {i}", price=9.99) for i in range(1, size + 1)]
+
+
+async def seed(rows: int):
+    async with models.engine.begin() as conn:
+        await conn.run_sync(models.Base.metadata.drop_all)
+        await conn.run_sync(models.Base.metadata.create_all)
+    async with models.SessionLocal() as db:
+        await db.execute(insert(models.Product), [
+            {"id": i, "name": f"Producto {i}", "price": 9.99} for i in range(1, rows + 1)
+        ])
+        await db.commit()
+
+
+async def list_products_orm(size: int):
+    async with models.SessionLocal() as db:
+        return await crud.list_products(db, limit=size)
+
+
+async def list_products_columns(size: int):
+    async with models.SessionLocal() as db:
+        query = select(models.Product.id, models.Product.name, models.Product.price)
+        return (await db.execute(query.order_by(models.Product.id).limit(size))).all()
+
+
+def cases(size: int, loop: asyncio.AbstractEventLoop):
+    """(nombre, función sin argumentos) para un tamaño; los datos se arman fuera del tiempo medido."""
+    payload = order_payload(size)
+    order = orm_order(size)
+    order_adapter = TypeAdapter(schemas.OrderResponse)
+    products = orm_products(size)
+    return [
+        ("order_create_validate", lambda: schemas.OrderCreate.model_validate(payload)),
+        ("order_response_from_attributes", lambda: schemas.OrderResponse.model_validate(order)),
+        ("order_response_render", lambda: render(order_adapter, order)),
+        ("product_response_from_attributes", lambda: products_adapter.validate_python(products)),
+        ("product_response_render", lambda: render(products_adapter, products)),
+        ("list_products_orm", lambda: loop.run_until_complete(list_products_orm(size))),
+        ("list_products_columns", lambda: loop.run_until_complete(list_products_columns(size))),
+    ]
+
+
+def measure(fn, rounds: int) -> float:
+    """Segundos por llamada: el mejor de `rounds` rondas de al menos 0,2 s."""
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=rounds, number=number)) / number
+
+
+def file_hashes() -> dict[str, str]:
+    return {
+        name: hashlib.sha256((ROOT / name).read_bytes()).hexdigest()[:12]
+        for name in TRACKED_FILES
+    }
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_previous(history: Path) -> dict | None:
+    """
+    Última corrida del historial, con los resultados completados por cada
+    caso/tamaño desde la corrida más reciente que lo midió (las corridas con
+    --only o --sizes parciales no borran la referencia de los demás casos).
+    """
+    if not history.exists():
+        return None
+    entries = [json.loads(line) for line in history.read_text().splitlines() if line.strip()]
+    if not entries:
+        return None
+    results: dict[str, dict] = {}
+    for entry in entries:
+        for name, by_size in entry["results"].items():
+            results.setdefault(name, {}).update(by_size)
+    return {**entries[-1], "results": results}
+
+
+def compare(previous: dict, current: dict, threshold: float) -> list[str]:
+    """Casos (nombre/tamaño) cuyo tiempo por llamada sube más de `threshold`."""
+    regressions = []
+    for name, by_size in current["results"].items():
+        for size, stats in by_size.items():
+            before = previous["results"].get(name, {}).get(size)
+            if before and stats["per_call_us"] > before["per_call_us"] * (1 + threshold):
+                regressions.append(
+                    f"{name}[{size}]: {before['per_call_us']} -> {stats['per_call_us']} µs"
+                )
+    return regressions
+
+
+def print_results(current: dict, previous: dict | None):
+    if previous is not None:
+        changed = [
+            name for name, digest in current["files"].items()
+            if previous.get("files", {}).get(name) != digest
+        ]
+        print(f"comparado con {previous['timestamp']} ({previous.get('commit')}); "
+              f"archivos cambiados: {', '.join(changed) or 'ninguno'}")
+    print(f"{'caso':<34} {'tamaño':>7} {'µs/llamada':>12} {'µs/ítem':>9} {'vs anterior':>12}")
+    for name, by_size in current["results"].items():
+        for size, stats in by_size.items():
+            before = (previous or {}).get("results", {}).get(name, {}).get(size)
+            delta = f"{stats['per_call_us'] / before['per_call_us'] - 1:+.1%}" if before else "-"
+            print(f"{name:<34} {size:>7} {stats['per_call_us']:>12.2f} {stats['per_item_us']:>9.3f} {delta:>12}")
+
+
+def main(args):
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(seed(max(args.sizes)))
+    results: dict[str, dict[str, dict]] = {}
+    for size in args.sizes:
+        for name, fn in cases(size, loop):
+            if args.only and name not in args.only:
+                continue
+            seconds = measure(fn, args.rounds)
+            results.setdefault(name, {})[str(size)] = {
+                "per_call_us": round(seconds * 1e6, 3),
+                "per_item_us": round(seconds * 1e6 / size, 4),
+            }
+    loop.run_until_complete(models.engine.dispose())
+    loop.close()
+
+    current = {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "files": file_hashes(),
+        "python": platform.python_version(),
+        "pydantic": pydantic.VERSION,
+        "results": results,
+    }
+    history = Path(args.history)
+    previous = load_previous(history)
+    print_results(current, previous)
+    history.parent.mkdir(parents=True, exist_ok=True)
+    with history.open("a") as f:
+        f.write(json.dumps(current) + "\n")
+
+    if args.check and previous is not None:
+        regressions = compare(previous, current, args.threshold)
+        if regressions:
+            print("Regresiones frente a la corrida anterior:", *regressions, sep="\n  ", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=lambda s: [int(x) for x in s.split(",")], default=[1, 100, 10_000])
+    parser.add_argument("--only", type=lambda s: set(s.split(",")), help="solo estos casos (separados por coma)")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--history", default=str(DEFAULT_HISTORY), help="historial JSON Lines")
+    parser.add_argument("--check", action="store_true", help="código 1 si hay regresiones")
+    parser.add_argument("--threshold", type=float, default=0.10)
+    main(parser.parse_args())
@@ -0,0 +1,141 @@
+"""
+Latencia de GET /customers/{id}/orders en la página 1 y en una página profunda.
+
+Carga un cliente con muchos pedidos (por defecto un millón, con fechas
+repetidas para forzar empates) en un SQLite temporal y compara la paginación
+por clave con un OFFSET equivalente.
+
+    python -m bench.bench_order_history --orders 1000000 --page 10000
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+os.environ.setdefault(
+    "DATABASE_URL", f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/bench_history.db"
+)
+
+import httpx  # noqa: E402
+from sqlalchemy import insert, select, text  # noqa: E402
+
+from app import crud, models  # noqa: E402
+from app.main import app  # noqa: E402
+
+CHUNK = 50_000
+
+
+async def setup(orders: int):
+    models.engine.echo = False
+    async with models.engine.begin() as conn:
+        await conn.run_sync(models.Base.metadata.drop_all)
+        await conn.run_sync(models.Base.metadata.create_all)
+    start = datetime(2024, 1, 1)
+    async with models.SessionLocal() as db:
+        db.add_all([
+            models.Customer(full_name="Bench", email="bench@example.com"),
+            models.Customer(full_name="Otro", email="otro@example.com"),
+            models.Product(name="Producto", price=1.0),
+        ])
+        await db.commit()
+        for first in range(0, orders, CHUNK):
+            ids = range(first + 1, min(first + CHUNK, orders) + 1)
+            # Cuatro pedidos por segundo: (created_at, id) tiene que desempatar
+            await db.execute(insert(models.Order), [
+                {"id": i, "customer_id": 1 if i % 10 else 2, "created_at": start + timedelta(seconds=i // 4)}
+                for i in ids
+            ])
+            await db.execute(insert(models.OrderItem), [
+                {"order_id": i, "product_id": 1, "quantity": 1} for i in ids
+            ])
+            await db.commit()
+        await db.execute(text("ANALYZE"))
+
+
+async def cursor_for_page(page: int, limit: int) -> str | None:
+    if page == 1:
+        return None
+    async with models.SessionLocal() as db:
+        row = (await db.execute(
+            select(models.Order.created_at, models.Order.id)
+            .where(models.Order.customer_id == 1)
+            .order_by(models.Order.created_at.desc(), models.Order.id.desc())
+            .offset((page - 1) * limit - 1)
+            .limit(1)
+        )).one()
+    return crud.encode_order_cursor(row.created_at, row.id)
+
+
+async def offset_page(page: int, limit: int):
+    """Referencia: la misma página con OFFSET."""
+    async with models.SessionLocal() as db:
+        await db.execute(
+            select(models.Order.id)
+            .where(models.Order.customer_id == 1)
+            .order_by(models.Order.created_at.desc(), models.Order.id.desc())
+            .offset((page - 1) * limit)
+            .limit(limit)
+        )
+
+
+async def timed(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+async def check_no_gaps(client, limit: int, pages: int):
+    """Recorre unas páginas y comprueba que no se repitan ni se salteen pedidos."""
+    seen, cursor = [], None
+    for _ in range(pages):
+        params = {"limit": limit, **({"cursor": cursor} if cursor else {})}
+        data = (await client.get("/customers/1/orders", params=params)).json()
+        seen.extend(order["id"] for order in data["orders"])
+        cursor = data["next_cursor"]
+    expected = sorted((i for i in range(max(seen), min(seen) - 1, -1) if i % 10), reverse=True)
+    assert seen == expected, "la paginación repitió o salteó pedidos"
+
+
+async def main(args):
+    start = time.perf_counter()
+    await setup(args.orders)
+    print(f"carga de {args.orders} pedidos: {time.perf_counter() - start:.1f}s")
+
+    async with models.engine.connect() as conn:
+        plan = await conn.execute(text(
+            "EXPLAIN QUERY PLAN SELECT id, created_at FROM orders WHERE customer_id = 1 "
+            "AND (created_at, id) < ('2024-02-01', 1) ORDER BY created_at DESC, id DESC LIMIT 51"
+        ))
+        print("plan:", " / ".join(row[-1] for row in plan))
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await check_no_gaps(client, args.limit, pages=20)
+        print(f"{'página':>8} {'clave (ms)':>11} {'offset (ms)':>12}")
+        for page in (1, args.page):
+            cursor = await cursor_for_page(page, args.limit)
+            params = {"limit": args.limit, **({"cursor": cursor} if cursor else {})}
+
+            async def keyset():
+                resp = await client.get("/customers/1/orders", params=params)
+                assert resp.status_code == 200 and len(resp.json()["orders"]) == args.limit
+
+            key_ms = await timed(keyset, args.repeat)
+            offset_ms = await timed(lambda: offset_page(page, args.limit), args.repeat)
+            print(f"{page:>8} {key_ms:>11.2f} {offset_ms:>12.2f}")
+    await models.engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--orders", type=int, default=1_000_000)
+    parser.add_argument("--page", type=int, default=10_000)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=20)
+    asyncio.run(main(parser.parse_args()))
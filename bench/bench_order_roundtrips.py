@@ -0,0 +1,90 @@
+"""
+Round trips a la base por pedido creado, antes y después de reescribir `crud.create_order`.
+
+Cuenta las sentencias enviadas al driver más el COMMIT. Corre contra un SQLite
+temporal (aiosqlite) salvo que se indique DATABASE_URL.
+
+    python -m bench.bench_order_roundtrips
+"""
+import asyncio
+import os
+import tempfile
+
+os.environ.setdefault(
+    "DATABASE_URL", f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/bench_orders.db"
+)
+
+from sqlalchemy import event  # noqa: E402
+
+from app import crud, models, outbox, schemas  # noqa: E402
+
+ITEM_COUNTS = (1, 10, 100)
+
+
+async def legacy_create_order(db, order: schemas.OrderCreate):
+    """Implementación anterior: flush, ítems por el ORM, commit y refresh."""
+    new_order = models.Order(customer_id=order.customer_id)
+    db.add(new_order)
+    await db.flush()
+    db.add_all([
+        models.OrderItem(order_id=new_order.id, product_id=item.product_id, quantity=item.quantity)
+        for item in order.items
+    ])
+    db.add(models.OutboxEvent(
+        event_type=outbox.ORDER_CREATED,
+        payload={
+            "order_id": new_order.id,
+            "customer_id": new_order.customer_id,
+            "items": [{"product_id": i.product_id, "quantity": i.quantity} for i in order.items],
+        },
+    ))
+    await db.commit()
+    await db.refresh(new_order, attribute_names=["items"])
+    return new_order
+
+
+class RoundTripCounter:
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine.sync_engine, "before_cursor_execute", self._statement)
+        event.listen(engine.sync_engine, "commit", self._statement)
+
+    def _statement(self, *args, **kwargs):
+        self.count += 1
+
+
+async def setup():
+    models.engine.echo = False
+    async with models.engine.begin() as conn:
+        await conn.run_sync(models.Base.metadata.drop_all)
+        await conn.run_sync(models.Base.metadata.create_all)
+    async with models.SessionLocal() as db:
+        db.add(models.Customer(full_name="Bench", email="bench@example.com"))
+        db.add_all([models.Product(name=f"Producto {i}", price=1.0 + i) for i in range(1, 101)])
+        await db.commit()
+
+
+async def measure(create, items: int, counter: RoundTripCounter) -> int:
+    order = schemas.OrderCreate(
+        customer_id=1,
+        items=[schemas.OrderItemCreate(product_id=i, quantity=1) for i in range(1, items + 1)],
+    )
+    async with models.SessionLocal() as db:
+        before = counter.count
+        await create(db, order)
+        return counter.count - before
+
+
+async def main():
+    await setup()
+    counter = RoundTripCounter(models.engine)
+    print(f"{'ítems':>6} {'antes':>6} {'después':>8}")
+    for items in ITEM_COUNTS:
+        legacy = await measure(legacy_create_order, items, counter)
+        current = await measure(crud.create_order, items, counter)
+        print(f"{items:>6} {legacy:>6} {current:>8}")
+    await models.engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,77 @@
+"""
+Pedidos por segundo: POST /orders/ uno a uno frente a POST /orders/batch.
+
+Pasa por la aplicación completa (httpx + ASGI) contra un SQLite temporal.
+La autenticación se sustituye por dependencias vacías para medir solo el alta.
+
+    python -m bench.bench_orders_batch --orders 2000 --items 3
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+os.environ.setdefault(
+    "DATABASE_URL", f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/bench_orders.db"
+)
+
+import httpx  # noqa: E402
+
+from app import models  # noqa: E402
+from app.dependencies import get_current_user_dep, verify_api_key  # noqa: E402
+from app.main import app  # noqa: E402
+
+
+async def setup(products: int):
+    models.engine.echo = False
+    async with models.engine.begin() as conn:
+        await conn.run_sync(models.Base.metadata.drop_all)
+        await conn.run_sync(models.Base.metadata.create_all)
+    async with models.SessionLocal() as db:
+        db.add(models.Customer(full_name="Bench", email="bench@example.com"))
+        db.add_all([models.Product(name=f"Producto {i}", price=1.0 + i) for i in range(1, products + 1)])
+        await db.commit()
+
+
+def make_orders(count: int, items: int) -> list[dict]:
+    return [
+        {
+            "customer_id": 1,
+            "items": [{"product_id": (n + i) % 50 + 1, "quantity": 1} for i in range(items)],
+        }
+        for n in range(count)
+    ]
+
+
+async def main(args):
+    await setup(50)
+    app.dependency_overrides[get_current_user_dep] = lambda: None
+    app.dependency_overrides[verify_api_key] = lambda: None
+    orders = make_orders(args.orders, args.items)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        start = time.perf_counter()
+        for order in orders:
+            resp = await client.post("/orders/", json=order)
+            assert resp.status_code == 201, resp.text
+        single = len(orders) / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for i in range(0, len(orders), args.batch_size):
+            resp = await client.post("/orders/batch", json=orders[i:i + args.batch_size])
+            assert resp.status_code == 200 and resp.json()["failed"] == 0, resp.text
+        batch = len(orders) / (time.perf_counter() - start)
+
+    print(f"POST /orders/       {single:10.1f} pedidos/s")
+    print(f"POST /orders/batch  {batch:10.1f} pedidos/s  (x{batch / single:.1f})")
+    await models.engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--orders", type=int, default=2000)
+    parser.add_argument("--items", type=int, default=3)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    asyncio.run(main(parser.parse_args()))
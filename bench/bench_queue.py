@@ -0,0 +1,153 @@
+"""
+Latencia de publicación de pedidos contra un broker falso en proceso.
+
+Compara una conexión por pedido (connect + channel + declare + publish + close)
+con el publicador persistente de `app.queue`, que reutiliza conexión y canales y
+espera la confirmación de cada mensaje, y con `publish_many` en lotes como lo
+usa el relay del outbox. Cada operación AMQP del broker falso
+cuesta un round trip simulado (--rtt-ms).
+
+    python -m bench.bench_queue --orders 500 --rtt-ms 1
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import aio_pika
+
+from app import queue
+
+
+class FakeExchange:
+    def __init__(self, broker):
+        self.broker = broker
+
+    async def publish(self, message, routing_key):
+        await self.broker.round_trip()  # basic.publish + confirm
+        self.broker.published += 1
+
+
+class FakeChannel:
+    def __init__(self, broker):
+        self.broker = broker
+        self.default_exchange = FakeExchange(broker)
+
+    async def declare_queue(self, name, durable=False):
+        await self.broker.round_trip()
+        return type("Q", (), {"name": name})()
+
+    async def close(self):
+        await self.broker.round_trip()
+
+
+class FakeConnection:
+    def __init__(self, broker):
+        self.broker = broker
+
+    async def channel(self, publisher_confirms=True):
+        await self.broker.round_trip()
+        return FakeChannel(self.broker)
+
+    async def close(self):
+        await self.broker.round_trip()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+
+class FakeBroker:
+    def __init__(self, rtt: float):
+        self.rtt = rtt
+        self.published = 0
+
+    async def round_trip(self):
+        await asyncio.sleep(self.rtt)
+
+    async def connect_robust(self, url):
+        # TCP + protocolo AMQP (start/tune/open): tres round trips
+        for _ in range(3):
+            await self.round_trip()
+        return FakeConnection(self)
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def publish_one_shot(order_data: dict) -> None:
+    """Ruta anterior al publicador persistente: una conexión por pedido."""
+    connection = await aio_pika.connect_robust(queue.RABBITMQ_URL)
+    async with connection:
+        channel = await connection.channel()
+        declared = await channel.declare_queue(queue.ORDERS_QUEUE, durable=True)
+        await channel.default_exchange.publish(
+            queue._build_message(order_data), routing_key=declared.name
+        )
+
+
+async def measure(publish, orders: int, concurrency: int) -> list[float]:
+    latencies = []
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with sem:
+            start = time.perf_counter()
+            await publish({"order_id": i, "customer_id": 1, "items": []})
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    await asyncio.gather(*(one(i) for i in range(orders)))
+    return latencies
+
+
+def report(name, latencies, elapsed):
+    print(
+        f"{name:<12} p50={statistics.median(latencies):7.3f}ms "
+        f"p99={percentile(latencies, 99):7.3f}ms "
+        f"throughput={len(latencies) / elapsed:9.1f} msg/s"
+    )
+
+
+async def main(args):
+    broker = FakeBroker(args.rtt_ms / 1000)
+    aio_pika.connect_robust = broker.connect_robust
+    queue.RABBITMQ_URL = "amqp://fake/"
+
+    start = time.perf_counter()
+    latencies = await measure(publish_one_shot, args.orders, args.concurrency)
+    report("per-order", latencies, time.perf_counter() - start)
+
+    publisher = await queue.start_publisher()
+    start = time.perf_counter()
+    latencies = await measure(publisher.publish, args.orders, args.concurrency)
+    report("persistent", latencies, time.perf_counter() - start)
+
+    # Un lote por llamada, como el relay: la latencia es la del lote completo
+    batch = [{"order_id": i, "customer_id": 1, "items": []} for i in range(args.batch_size)]
+    start = time.perf_counter()
+    latencies = []
+    for _ in range(max(1, args.orders // args.batch_size)):
+        batch_start = time.perf_counter()
+        await publisher.publish_many(batch)
+        latencies.append((time.perf_counter() - batch_start) * 1000)
+    elapsed = time.perf_counter() - start
+    print(
+        f"{'batch':<12} p50={statistics.median(latencies):7.3f}ms "
+        f"p99={percentile(latencies, 99):7.3f}ms "
+        f"throughput={len(latencies) * args.batch_size / elapsed:9.1f} msg/s"
+    )
+    await queue.stop_publisher()
+    print(f"mensajes publicados: {broker.published}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--orders", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--rtt-ms", type=float, default=1.0)
+    parser.add_argument("--batch-size", type=int, default=100)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,128 @@
+"""
+Tiempo de arranque de la aplicación en procesos nuevos (arranque en frío).
+
+Cada corrida lanza un intérprete que importa `app.main` y ejecuta el lifespan
+hasta que la aplicación queda lista para atender. Se reporta:
+
+    import   importar app.main (routers, modelos, dependencias)
+    startup  lifespan hasta el `yield`: esquema, pool, catálogo, tareas de fondo
+    total    desde lanzar el proceso hasta que está listo (incluye el intérprete)
+    burst    ya lista, --burst consultas concurrentes (las primeras peticiones)
+
+La primera corrida usa una base SQLite vacía (aplica las migraciones); las
+demás, la misma base ya al día. --db-rtt-ms simula una base remota: cada
+sentencia espera un round trip y cada conexión nueva tres (sin bloquear el
+loop). Con --broker-rtt-ms > 0 se usa el broker falso de bench_queue
+(aio_pika se importa antes de medir); con 0 no hay broker. --app-path mide
+otro checkout (p. ej. un `git worktree` del commit anterior).
+
+    python -m bench.bench_startup --runs 10 --db-rtt-ms 2
+    python -m bench.bench_startup --runs 10 --db-rtt-ms 2 --broker-rtt-ms 5 --app-path /tmp/prev
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+MARKER = "BENCH_STARTUP "
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def child(broker_rtt_ms: float, db_rtt_ms: float, burst: int) -> None:
+    import asyncio
+
+    if broker_rtt_ms > 0:
+        import aio_pika
+        from bench.bench_queue import FakeBroker
+        aio_pika.connect_robust = FakeBroker(broker_rtt_ms / 1000).connect_robust
+
+    start = time.perf_counter()
+    from app import main, models, queue
+    imported = time.perf_counter()
+    if broker_rtt_ms <= 0:
+        queue.RABBITMQ_URL = None
+    if db_rtt_ms > 0:
+        from sqlalchemy import event
+        from sqlalchemy.util import await_only
+        delay = db_rtt_ms / 1000
+        # Los eventos corren dentro del greenlet del engine async: await_only cede el loop.
+        # El connect se simula en do_connect (el creator) y no en "connect": SQLAlchemy
+        # serializa los listeners de "connect" hasta que termina la primera conexión
+        event.listen(models.engine.sync_engine, "before_cursor_execute",
+                     lambda *args: await_only(asyncio.sleep(delay)))
+        event.listen(models.engine.sync_engine, "do_connect",
+                     lambda *args: await_only(asyncio.sleep(3 * delay)))
+
+    async def query():
+        from sqlalchemy import text
+        async with models.SessionLocal() as db:
+            await db.execute(text("SELECT 1"))
+
+    async def run():
+        async with main.app.router.lifespan_context(main.app):
+            ready = time.perf_counter()
+            await asyncio.gather(*(query() for _ in range(burst)))
+            print(MARKER + json.dumps({
+                "import": imported - start, "startup": ready - imported,
+                "burst": time.perf_counter() - ready, "ready": ready,
+            }), flush=True)
+
+    asyncio.run(run())
+
+
+def spawn(args, database_url: str) -> dict:
+    env = {
+        **os.environ,
+        "DATABASE_URL": database_url,
+        "ENV": "bench",
+        "LOG_LEVEL": "WARNING",
+        "PYTHONPATH": os.pathsep.join(filter(None, [args.app_path, ROOT, os.environ.get("PYTHONPATH")])),
+    }
+    # Por ruta y no con -m: así `app` se importa de --app-path y no del directorio actual
+    command = [
+        sys.executable, os.path.abspath(__file__), "--child", "--burst", str(args.burst),
+        "--broker-rtt-ms", str(args.broker_rtt_ms), "--db-rtt-ms", str(args.db_rtt_ms),
+    ]
+    start = time.perf_counter()  # mismo reloj que el hijo (monotónico del sistema)
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True, env=env, cwd=args.app_path or ROOT)
+    result = None
+    for line in process.stdout:
+        if line.startswith(MARKER):
+            result = json.loads(line[len(MARKER):])
+    if process.wait() != 0 or result is None:
+        raise RuntimeError(f"El proceso de arranque terminó con código {process.returncode}")
+    result["total"] = result.pop("ready") - start
+    return result
+
+
+def report(name: str, runs: list[dict]) -> None:
+    parts = []
+    for phase in ("import", "startup", "total", "burst"):
+        values = [run[phase] * 1000 for run in runs]
+        parts.append(f"{phase}={statistics.median(values):7.1f}ms")
+    print(f"{name:<18} " + "  ".join(parts) + f"  (n={len(runs)}, mediana)")
+
+
+def main(args):
+    database_url = f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/bench_startup.db"
+    report("base vacía", [spawn(args, database_url)])
+    report("esquema al día", [spawn(args, database_url) for _ in range(args.runs)])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--db-rtt-ms", type=float, default=0)
+    parser.add_argument("--broker-rtt-ms", type=float, default=0)
+    parser.add_argument("--burst", type=int, default=5)
+    parser.add_argument("--app-path", default=None, help="checkout de la aplicación a medir (por defecto este)")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args.broker_rtt_ms, args.db_rtt_ms, args.burst)
+    else:
+        main(args)
@@ -0,0 +1,167 @@
+"""
+Mensajes por segundo del worker de pedidos (`app.worker`) contra un broker en proceso.
+
+Compara un commit por mensaje (batch-size 1, un lote a la vez) con los lotes
+configurados, sobre un SQLite temporal. El ack no espera respuesta del broker;
+las publicaciones confirmadas (cola de muertos) cuestan un round trip simulado
+(--rtt-ms).
+
+    python -m bench.bench_worker --messages 5000 --prefetch 200 --concurrency 4 --batch-size 100
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from collections import deque
+
+os.environ.setdefault(
+    "DATABASE_URL", f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/bench_worker.db"
+)
+
+import aio_pika  # noqa: E402
+from sqlalchemy import insert, update  # noqa: E402
+
+from app import models  # noqa: E402
+from app.worker import OrderWorker  # noqa: E402
+
+
+class BenchMessage:
+    def __init__(self, queue, body, headers=None):
+        self.queue = queue
+        self.body = body
+        self.content_type = "application/json"
+        self.headers = headers or {}
+        self.redelivered = False
+        self.processed = False
+
+    async def ack(self):
+        self.processed = True
+        self.queue.settle()
+
+    async def nack(self, requeue=True):
+        self.processed = True
+        self.queue.settle()
+        if requeue:
+            redelivery = BenchMessage(self.queue, self.body, self.headers)
+            redelivery.redelivered = True
+            self.queue.messages.appendleft(redelivery)
+
+
+class BenchQueue:
+    """Cola en memoria: entrega mientras haya menos de `prefetch` mensajes sin ack."""
+
+    def __init__(self, broker, name):
+        self.broker = broker
+        self.name = name
+        self.messages = deque()
+        self.unacked = 0
+        self.settled = 0
+        self._slot = asyncio.Event()
+        self._consumer = None
+
+    def settle(self):
+        self.unacked -= 1
+        self.settled += 1
+        self._slot.set()
+
+    async def consume(self, callback):
+        self._consumer = asyncio.create_task(self._deliver(callback))
+        return "bench"
+
+    async def _deliver(self, callback):
+        while True:
+            while not self.messages or self.unacked >= self.broker.prefetch:
+                self._slot.clear()
+                await self._slot.wait()
+            self.unacked += 1
+            await callback(self.messages.popleft())
+
+    async def cancel(self, tag):
+        self._consumer.cancel()
+
+
+class BenchBroker:
+    def __init__(self, rtt: float):
+        self.rtt = rtt
+        self.prefetch = 1
+        self.queues = {}
+        self.default_exchange = self
+
+    async def round_trip(self):
+        if self.rtt:
+            await asyncio.sleep(self.rtt)
+
+    async def connect_robust(self, url):
+        return self
+
+    async def channel(self, publisher_confirms=True):
+        return self
+
+    async def set_qos(self, prefetch_count):
+        self.prefetch = prefetch_count
+
+    async def declare_queue(self, name, durable=False):
+        return self.queues.setdefault(name, BenchQueue(self, name))
+
+    async def publish(self, message, routing_key):
+        await self.round_trip()
+        queue = self.queues[routing_key]
+        queue.messages.append(BenchMessage(queue, message.body, message.headers))
+
+    async def close(self):
+        pass
+
+
+async def setup(messages: int):
+    models.engine.echo = False
+    async with models.engine.begin() as conn:
+        await conn.run_sync(models.Base.metadata.drop_all)
+        await conn.run_sync(models.Base.metadata.create_all)
+    async with models.SessionLocal() as db:
+        await db.execute(insert(models.Order), [{"id": i, "customer_id": 1} for i in range(1, messages + 1)])
+        await db.commit()
+
+
+async def measure(messages: int, rtt: float, **options) -> tuple[float, int]:
+    async with models.SessionLocal() as db:
+        await db.execute(update(models.Order).values(status=models.ORDER_PENDING))
+        await db.commit()
+    broker = BenchBroker(rtt)
+    aio_pika.connect_robust = broker.connect_robust
+    orders = await broker.declare_queue("orders")
+    for i in range(1, messages + 1):
+        orders.messages.append(BenchMessage(orders, json.dumps({"order_id": i, "items": []}).encode()))
+
+    worker = OrderWorker("amqp://bench/", models.SessionLocal, **options)
+    start = time.perf_counter()
+    await worker.start()
+    while orders.settled < messages:
+        await asyncio.sleep(0.001)
+    elapsed = time.perf_counter() - start
+    await worker.stop(timeout=1)
+    return messages / elapsed, worker.batches
+
+
+async def main(args):
+    await setup(args.messages)
+    rtt = args.rtt_ms / 1000
+    runs = [
+        ("un commit por mensaje", dict(prefetch=args.prefetch, concurrency=1, batch_size=1)),
+        ("lotes", dict(prefetch=args.prefetch, concurrency=args.concurrency, batch_size=args.batch_size)),
+    ]
+    for name, options in runs:
+        rate, batches = await measure(args.messages, rtt, flush_interval=0.01, **options)
+        print(f"{name:<22} {rate:9.1f} msg/s  transacciones={batches}  {options}")
+    await models.engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--prefetch", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--rtt-ms", type=float, default=0.2)
+    asyncio.run(main(parser.parse_args()))
@@ -1,11 +1,19 @@
+import argparse
 import asyncio
+from app import migrations
 from app.models import Base, engine
 
-async def init_models():
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.drop_all) 
-        await conn.run_sync(Base.metadata.create_all)
-        print("Tablas creadas correctamente.")
+async def init_models(drop: bool):
+    if drop:
+        # Borra todos los datos: solo para reiniciar una base de desarrollo
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+        print("Tablas borradas.")
+    applied = await migrations.migrate(engine)
+    print(f"Migraciones aplicadas: {applied}" if applied else "El esquema ya estaba al día.")
+    await engine.dispose()
 
 if __name__ == "__main__":
-    asyncio.run(init_models())
+    parser = argparse.ArgumentParser(description="Crea o actualiza el esquema de la base de datos.")
+    parser.add_argument("--drop", action="store_true", help="borra todas las tablas antes de crearlas")
+    asyncio.run(init_models(parser.parse_args().drop))
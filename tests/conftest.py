@@ -0,0 +1,10 @@
+import pytest
+from app.catalog import catalog
+
+
+@pytest.fixture(autouse=True)
+def reset_catalog():
+    # El snapshot del catálogo es estado del proceso: cada test parte de cero
+    catalog.reset()
+    yield
+    catalog.reset()
@@ -0,0 +1,187 @@
+import asyncio
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app import admission
+from app.admission import (
+    AdmissionController, AdmissionMiddleware, ConcurrencyLimiter, Shed, classify, parse_routes,
+)
+from app.dependencies import get_current_user_dep, verify_api_key
+from app.main import app
+from app.settings import settings
+
+
+def test_classify_separates_reads_writes_and_bulk():
+    assert classify("GET", "/customers/1") == "reads"
+    assert classify("POST", "/orders/") == "writes"
+    assert classify("POST", "/orders/batch") == "bulk"
+    assert classify("GET", "/metrics") is None
+    assert classify("PUT", "/admin/admission/writes") is None
+    assert classify("POST", "/auth/login") == "auth"
+    assert classify("POST", "/users/") == "auth"
+    assert classify("POST", "/users/7/api-key") == "auth"
+
+
+def test_route_mapping_is_configurable():
+    routes = parse_routes("/orders/*=bulk, /orders/batch=writes, /customers/import=bulk")
+    assert classify("POST", "/orders/") == "writes"
+    assert classify("POST", "/orders/", routes) == "bulk"
+    assert classify("POST", "/orders/batch", routes) == "writes"  # la ruta exacta gana al prefijo
+    assert classify("GET", "/orders/1/items", routes) == "bulk"
+    assert classify("POST", "/auth/login", routes) == "writes"
+    pools = {name: ConcurrencyLimiter(name, 1, 0, 1) for name in ("reads", "writes")}
+    with pytest.raises(ValueError):
+        AdmissionController(pools, retry_after=1, routes=routes)
+
+
+@pytest.mark.asyncio
+async def test_limiter_queues_in_order_and_sheds():
+    limiter = ConcurrencyLimiter("writes", limit=1, queue_size=2, max_wait=1)
+    assert await limiter.acquire() == 0.0
+    order = []
+
+    async def wait(tag):
+        await limiter.acquire()
+        order.append(tag)
+
+    first = asyncio.create_task(wait("a"))
+    second = asyncio.create_task(wait("b"))
+    await asyncio.sleep(0)
+    assert limiter.queued == 2
+    with pytest.raises(Shed) as e:
+        await limiter.acquire()
+    assert e.value.reason == "queue_full"
+
+    limiter.release()
+    await first
+    limiter.release()
+    await second
+    assert order == ["a", "b"] and limiter.active == 1
+    limiter.release()
+    assert limiter.active == 0
+
+
+@pytest.mark.asyncio
+async def test_limiter_deadline_and_runtime_resize():
+    limiter = ConcurrencyLimiter("reads", limit=1, queue_size=5, max_wait=0.01)
+    await limiter.acquire()
+    with pytest.raises(Shed) as e:
+        await limiter.acquire()
+    assert e.value.reason == "timeout" and limiter.queued == 0
+
+    # Al subir el límite entran los que esperaban
+    limiter.configure(max_wait=5)
+    waiters = [asyncio.create_task(limiter.acquire()) for _ in range(2)]
+    await asyncio.sleep(0)
+    limiter.configure(limit=3)
+    await asyncio.gather(*waiters)
+    assert limiter.active == 3 and limiter.queued == 0
+
+    # Al bajarlo, las que terminan no se reemplazan hasta quedar bajo el nuevo límite
+    limiter.configure(limit=1)
+    limiter.release()
+    limiter.release()
+    assert limiter.active == 1
+    assert not limiter._waiters
+
+
+@pytest.mark.asyncio
+async def test_middleware_sheds_writes_with_retry_after_but_serves_reads():
+    inner = FastAPI()
+    release = asyncio.Event()
+
+    @inner.post("/orders/")
+    async def slow_write():
+        await release.wait()
+        return {"ok": True}
+
+    @inner.get("/customers/1")
+    async def cheap_read():
+        return {"id": 1}
+
+    controller = AdmissionController({
+        "reads": ConcurrencyLimiter("reads", 10, 10, 1),
+        "writes": ConcurrencyLimiter("writes", 1, 0, 1),
+    }, retry_after=2)
+    transport = httpx.ASGITransport(app=AdmissionMiddleware(inner, controller))
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        running = asyncio.create_task(client.post("/orders/"))
+        await asyncio.sleep(0.01)
+        shed = await client.post("/orders/")
+        read = await client.get("/customers/1")
+        release.set()
+        assert (await running).status_code == 200
+
+    assert shed.status_code == 503 and shed.headers["retry-after"] == "2"
+    assert read.status_code == 200
+    assert admission.shed_total.values[("writes", "queue_full")] >= 1
+
+
+@pytest.mark.asyncio
+async def test_login_burst_does_not_shed_orders():
+    inner = FastAPI()
+    release = asyncio.Event()
+
+    @inner.post("/auth/login")
+    async def slow_login():
+        await release.wait()
+        return {"ok": True}
+
+    @inner.post("/orders/")
+    async def create_order():
+        return {"id": 1}
+
+    controller = AdmissionController({
+        "reads": ConcurrencyLimiter("reads", 10, 10, 1),
+        "writes": ConcurrencyLimiter("writes", 1, 0, 1),
+        "auth": ConcurrencyLimiter("auth", 1, 0, 1),
+    }, retry_after=1, routes=parse_routes("/auth/*=auth"))
+    transport = httpx.ASGITransport(app=AdmissionMiddleware(inner, controller))
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        running = asyncio.create_task(client.post("/auth/login"))
+        await asyncio.sleep(0.01)
+        shed = await client.post("/auth/login")
+        order = await client.post("/orders/")
+        release.set()
+        assert (await running).status_code == 200
+
+    assert shed.status_code == 503
+    assert order.status_code == 200
+
+
+def test_admin_endpoint_adjusts_limits_at_runtime(monkeypatch):
+    monkeypatch.setattr(settings, "ADMIN_API_KEYS", ["operador-1"])
+    app.dependency_overrides[get_current_user_dep] = lambda: None
+    app.dependency_overrides[verify_api_key] = lambda: None
+    writes = admission.controller.pools["writes"]
+    previous = writes.stats()
+    try:
+        client = TestClient(app, headers={"X-Admin-Key": "operador-1"})
+        resp = client.put("/admin/admission/writes", json={"limit": 3, "max_wait": 0.25})
+        assert resp.status_code == 200
+        assert resp.json()["limit"] == 3 and writes.limit == 3 and writes.max_wait == 0.25
+        assert writes.queue_size == previous["queue_size"]
+        assert client.get("/admin/admission").json()["writes"]["limit"] == 3
+        assert client.put("/admin/admission/nope", json={"limit": 3}).status_code == 404
+        assert client.put("/admin/admission/writes", json={"limit": 0}).status_code == 422
+    finally:
+        writes.configure(previous["limit"], previous["queue_size"], previous["max_wait"])
+        app.dependency_overrides.clear()
+
+
+@pytest.mark.parametrize("configured, header", [([], "operador-1"), (["operador-1"], None), (["operador-1"], "otra")])
+def test_admin_update_requires_operator_key(monkeypatch, configured, header):
+    # Un usuario cualquiera (JWT + API Key propias) no puede tocar los límites
+    monkeypatch.setattr(settings, "ADMIN_API_KEYS", configured)
+    app.dependency_overrides[get_current_user_dep] = lambda: None
+    app.dependency_overrides[verify_api_key] = lambda: None
+    writes = admission.controller.pools["writes"]
+    limit = writes.limit
+    try:
+        client = TestClient(app, headers={"X-Admin-Key": header} if header else {})
+        assert client.put("/admin/admission/writes", json={"limit": 1, "queue_size": 0}).status_code == 403
+        assert client.get("/admin/admission").status_code == 200
+        assert writes.limit == limit
+    finally:
+        app.dependency_overrides.clear()
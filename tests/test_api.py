@@ -1,7 +1,11 @@
+import asyncio
 import pytest
 from fastapi.testclient import TestClient
 from app.main import app
-from unittest.mock import patch
+from unittest.mock import AsyncMock, MagicMock, patch
+import json
+from app.models import Product
+from app.catalog import catalog
 
 client = TestClient(app)
 
@@ -17,8 +21,8 @@ def test_list_products_public_empty(mock_list):
     assert resp.json() == []
 
 @patch("app.routers.product.crud.list_products", return_value=[
-    {"id": 1, "name": "ProdA", "price": 9.99},
-    {"id": 2, "name": "ProdB", "price": 19.50},
+    Product(id=1, name="ProdA", price=9.99),
+    Product(id=2, name="ProdB", price=19.50),
 ])
 def test_list_products_public_nonempty(mock_list):
     resp = client.get("/products/")
@@ -27,13 +31,13 @@ def test_list_products_public_nonempty(mock_list):
     assert isinstance(data, list) and len(data) == 2
     assert data[0]["name"] == "ProdA" and data[0]["price"] == 9.99
 
-@patch("app.routers.order.crud.get_order_by_id", return_value=None)
+@patch("app.routers.order.crud.read_order", return_value=None)
 def test_get_nonexistent_order(mock_get):
     resp = client.get("/orders/123")
     assert resp.status_code == 404
 
-@patch("app.routers.order.crud.get_order_by_id", return_value={
-    "id": 5, "customer_id": 2, "created_at": "2025-08-01T12:00:00Z", "items": []
+@patch("app.routers.order.crud.read_order", return_value={
+    "id": 5, "customer_id": 2, "created_at": "2025-08-01T12:00:00Z", "subtotal": None, "total": None, "items": []
 })
 def test_get_existing_order(mock_get):
     resp = client.get("/orders/5")
@@ -41,12 +45,12 @@ def test_get_existing_order(mock_get):
     data = resp.json()
     assert data["id"] == 5 and data["customer_id"] == 2
 
-@patch("app.routers.customer.crud.get_customer_by_id", return_value=None)
+@patch("app.routers.customer.crud.read_customer", return_value=None)
 def test_get_nonexistent_customer(mock_get):
     resp = client.get("/customers/999")
     assert resp.status_code == 404
 
-@patch("app.routers.customer.crud.get_customer_by_id", return_value={
+@patch("app.routers.customer.crud.read_customer", return_value={
     "id": 3, "full_name": "Alice", "email": "alice@example.com"
 })
 def test_get_existing_customer(mock_get):
@@ -54,3 +58,149 @@ def test_get_existing_customer(mock_get):
     assert resp.status_code == 200
     data = resp.json()
     assert data["email"] == "alice@example.com"
+
+def _schema_body(model) -> bytes:
+    """Cuerpo que genera FastAPI para un response_model (JSONResponse.render)."""
+    from fastapi.encoders import jsonable_encoder
+    return json.dumps(
+        jsonable_encoder(model.model_dump(mode="json")),
+        ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":"),
+    ).encode()
+
+def test_lean_reads_match_schema_bytes():
+    from datetime import datetime, timezone
+    from app import schemas
+    order = {
+        "id": 5, "customer_id": 2, "created_at": datetime(2025, 8, 1, 12, 0, 0, 123000, tzinfo=timezone.utc),
+        "subtotal": 29.97, "total": 29.97, "status": "confirmed",
+        "items": [{"id": 1, "product_id": 7, "quantity": 3, "unit_price": 9.99}],
+    }
+    customer = {"id": 3, "full_name": "José Núñez", "email": "jose@example.com"}
+    with patch("app.routers.order.crud.read_order", return_value=order), \
+         patch("app.routers.customer.crud.read_customer", return_value=customer):
+        assert client.get("/orders/5").content == _schema_body(schemas.OrderResponse(**order))
+        assert client.get("/customers/3").content == _schema_body(schemas.CustomerResponse(**customer))
+
+    catalog.reset()
+    products = [Product(id=1, name="Café", price=10.0), Product(id=2, name="ProdB", price=19.5)]
+    with patch("app.routers.product.crud.list_products", return_value=products):
+        expected = [schemas.ProductResponse.model_validate(p) for p in products]
+        assert client.get("/products/").content == b"[" + b",".join(_schema_body(p) for p in expected) + b"]"
+    catalog.reset()
+
+@patch("app.routers.product.crud.list_products", return_value=[
+    Product(id=i, name=f"Prod{i}", price=1.0) for i in (1, 2, 3)
+])
+def test_list_products_keyset_pagination(mock_list):
+    resp = client.get("/products/?after_id=0&limit=2")
+    assert resp.status_code == 200
+    assert [p["id"] for p in resp.json()] == [1, 2]
+    assert resp.headers["X-Next-Cursor"] == "2"
+    resp = client.get("/products/?after_id=2&limit=2")
+    assert [p["id"] for p in resp.json()] == [3]
+    assert "X-Next-Cursor" not in resp.headers
+
+@patch("app.routers.product.crud.list_products", return_value=[
+    Product(id=1, name="ProdA", price=9.99),
+])
+def test_list_products_served_from_snapshot_with_etag(mock_list):
+    first = client.get("/products/")
+    etag = first.headers["ETag"]
+    assert first.status_code == 200 and etag.startswith('"')
+
+    again = client.get("/products/", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.content == b""
+    # El snapshot se construyó una sola vez: las lecturas siguientes no van a la base
+    assert mock_list.call_count == 1
+
+    mock_list.return_value = [Product(id=1, name="ProdA", price=10.5)]
+    asyncio.run(catalog.refresh())
+    changed = client.get("/products/", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+
+@pytest.mark.asyncio
+async def test_catalog_reads_do_not_wait_for_a_rebuild(monkeypatch):
+    from app.catalog import Catalog
+
+    release = asyncio.Event()
+    builds = [[Product(id=1, name="ProdA", price=9.99)], [Product(id=1, name="ProdA", price=10.5)]]
+
+    async def list_products(db, after_id, limit):
+        rows = builds.pop(0)
+        if not builds:
+            await release.wait()
+        return rows
+
+    monkeypatch.setattr("app.catalog.crud.list_products", list_products)
+    session = MagicMock()
+    session.__aenter__.return_value = session
+    test_catalog = Catalog(MagicMock(return_value=session))
+
+    first = await test_catalog.get()
+    rebuild = asyncio.create_task(test_catalog.refresh())
+    await asyncio.sleep(0)
+    # Mientras se arma el snapshot nuevo, las lecturas siguen con el anterior
+    assert await asyncio.wait_for(test_catalog.get(), timeout=0.1) is first
+    release.set()
+    second = await rebuild
+    assert await test_catalog.get() is second
+    assert second.version > first.version
+
+def test_list_products_ndjson_stream(monkeypatch):
+    async def fake_stream(session, after_id, chunk_size):
+        yield [Product(id=1, name="ProdA", price=9.99)]
+        yield [Product(id=2, name="ProdB", price=19.5)]
+
+    session = MagicMock()
+    session.__aenter__.return_value = session
+    monkeypatch.setattr("app.routers.product.read_session", MagicMock(return_value=session))
+    monkeypatch.setattr("app.routers.product.crud.stream_products", fake_stream)
+
+    resp = client.get("/products/", headers={"Accept": "application/x-ndjson"})
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in resp.text.splitlines()]
+    assert [p["name"] for p in lines] == ["ProdA", "ProdB"]
+
+@patch("app.routers.customer.crud.get_customer_by_id", return_value=None)
+@patch("app.routers.customer.crud.list_customer_orders", return_value=([], None))
+def test_customer_orders_unknown_customer(mock_list, mock_get):
+    resp = client.get("/customers/999/orders")
+    assert resp.status_code == 404
+
+def test_customer_orders_next_cursor_roundtrip():
+    from datetime import datetime, timezone
+    from app import schemas
+    last = datetime(2025, 8, 1, 12, 0, tzinfo=timezone.utc)
+    page = [schemas.OrderResponse(id=7, customer_id=3, created_at=last, items=[])]
+    with patch("app.routers.customer.crud.list_customer_orders", return_value=(page, (last, 7))) as mock_list:
+        resp = client.get("/customers/3/orders", params={"limit": 1})
+        assert resp.status_code == 200
+        data = resp.json()
+        assert data["orders"][0]["id"] == 7 and data["next_cursor"]
+
+        client.get("/customers/3/orders", params={"limit": 1, "cursor": data["next_cursor"]})
+        assert mock_list.call_args.args[1:] == (3, (last, 7), 1)
+
+    assert client.get("/customers/3/orders", params={"cursor": "%%%"}).status_code == 400
+
+def test_analytics_read_from_rollups():
+    from app.dependencies import get_current_user_dep, verify_api_key
+    from app.models import SalesProduct
+    app.dependency_overrides[get_current_user_dep] = lambda: None
+    app.dependency_overrides[verify_api_key] = lambda: None
+    try:
+        top = [SalesProduct(product_id=3, orders=4, units=9, revenue=90.0)]
+        with patch("app.routers.analytics.crud.get_top_products", return_value=top) as mock_top:
+            resp = client.get("/analytics/products/top", params={"by": "units", "limit": 1})
+        assert resp.status_code == 200
+        assert resp.json() == [{"product_id": 3, "orders": 4, "units": 9, "revenue": 90.0}]
+        assert mock_top.call_args.args[1:] == ("units", 1)
+        assert client.get("/analytics/products/top", params={"by": "price"}).status_code == 422
+    finally:
+        app.dependency_overrides.clear()
+
+def test_analytics_requires_auth():
+    assert client.get("/analytics/revenue/daily").status_code == 401
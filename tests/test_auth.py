@@ -9,7 +9,7 @@ import jose
 
 @pytest.mark.asyncio
 async def test_login_success(monkeypatch):
-    fake_user = type("U", (), {"username": "u", "hashed_password": "hashed"})()
+    fake_user = type("U", (), {"id": 7, "username": "u", "hashed_password": "hashed", "token_version": 0})()
     monkeypatch.setattr(crud, "get_user_by_username", AsyncMock(return_value=fake_user))
     monkeypatch.setattr(crud, "verify_user_password", AsyncMock(return_value=True))
     # Usa el util real para generar el token
@@ -24,6 +24,7 @@ async def test_login_success(monkeypatch):
         algorithms=[auth_utils.ALGORITHM]
     )
     assert payload["sub"] == "u"
+    assert payload["uid"] == 7 and payload["ver"] == 0
     assert "exp" in payload
 
 @pytest.mark.asyncio
@@ -35,11 +36,159 @@ async def test_login_invalid_user(monkeypatch):
     assert e.value.status_code == 400
 
 @pytest.mark.asyncio
-async def test_login_invalid_password(monkeypatch):
+async def test_login_invalid_password(monkeypatch, caplog):
     fake_user = type("U", (), {"username": "u", "hashed_password": "hashed"})()
     monkeypatch.setattr(crud, "get_user_by_username", AsyncMock(return_value=fake_user))
     monkeypatch.setattr(crud, "verify_user_password", AsyncMock(return_value=False))
-    form = OAuth2PasswordRequestForm(username="u", password="wrong", scope="")
-    with pytest.raises(HTTPException) as e:
-        await login(form_data=form, db=AsyncMock())
+    form = OAuth2PasswordRequestForm(username="u", password="wrong-secret", scope="")
+    with caplog.at_level("DEBUG", logger="app.routers.auth"):
+        with pytest.raises(HTTPException) as e:
+            await login(form_data=form, db=AsyncMock())
     assert e.value.status_code == 400
+    rejected = [r for r in caplog.records if r.getMessage() == "Login rechazado"]
+    assert rejected and rejected[0].reason == "password"
+    # La contraseña nunca llega a los logs
+    assert all("wrong-secret" not in str(vars(r)) for r in caplog.records)
+
+@pytest.mark.asyncio
+async def test_password_hashing_runs_off_the_event_loop():
+    import asyncio
+    import threading
+    from app.hashing import PasswordHasher
+
+    hasher = PasswordHasher(max_workers=2)
+    loop_thread = threading.get_ident()
+    threads = set()
+
+    def fake_hash(password):
+        threads.add(threading.get_ident())
+        return password[::-1]
+
+    results = await asyncio.gather(*(hasher._run(fake_hash, f"pw{i}") for i in range(6)))
+    assert results[0] == "0wp"
+    assert loop_thread not in threads and len(threads) <= 2
+    assert hasher.stats()["completed"] == 6 and hasher.stats()["queued"] == 0
+    hasher.shutdown()
+
+@pytest.mark.asyncio
+async def test_hash_and_verify_user_password():
+    hashed = await crud.hash_password("secret")
+    user = type("U", (), {"hashed_password": hashed})()
+    assert await crud.verify_user_password(user, "secret")
+    assert not await crud.verify_user_password(user, "other")
+
+@pytest.mark.asyncio
+async def test_stateless_token_skips_user_query(monkeypatch):
+    from app import dependencies
+
+    auth_utils.user_version_cache.clear()
+    user = type("U", (), {"id": 11, "username": "u", "token_version": 3})()
+    token = auth_utils.create_user_token(user)
+    by_username = AsyncMock()
+    version_lookup = AsyncMock(return_value=3)
+    monkeypatch.setattr(dependencies, "get_user_by_username", by_username)
+    monkeypatch.setattr(dependencies, "get_user_token_version", version_lookup)
+
+    for _ in range(3):
+        current = await dependencies.get_current_user(token, db=AsyncMock())
+        assert current.id == 11 and current.username == "u"
+
+    by_username.assert_not_called()
+    # La versión se consulta una vez y luego sale de la cache
+    version_lookup.assert_awaited_once()
+    auth_utils.user_version_cache.clear()
+
+@pytest.mark.asyncio
+async def test_stateless_token_rejected_after_version_bump(monkeypatch):
+    from app import dependencies
+
+    auth_utils.user_version_cache.clear()
+    user = type("U", (), {"id": 12, "username": "u", "token_version": 0})()
+    token = auth_utils.create_user_token(user)
+    monkeypatch.setattr(dependencies, "get_user_token_version", AsyncMock(return_value=0))
+    await dependencies.get_current_user(token, db=AsyncMock())
+
+    # bump_token_version invalida la versión cacheada
+    await crud.bump_token_version(AsyncMock(), 12)
+    monkeypatch.setattr(dependencies, "get_user_token_version", AsyncMock(return_value=1))
+    with pytest.raises(HTTPException) as e:
+        await dependencies.get_current_user(token, db=AsyncMock())
+    assert e.value.status_code == 401
+    auth_utils.user_version_cache.clear()
+
+def test_decoded_tokens_are_cached(monkeypatch):
+    token = auth_utils.create_access_token({"sub": "cached"})
+    auth_utils.token_cache.clear()
+    calls = 0
+    real_decode = jose.jwt.decode
+
+    def counting_decode(*args, **kwargs):
+        nonlocal calls
+        calls += 1
+        return real_decode(*args, **kwargs)
+
+    monkeypatch.setattr(auth_utils.jwt, "decode", counting_decode)
+    assert auth_utils.decode_access_token(token)["sub"] == "cached"
+    assert auth_utils.decode_access_token(token)["sub"] == "cached"
+    assert calls == 1
+    auth_utils.token_cache.clear()
+
+@pytest.mark.asyncio
+async def test_api_key_cache_and_negative_cache(monkeypatch):
+    import uuid
+    from app import dependencies
+
+    auth_utils.api_key_cache.clear()
+    auth_utils.api_key_negative_cache.clear()
+    valid, invalid = str(uuid.uuid4()), str(uuid.uuid4())
+    keys = {valid: type("K", (), {"user_id": 1})()}
+    lookup = AsyncMock(side_effect=lambda db, key: keys.get(key))
+    monkeypatch.setattr(dependencies, "get_api_key", lookup)
+
+    for _ in range(5):
+        await dependencies.verify_api_key(valid, db=AsyncMock())
+        with pytest.raises(HTTPException) as e:
+            await dependencies.verify_api_key(invalid, db=AsyncMock())
+        assert e.value.status_code == 403
+    assert lookup.await_count == 2
+
+    # Una key con formato inválido se rechaza sin consultar la base
+    with pytest.raises(HTTPException):
+        await dependencies.verify_api_key("no-es-una-key", db=AsyncMock())
+    assert lookup.await_count == 2
+    assert auth_utils.api_key_cache_stats()["db_lookups_avoided"] >= 8
+
+    # Revocar la key la saca de la cache
+    db = AsyncMock()
+    db.execute.return_value = type("R", (), {"rowcount": 1})()
+    assert await crud.revoke_api_key(db, valid)
+    keys.clear()
+    with pytest.raises(HTTPException):
+        await dependencies.verify_api_key(valid, db=AsyncMock())
+    assert lookup.await_count == 3
+    auth_utils.api_key_cache.clear()
+    auth_utils.api_key_negative_cache.clear()
+
+@pytest.mark.asyncio
+async def test_is_authenticated_requires_valid_token_and_api_key(monkeypatch):
+    import uuid
+    from app import dependencies
+
+    auth_utils.api_key_cache.clear()
+    auth_utils.api_key_negative_cache.clear()
+    auth_utils.user_version_cache.clear()
+    valid, revoked = str(uuid.uuid4()), str(uuid.uuid4())
+    monkeypatch.setattr(dependencies, "get_api_key", AsyncMock(
+        side_effect=lambda db, key: type("K", (), {"user_id": 1})() if key == valid else None
+    ))
+    monkeypatch.setattr(dependencies, "get_user_token_version", AsyncMock(return_value=0))
+    user = type("U", (), {"id": 13, "username": "u", "token_version": 0})()
+    bearer = f"Bearer {auth_utils.create_user_token(user)}"
+
+    assert await dependencies.is_authenticated({"authorization": bearer, "x-api-key": valid})
+    assert not await dependencies.is_authenticated({"authorization": bearer, "x-api-key": revoked})
+    assert not await dependencies.is_authenticated({"authorization": "Bearer basura", "x-api-key": valid})
+    assert not await dependencies.is_authenticated({"x-api-key": valid})
+    auth_utils.api_key_cache.clear()
+    auth_utils.api_key_negative_cache.clear()
+    auth_utils.user_version_cache.clear()
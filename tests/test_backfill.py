@@ -0,0 +1,26 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from app import backfill
+
+
+def _session(ids):
+    db = MagicMock()
+    db.execute = AsyncMock(return_value=MagicMock(**{"scalars.return_value.all.return_value": ids}))
+    db.commit = AsyncMock()
+    return db
+
+
+@pytest.mark.asyncio
+async def test_backfill_chunk_updates_items_then_orders_and_commits():
+    db = _session([4, 7, 9])
+    assert await backfill.backfill_chunk(db, after_id=3, chunk_size=3) == 9
+    # Selección del tramo, precios de los ítems y totales de los pedidos
+    assert db.execute.await_count == 3
+    db.commit.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_backfill_chunk_stops_when_nothing_left():
+    db = _session([])
+    assert await backfill.backfill_chunk(db, after_id=9, chunk_size=3) is None
+    db.commit.assert_not_awaited()
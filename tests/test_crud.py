@@ -24,7 +24,7 @@ def test_create_customer_invalid_name_schema():
 
 @pytest.mark.asyncio
 async def test_get_customer_notfound(monkeypatch):
-    monkeypatch.setattr(crud, "get_customer_by_id", AsyncMock(return_value=None))
+    monkeypatch.setattr(crud, "read_customer", AsyncMock(return_value=None))
     from app.routers.customer import get_customer
     with pytest.raises(HTTPException) as e:
         await get_customer(5, db=AsyncMock())
@@ -56,8 +56,145 @@ def test_order_create_schema_rejects_duplicates():
 
 @pytest.mark.asyncio
 async def test_get_order_notfound(monkeypatch):
-    monkeypatch.setattr(crud, "get_order_by_id", AsyncMock(return_value=None))
+    monkeypatch.setattr(crud, "read_order", AsyncMock(return_value=None))
     from app.routers.order import get_order
     with pytest.raises(HTTPException) as e:
         await get_order(123, db=AsyncMock())
     assert e.value.status_code == 404
+
+def _session_returning(*results):
+    from unittest.mock import MagicMock
+    db = MagicMock()
+    db.get_bind.return_value.dialect.name = "sqlite"
+    db.execute = AsyncMock(side_effect=[
+        MagicMock(**{"all.return_value": r, "scalars.return_value.all.return_value": r}) for r in results
+    ])
+    db.rollback = AsyncMock()
+    db.commit = AsyncMock()
+    return db
+
+@pytest.mark.asyncio
+async def test_create_order_rejects_unknown_customer():
+    db = _session_returning([])
+    oc = schemas.OrderCreate(customer_id=9, items=[schemas.OrderItemCreate(product_id=1, quantity=1)])
+    with pytest.raises(HTTPException) as e:
+        await crud.create_order(db, oc)
+    assert e.value.status_code == 400
+    # Solo se ejecutó la validación: nada se escribió
+    assert db.execute.await_count == 1
+    db.commit.assert_not_awaited()
+
+@pytest.mark.asyncio
+async def test_create_order_rejects_unknown_products():
+    db = _session_returning([(1, 1, 10.0)])
+    oc = schemas.OrderCreate(customer_id=1, items=[
+        schemas.OrderItemCreate(product_id=1, quantity=1),
+        schemas.OrderItemCreate(product_id=2, quantity=1),
+    ])
+    with pytest.raises(HTTPException) as e:
+        await crud.create_order(db, oc)
+    assert "[2]" in e.value.detail
+    db.commit.assert_not_awaited()
+
+@pytest.mark.asyncio
+async def test_create_order_builds_response_from_returning_rows():
+    from datetime import datetime, timezone
+    created = datetime(2025, 8, 1, tzinfo=timezone.utc)
+    db = _session_returning(
+        [(1, 1, 10.0), (1, 2, 2.5)], [(10, created)], [(101, 10, 1, 2, 10.0), (102, 10, 2, 1, 2.5)],
+        None, None, None,   # outbox y rollups por día y por producto
+    )
+    oc = schemas.OrderCreate(customer_id=1, items=[
+        schemas.OrderItemCreate(product_id=1, quantity=2),
+        schemas.OrderItemCreate(product_id=2, quantity=1),
+    ])
+    res = await crud.create_order(db, oc)
+    assert res.id == 10 and res.created_at == created
+    assert [(i.id, i.product_id, i.quantity) for i in res.items] == [(101, 1, 2), (102, 2, 1)]
+    assert (res.subtotal, res.total) == (22.5, 22.5)
+    # Precio unitario y total se calculan con los precios leídos al validar
+    order_rows = db.execute.await_args_list[1].args[1]
+    item_rows = db.execute.await_args_list[2].args[1]
+    assert order_rows == [{"customer_id": 1, "subtotal": 22.5, "total": 22.5}]
+    assert [row["unit_price"] for row in item_rows] == [10.0, 2.5]
+    # Validación, pedido, ítems, outbox y rollups: sin refresh posterior
+    assert db.execute.await_count == 6
+    db.commit.assert_awaited_once()
+
+@pytest.mark.asyncio
+async def test_create_orders_batch_reports_partial_failures():
+    from datetime import datetime, timezone
+    created = datetime(2025, 8, 1, tzinfo=timezone.utc)
+    db = _session_returning(
+        [1],            # clientes existentes
+        [(1, 4.0), (2, 1.5)],   # productos existentes y sus precios
+        [(20, created), (21, created)],
+        [(201, 20, 1, 1, 4.0), (202, 21, 2, 3, 1.5)],
+        None, None, None,   # outbox y rollups
+    )
+    orders = [
+        schemas.OrderCreate(customer_id=1, items=[schemas.OrderItemCreate(product_id=1, quantity=1)]),
+        schemas.OrderCreate(customer_id=2, items=[schemas.OrderItemCreate(product_id=1, quantity=1)]),
+        schemas.OrderCreate(customer_id=1, items=[schemas.OrderItemCreate(product_id=2, quantity=3)]),
+        schemas.OrderCreate(customer_id=1, items=[schemas.OrderItemCreate(product_id=9, quantity=1)]),
+    ]
+    res = await crud.create_orders_batch(db, orders, chunk_size=100)
+
+    assert (res.created, res.failed) == (2, 2)
+    assert [r.index for r in res.results] == [0, 1, 2, 3]
+    assert res.results[0].order.id == 20 and res.results[2].order.items[0].quantity == 3
+    assert res.results[0].order.total == 4.0 and res.results[2].order.total == 4.5
+    assert "cliente 2" in res.results[1].error and "[9]" in res.results[3].error
+    # Dos consultas de validación para todo el lote y un commit por tramo
+    assert db.execute.await_count == 7
+    db.commit.assert_awaited_once()
+
+@pytest.mark.asyncio
+async def test_list_customer_orders_pages_by_key_and_batches_items():
+    from collections import namedtuple
+    from datetime import datetime, timezone
+    Row = namedtuple("Row", "id created_at subtotal total status")
+    t1, t2 = datetime(2025, 8, 2, tzinfo=timezone.utc), datetime(2025, 8, 1, tzinfo=timezone.utc)
+    db = _session_returning(
+        [Row(12, t1, 5.0, 5.0, "confirmed"), Row(11, t2, None, None, "pending"), Row(10, t2, 1.0, 1.0, "pending")],   # limit + 1 filas
+        [(111, 11, 3, 1, None), (121, 12, 1, 2, 2.0), (122, 12, 2, 1, 1.0)],
+    )
+    orders, next_position = await crud.list_customer_orders(db, 4, before=None, limit=2)
+
+    assert [o.id for o in orders] == [12, 11]
+    assert [i.id for i in orders[0].items] == [121, 122] and orders[1].items[0].product_id == 3
+    assert next_position == (t2, 11)
+    assert orders[0].total == 5.0 and orders[0].items[0].unit_price == 2.0
+    assert [o.status for o in orders] == ["confirmed", "pending"]
+    # Pedidos anteriores al cambio: sin precio hasta correr el backfill
+    assert orders[1].total is None and orders[1].items[0].unit_price is None
+    # Una consulta para la página y otra para todos sus ítems
+    assert db.execute.await_count == 2
+
+@pytest.mark.asyncio
+async def test_read_order_builds_dict_from_joined_rows():
+    from datetime import datetime
+    created = datetime(2025, 8, 1, 12, 0)
+    db = _session_returning([
+        (5, 2, created, 29.5, 29.5, "pending", 10, 7, 1, 9.5),
+        (5, 2, created, 29.5, 29.5, "pending", 11, 8, 2, 10.0),
+    ])
+    order = await crud.read_order(db, 5)
+    assert list(order) == list(schemas.OrderResponse.model_fields)
+    assert order["items"] == [
+        {"id": 10, "product_id": 7, "quantity": 1, "unit_price": 9.5},
+        {"id": 11, "product_id": 8, "quantity": 2, "unit_price": 10.0},
+    ]
+
+    # Pedido sin ítems: el LEFT JOIN devuelve una fila con los ítems en NULL
+    db = _session_returning([(6, 2, created, None, None, "confirmed", None, None, None, None)])
+    assert (await crud.read_order(db, 6))["items"] == []
+    assert await crud.read_order(_session_returning([]), 7) is None
+
+def test_order_cursor_roundtrip_and_invalid():
+    from datetime import datetime, timezone
+    position = (datetime(2025, 8, 1, 12, 30, 0, 123456, tzinfo=timezone.utc), 42)
+    assert crud.decode_order_cursor(crud.encode_order_cursor(*position)) == position
+    with pytest.raises(HTTPException) as e:
+        crud.decode_order_cursor("no-es-un-cursor")
+    assert e.value.status_code == 400
@@ -22,3 +22,68 @@ async def test_get_inventory_notfound(monkeypatch):
     with pytest.raises(HTTPException) as excinfo:
         await get_inventory(99)
     assert excinfo.value.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_inventory_concurrent_requests_are_coalesced(monkeypatch):
+    import asyncio
+    import httpx
+    from app import external
+
+    calls = 0
+
+    async def handler(request):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return httpx.Response(200, json={"id": 7, "stock": 3})
+
+    monkeypatch.setattr(external.settings, "INVENTORY_API_URL", "http://inventory.test")
+    monkeypatch.setattr(external, "_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    external.inventory_cache.clear()
+
+    results = await asyncio.gather(*(external.get_inventory_for_product(7) for _ in range(500)))
+    assert calls == 1
+    assert all(r == {"id": 7, "stock": 3} for r in results)
+
+    # Las siguientes lecturas salen de la cache
+    assert await external.get_inventory_for_product(7) == {"id": 7, "stock": 3}
+    assert calls == 1
+    stats = external.inventory_cache_stats()
+    assert stats["coalesced"] >= 499 and stats["hits"] >= 1
+    external.inventory_cache.clear()
+
+
+@pytest.mark.asyncio
+async def test_inventory_bulk_dedupes_and_reports_partial_failures(monkeypatch):
+    import asyncio
+    from app import external
+
+    running = 0
+    peak = 0
+
+    async def fake_lookup(product_id):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return None if product_id == 2 else {"id": product_id}
+
+    lookup = AsyncMock(side_effect=fake_lookup)
+    monkeypatch.setattr(external, "get_inventory_for_product", lookup)
+
+    results = await external.get_inventory_bulk([1, 2, 3, 1, 4, 5], concurrency=2)
+
+    assert lookup.await_count == 5
+    assert peak <= 2
+    assert results[1] == {"inventory": {"id": 1}}
+    assert "error" in results[2]
+
+
+def test_inventory_bulk_endpoint_rejects_bad_ids():
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    resp = TestClient(app).get("/products/inventory?ids=1,x")
+    assert resp.status_code == 400
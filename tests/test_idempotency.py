@@ -0,0 +1,174 @@
+import asyncio
+import hashlib
+from datetime import datetime, timedelta, timezone
+import httpx
+import pytest
+import pytest_asyncio
+from fastapi import FastAPI, Header, HTTPException
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from app import models
+from app.idempotency import IdempotencyMiddleware, IdempotencyStore, storage_key
+
+pytest.importorskip("aiosqlite")
+
+
+@pytest_asyncio.fixture
+async def store(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/idempotency.db")
+    async with engine.begin() as conn:
+        await conn.run_sync(models.IdempotencyKey.__table__.create)
+    yield IdempotencyStore(sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False), ttl=60, pending_timeout=5)
+    await engine.dispose()
+
+
+def _client(store, calls: list, delay: float = 0, status: int = 201, api_keys=("k1", "k2")):
+    app = FastAPI()
+    # Como verify_api_key: la ruta rechaza las keys que no están (o se revocaron)
+    valid = set(api_keys)
+
+    async def authenticate(headers):
+        return headers.get("x-api-key") in valid
+
+    @app.post("/orders/", status_code=201)
+    async def create(payload: dict, x_api_key: str | None = Header(None)):
+        if x_api_key not in valid:
+            raise HTTPException(status_code=403, detail="API Key inválida")
+        calls.append(payload)
+        await asyncio.sleep(delay)
+        if status >= 500:
+            raise HTTPException(status_code=status, detail="Error interno")
+        return {"id": len(calls), **payload}
+
+    asgi = IdempotencyMiddleware(app, store, authenticate, wait_timeout=2, poll_interval=0.01)
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=asgi), base_url="http://test")
+    client.valid_api_keys = valid
+    return client
+
+
+def _headers(key: str, api_key: str = "k1") -> dict:
+    return {"Idempotency-Key": key, "X-API-Key": api_key}
+
+
+@pytest.mark.asyncio
+async def test_retry_replays_stored_response_without_executing(store):
+    calls = []
+    async with _client(store, calls) as client:
+        first = await client.post("/orders/", json={"customer_id": 1}, headers=_headers("abc"))
+        again = await client.post("/orders/", json={"customer_id": 1}, headers=_headers("abc"))
+        # Otra API Key con la misma cabecera es otra key
+        other = await client.post("/orders/", json={"customer_id": 1}, headers=_headers("abc", "k2"))
+        plain = await client.post("/orders/", json={"customer_id": 1}, headers={"X-API-Key": "k1"})
+
+    assert len(calls) == 3
+    assert again.status_code == 201 and again.content == first.content
+    assert again.headers["idempotent-replayed"] == "true"
+    assert "idempotent-replayed" not in first.headers
+    assert other.json()["id"] == 2 and plain.json()["id"] == 3
+
+
+@pytest.mark.asyncio
+async def test_stored_response_is_not_replayed_without_valid_credentials(store):
+    calls = []
+    async with _client(store, calls) as client:
+        first = await client.post("/orders/", json={"customer_id": 1}, headers=_headers("abc"))
+        # Sin API Key válida y con la key revocada: responde la aplicación (403), no la respuesta guardada
+        forged = await client.post("/orders/", json={"customer_id": 1}, headers=_headers("abc", "robada"))
+        client.valid_api_keys.discard("k1")
+        revoked = await client.post("/orders/", json={"customer_id": 1}, headers=_headers("abc"))
+        client.valid_api_keys.add("k1")
+        again = await client.post("/orders/", json={"customer_id": 1}, headers=_headers("abc"))
+
+    assert first.status_code == 201 and len(calls) == 1
+    for resp in (forged, revoked):
+        assert resp.status_code == 403 and "idempotent-replayed" not in resp.headers
+    assert again.headers["idempotent-replayed"] == "true" and again.content == first.content
+
+
+@pytest.mark.asyncio
+async def test_concurrent_duplicates_execute_once(store):
+    calls = []
+    async with _client(store, calls, delay=0.05) as client:
+        responses = await asyncio.gather(*(
+            client.post("/orders/", json={"customer_id": 1}, headers=_headers("same")) for _ in range(5)
+        ))
+    assert len(calls) == 1
+    assert {r.json()["id"] for r in responses} == {1}
+    assert sum(r.headers.get("idempotent-replayed") == "true" for r in responses) == 4
+
+
+@pytest.mark.asyncio
+async def test_pending_key_from_other_instance_waits_then_replays(store):
+    calls = []
+    body = b'{"customer_id":1}'
+    key = storage_key("k1", "/orders/", "pending")
+    # Otra instancia reservó la key y todavía no respondió
+    assert await store.claim(key, hashlib.sha256(body).hexdigest()) is None
+
+    async def finish():
+        await asyncio.sleep(0.05)
+        await store.complete(key, 201, "application/json", b'{"id":99}')
+
+    async with _client(store, calls) as client:
+        headers = {**_headers("pending"), "Content-Type": "application/json"}
+        resp, _ = await asyncio.gather(client.post("/orders/", content=body, headers=headers), finish())
+    assert calls == [] and resp.json() == {"id": 99}
+
+
+@pytest.mark.asyncio
+async def test_claim_is_extended_while_a_long_request_runs(store):
+    store.pending_timeout = timedelta(seconds=0.15)
+    calls = []
+    body = b'{"customer_id":1}'
+    key = storage_key("k1", "/orders/", "lento")
+
+    async def other_instance():
+        # Pasado el pending_timeout la reserva sigue viva: otra instancia no la puede tomar
+        await asyncio.sleep(0.4)
+        return await store.claim(key, hashlib.sha256(body).hexdigest())
+
+    async with _client(store, calls, delay=0.6) as client:
+        headers = {**_headers("lento"), "Content-Type": "application/json"}
+        resp, claimed = await asyncio.gather(client.post("/orders/", content=body, headers=headers), other_instance())
+    assert resp.status_code == 201 and len(calls) == 1
+    assert claimed is not None and claimed.status_code is None
+
+
+@pytest.mark.asyncio
+async def test_reused_key_with_other_body_is_rejected(store):
+    calls = []
+    async with _client(store, calls) as client:
+        await client.post("/orders/", json={"customer_id": 1}, headers=_headers("abc"))
+        resp = await client.post("/orders/", json={"customer_id": 2}, headers=_headers("abc"))
+    assert resp.status_code == 422 and len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_server_error_releases_key_for_retry(store):
+    calls = []
+    async with _client(store, calls, status=503) as client:
+        await client.post("/orders/", json={"customer_id": 1}, headers=_headers("abc"))
+        resp = await client.post("/orders/", json={"customer_id": 1}, headers=_headers("abc"))
+    assert resp.status_code == 503 and len(calls) == 2
+    assert "idempotent-replayed" not in resp.headers
+
+
+@pytest.mark.asyncio
+async def test_purge_deletes_expired_keys_in_batches(store):
+    now = datetime.now(timezone.utc)
+    async with store.session_factory() as db:
+        await db.execute(insert(models.IdempotencyKey), [
+            {"key": f"old{i}", "fingerprint": "f", "status_code": 201, "body": b"{}",
+             "expires_at": now - timedelta(seconds=1)}
+            for i in range(25)
+        ] + [{"key": "live", "fingerprint": "f", "expires_at": now + timedelta(minutes=5)}])
+        await db.commit()
+
+    # Una key vencida que todavía no se purgó se puede volver a reservar
+    assert await store.claim("old0", "f") is None
+
+    assert await store.purge_expired(batch_size=10) == 24
+    async with store.session_factory() as db:
+        keys = (await db.execute(select(models.IdempotencyKey.key))).scalars().all()
+    assert sorted(keys) == ["live", "old0"]
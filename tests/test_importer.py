@@ -0,0 +1,78 @@
+import pytest
+from unittest.mock import AsyncMock
+from app import importer, models, schemas
+
+
+async def chunks(*parts: bytes):
+    for part in parts:
+        yield part
+
+
+async def collect(aiter):
+    return [item async for item in aiter]
+
+
+@pytest.mark.asyncio
+async def test_iter_lines_handles_splits_across_chunks():
+    lines = await collect(importer.iter_lines(chunks(b'{"a":', b' 1}\r\n{"b"', b": 2}\nfin", "á".encode()[:1], "á".encode()[1:]), 100))
+    assert lines == ['{"a": 1}', '{"b": 2}', "finá"]
+
+
+@pytest.mark.asyncio
+async def test_long_line_is_a_row_error_and_is_not_buffered():
+    # La línea larga llega en varios trozos sin salto de línea: no se acumula
+    body = [b'{"name": "Mesa"}\n{"name": "', *([b"x" * 40] * 5), b'"}\n{"name": "Silla"}']
+    lines = await collect(importer.iter_lines(chunks(*body), 32))
+    assert lines == ['{"name": "Mesa"}', None, '{"name": "Silla"}']
+
+    records = await collect(importer.iter_records(chunks(*body), "application/x-ndjson", 32))
+    assert records[0] == (1, {"name": "Mesa"}, None)
+    assert records[1][0] == 2 and "demasiado larga" in records[1][2]
+    assert records[2] == (3, {"name": "Silla"}, None)
+
+
+@pytest.mark.asyncio
+async def test_iter_records_parses_csv_with_header():
+    records = await collect(importer.iter_records(
+        chunks(b"name,price\nMesa,10.5\nSilla\n"), "text/csv; charset=utf-8", 100
+    ))
+    assert records[0] == (2, {"name": "Mesa", "price": "10.5"}, None)
+    assert records[1][0] == 3 and records[1][2] is not None
+
+
+@pytest.mark.asyncio
+async def test_run_import_dedupes_and_reports_row_errors():
+    db = AsyncMock()
+    stored = {"Mesa"}
+
+    async def existing(db, names):
+        return names & stored
+
+    async def execute(stmt, rows):
+        stored.update(row["name"] for row in rows)
+
+    db.execute.side_effect = execute
+    spec = importer.ImportSpec(
+        schema=schemas.ProductCreate,
+        model=models.Product,
+        key=lambda item: item.name,
+        existing=existing,
+    )
+    body = (
+        b'{"name": "Mesa", "price": 10}\n'
+        b'{"name": "Silla", "price": 5}\n'
+        b'{"name": "Silla", "price": 6}\n'
+        b'{"name": "", "price": 1}\n'
+        b"no es json\n"
+        b'{"name": "Lampara", "price": 7}\n'
+    )
+    records = importer.iter_records(chunks(body), "application/x-ndjson", 100)
+    summary = await importer.run_import(db, records, spec, chunk_size=3, max_errors=1)
+
+    assert (summary.received, summary.created, summary.duplicates, summary.failed) == (6, 2, 2, 2)
+    # Solo se guarda el detalle de un error, pero se cuentan todos
+    assert [e.line for e in summary.errors] == [4]
+    # Un INSERT multi-fila por tramo con filas nuevas
+    inserted = [call.args[1] for call in db.execute.await_args_list]
+    assert inserted == [[{"name": "Silla", "price": 5.0}], [{"name": "Lampara", "price": 7.0}]]
+    assert db.commit.await_count == 2
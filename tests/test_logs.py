@@ -0,0 +1,83 @@
+import io
+import json
+import logging
+import threading
+from app import logs
+
+
+def _records(stream: io.StringIO) -> list[dict]:
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+
+class _ThreadRecordingStream(io.StringIO):
+    def __init__(self):
+        super().__init__()
+        self.writers = set()
+
+    def write(self, text):
+        self.writers.add(threading.get_ident())
+        return super().write(text)
+
+
+def test_json_pipeline_writes_from_background_thread():
+    stream = _ThreadRecordingStream()
+    try:
+        logs.setup_logging(level="INFO", stream=stream)
+        logger = logging.getLogger("app.prueba")
+        logger.info("Pedido %s creado", 7, extra={"order_id": 7})
+        try:
+            raise ValueError("fallo")
+        except ValueError:
+            logger.exception("Error procesando")
+    finally:
+        logs.stop_logging()
+
+    created, failed = [r for r in _records(stream) if r["logger"] == "app.prueba"]
+    assert created["msg"] == "Pedido 7 creado" and created["order_id"] == 7
+    assert created["level"] == "INFO" and created["ts"].endswith("Z")
+    assert "ValueError: fallo" in failed["exc"]
+    assert stream.writers and threading.get_ident() not in stream.writers
+
+
+def test_module_levels_and_debug_sampling():
+    stream = io.StringIO()
+    try:
+        logs.setup_logging(
+            level="INFO",
+            module_levels=logs.parse_levels("app.ruidoso=DEBUG, app.callado=ERROR"),
+            debug_sample_rate=0.1,
+            stream=stream,
+        )
+        for i in range(100):
+            logging.getLogger("app.ruidoso").debug("detalle %s", i)
+        logging.getLogger("app.callado").warning("no se escribe")
+        logging.getLogger("app.otro").debug("tampoco")
+    finally:
+        logs.stop_logging()
+        logging.getLogger("app.ruidoso").setLevel(logging.NOTSET)
+        logging.getLogger("app.callado").setLevel(logging.NOTSET)
+
+    messages = [r["msg"] for r in _records(stream)]
+    assert len([m for m in messages if m.startswith("detalle")]) == 10
+    assert "no se escribe" not in messages and "tampoco" not in messages
+
+
+def test_stop_logging_removes_queue_handler():
+    stream = io.StringIO()
+    logs.setup_logging(level="INFO", stream=stream)
+    logging.getLogger("app.prueba").info("antes")
+    logs.stop_logging()
+    logging.getLogger("app.prueba").info("después")
+
+    assert not [h for h in logging.getLogger().handlers if isinstance(h, logs._QueueHandler)]
+    assert [r["msg"] for r in _records(stream)] == ["antes"]
+
+
+def test_sql_echo_goes_through_logging():
+    try:
+        logs.setup_logging(sql_echo=True, stream=io.StringIO())
+        assert logging.getLogger("sqlalchemy.engine").getEffectiveLevel() == logging.INFO
+        logs.setup_logging(sql_echo=False, stream=io.StringIO())
+        assert logging.getLogger("sqlalchemy.engine").getEffectiveLevel() == logging.WARNING
+    finally:
+        logs.stop_logging()
@@ -0,0 +1,67 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from app import metrics
+
+
+def test_histogram_renders_cumulative_buckets():
+    h = metrics.Histogram("t_seconds", "Prueba.", ("route",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        h.observe(value, "/a")
+    lines = h.render()
+    assert 't_seconds_bucket{route="/a",le="0.1"} 2' in lines
+    assert 't_seconds_bucket{route="/a",le="1.0"} 3' in lines
+    assert 't_seconds_bucket{route="/a",le="+Inf"} 4' in lines
+    assert 't_seconds_count{route="/a"} 4' in lines
+    assert 't_seconds_sum{route="/a"} 3.65' in lines
+
+
+def test_register_stats_flattens_nested_dicts():
+    registry = metrics.Registry()
+    metrics.registry, original = registry, metrics.registry
+    try:
+        metrics.register_stats("cache", "Prueba.", lambda: {"valid": {"hits": 2}, "rate": 0.5, "name": "x"})
+    finally:
+        metrics.registry = original
+    assert registry.render().splitlines()[2:] == ['cache{stat="valid_hits"} 2', 'cache{stat="rate"} 0.5']
+
+
+def test_middleware_labels_by_route_template():
+    app = FastAPI()
+    app.add_middleware(metrics.MetricsMiddleware)
+
+    @app.get("/items/{item_id}")
+    def item(item_id: int):
+        return {}
+
+    client = TestClient(app)
+    client.get("/items/1")
+    client.get("/items/2")
+    client.get("/no-existe")
+    assert metrics.http_duration.series[("/items/{item_id}", "GET", 200)][0][-1] == 0
+    assert sum(metrics.http_duration.series[("/items/{item_id}", "GET", 200)][0]) == 2
+    assert ("unmatched", "GET", 404) in metrics.http_duration.series
+    assert metrics.http_in_flight.values[("GET",)] == 0
+
+
+@pytest.mark.asyncio
+async def test_statements_counted_per_request(tmp_path):
+    pytest.importorskip("aiosqlite")
+    url = f"sqlite+aiosqlite:///{tmp_path}/m.db"
+    engine = create_async_engine(url, **metrics.pool_options(url, "prueba"))
+    metrics.instrument_engine(engine, "prueba")
+    holder = [0]
+    token = metrics._request_statements.set(holder)
+    try:
+        async with engine.connect() as conn:
+            for _ in range(3):
+                await conn.execute(text("SELECT 1"))
+    finally:
+        metrics._request_statements.reset(token)
+        await engine.dispose()
+    assert holder == [3]
+    assert metrics.db_statements.values[("prueba",)] == 3
+    assert metrics.pool_events.values[("prueba", "checkout")] == 1
+    assert sum(metrics.pool_wait.series[("prueba",)][0]) == 1
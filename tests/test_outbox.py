@@ -0,0 +1,70 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from sqlalchemy.sql import Delete
+from app.outbox import OutboxRelay
+from app import models
+
+
+class FakeSession:
+    """Sesión mínima: devuelve las filas del outbox y registra los DELETE."""
+
+    def __init__(self, store):
+        self.store = store
+        self.commit = AsyncMock()
+        self.rollback = AsyncMock()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, stmt):
+        if isinstance(stmt, Delete):
+            self.store.clear()
+            return MagicMock()
+        result = MagicMock()
+        result.scalars.return_value.all.return_value = list(self.store)
+        return result
+
+
+def make_event(i):
+    return models.OutboxEvent(id=i, event_type="order_created", payload={"order_id": i})
+
+
+@pytest.mark.asyncio
+async def test_relay_publishes_batch_and_deletes_rows():
+    store = [make_event(1), make_event(2)]
+    publish_many = AsyncMock()
+    relay = OutboxRelay(lambda: FakeSession(store), publish_many, batch_size=10)
+
+    published = await relay.relay_once()
+
+    assert published == 2
+    publish_many.assert_awaited_once_with([{"order_id": 1}, {"order_id": 2}])
+    assert store == []
+
+
+@pytest.mark.asyncio
+async def test_relay_keeps_rows_when_publish_fails():
+    store = [make_event(1)]
+    relay = OutboxRelay(
+        lambda: FakeSession(store), AsyncMock(side_effect=RuntimeError("broker caído")), batch_size=10
+    )
+
+    with pytest.raises(RuntimeError):
+        await relay.relay_once()
+    assert len(store) == 1
+
+
+@pytest.mark.asyncio
+async def test_relay_wakes_up_when_batch_is_full():
+    relay = OutboxRelay(lambda: FakeSession([]), AsyncMock(), batch_size=3, flush_interval=60)
+    relay.drain = AsyncMock(return_value=0)
+    relay.start()
+    relay.notify(3)
+    await asyncio.sleep(0.01)
+    await relay.stop()
+    # Una vez por el lote completo y otra en el vaciado final de stop()
+    assert relay.drain.await_count == 2
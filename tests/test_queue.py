@@ -1,27 +1,47 @@
 import pytest
-from app.queue import publish_order_created
 import aio_pika
-from unittest.mock import AsyncMock, patch
+from unittest.mock import AsyncMock
+from app.queue import OrderPublisher
 
-@pytest.mark.asyncio
-async def test_publish_order_created(monkeypatch):
+
+def mock_broker(monkeypatch):
     # Mocks de conexión y canal
     mock_conn = AsyncMock()
     mock_channel = AsyncMock()
-    mock_queue = AsyncMock()
-
-    monkeypatch.setattr(aio_pika, "connect_robust", AsyncMock(return_value=mock_conn))
-    mock_conn.__aenter__.return_value = mock_conn
+    connect = AsyncMock(return_value=mock_conn)
+    monkeypatch.setattr(aio_pika, "connect_robust", connect)
     mock_conn.channel.return_value = mock_channel
-    mock_channel.declare_queue.return_value = mock_queue
     mock_channel.default_exchange.publish = AsyncMock()
+    return connect, mock_channel
 
-    data = {
-        "order_id": 1,
-        "customer_id": 1,
-        "items": [{"product_id": 1, "quantity": 1}]
-    }
 
-    await publish_order_created(data)
+@pytest.mark.asyncio
+async def test_publisher_reuses_connection(monkeypatch):
+    connect, mock_channel = mock_broker(monkeypatch)
+
+    pub = OrderPublisher("amqp://fake", pool_size=2)
+    await pub.start()
+    await pub.publish({"order_id": 0})
+    await pub.publish_many([{"order_id": i} for i in range(1, 5)])
+    await pub.stop()
+
+    connect.assert_called_once()
+    mock_channel.declare_queue.assert_called_once()
+    assert mock_channel.default_exchange.publish.call_count == 5
+    assert not pub.running
+
+
+@pytest.mark.asyncio
+async def test_publish_many_raises_if_a_message_is_not_confirmed(monkeypatch):
+    _, mock_channel = mock_broker(monkeypatch)
+    mock_channel.default_exchange.publish = AsyncMock(
+        side_effect=[None, aio_pika.exceptions.DeliveryError(None, None), None]
+    )
 
-    mock_channel.default_exchange.publish.assert_called_once()
+    pub = OrderPublisher("amqp://fake")
+    await pub.start()
+    # El relay del outbox no borra el lote si falta una confirmación
+    with pytest.raises(aio_pika.exceptions.DeliveryError):
+        await pub.publish_many([{"order_id": i} for i in range(3)])
+    assert mock_channel.default_exchange.publish.call_count == 3
+    await pub.stop()
@@ -0,0 +1,124 @@
+import time
+import pytest
+import pytest_asyncio
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from starlette.requests import Request
+from app import dependencies
+from app.replicas import READ_PRIMARY_COOKIE, ReadReplicas, ReadYourWritesMiddleware
+
+pytest.importorskip("aiosqlite")
+
+
+async def _database(path, name):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    async with engine.begin() as conn:
+        await conn.execute(text("CREATE TABLE IF NOT EXISTS origin (name TEXT)"))
+        await conn.execute(text("DELETE FROM origin"))
+        await conn.execute(text("INSERT INTO origin VALUES (:name)"), {"name": name})
+    return engine
+
+
+async def _origin(session: AsyncSession) -> str:
+    async with session:
+        return (await session.execute(text("SELECT name FROM origin"))).scalar_one()
+
+
+def _request(cookies: dict | None = None) -> Request:
+    cookie = "; ".join(f"{k}={v}" for k, v in (cookies or {}).items())
+    return Request({"type": "http", "headers": [(b"cookie", cookie.encode())] if cookie else []})
+
+
+@pytest_asyncio.fixture
+async def routing(tmp_path, monkeypatch):
+    primary = await _database(tmp_path / "primary.db", "primaria")
+    replica = await _database(tmp_path / "replica.db", "réplica")
+    broken = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/no-existe/replica.db")
+    primary_factory = sessionmaker(bind=primary, class_=AsyncSession, expire_on_commit=False)
+    replicas = ReadReplicas([replica, broken], primary_factory)
+    monkeypatch.setattr(dependencies, "replicas", replicas)
+    yield replicas, replica, broken
+    for engine in (primary, replica, broken):
+        await engine.dispose()
+
+
+async def _read_origin(request: Request) -> str | None:
+    """Lee como un endpoint con get_read_db; None si la lectura falló."""
+    dependency = dependencies.get_read_db(request)
+    session = await anext(dependency)
+    try:
+        origin = (await session.execute(text("SELECT name FROM origin"))).scalar_one()
+    except Exception as e:
+        with pytest.raises(type(e)):
+            await dependency.athrow(e)
+        return None
+    await dependency.aclose()
+    return origin
+
+
+@pytest.mark.asyncio
+async def test_read_session_does_not_connect(routing):
+    replicas, replica, broken = routing
+    sessions = [dependencies.read_session(_request()) for _ in range(2)]
+    # Ni siquiera la réplica rota falla: la conexión se abre con la primera consulta
+    assert [session.bind for session in sessions] == [replica, broken]
+    assert not any(session.in_transaction() for session in sessions)
+    assert replicas.healthy == [replica, broken]
+
+
+@pytest.mark.asyncio
+async def test_reads_go_to_replica_and_failed_replica_is_dropped(routing):
+    replicas, replica, broken = routing
+    origins = [await _read_origin(_request()) for _ in range(4)]
+    # La réplica rota no puede abrir su archivo: esa lectura falla y la réplica queda fuera
+    assert origins == ["réplica", None, "réplica", "réplica"]
+    assert replicas.healthy == [replica]
+
+
+@pytest.mark.asyncio
+async def test_health_check_restores_replica(routing, tmp_path):
+    replicas, replica, broken = routing
+    await replicas.check(timeout=2)
+    assert replicas.healthy == [replica]
+    (tmp_path / "no-existe").mkdir()
+    await replicas.check(timeout=2)
+    assert replicas.healthy == [replica, broken]
+
+
+@pytest.mark.asyncio
+async def test_recent_writer_reads_from_primary(routing):
+    replicas, _, _ = routing
+    recent = _request({READ_PRIMARY_COOKIE: f"{time.time() + 5:.3f}"})
+    expired = _request({READ_PRIMARY_COOKIE: f"{time.time() - 1:.3f}"})
+    assert await _origin(dependencies.read_session(recent)) == "primaria"
+    assert await _origin(dependencies.read_session(expired)) == "réplica"
+
+    replicas.healthy = []
+    assert await _origin(dependencies.read_session(_request())) == "primaria"
+
+
+def test_middleware_marks_successful_writes_only():
+    app = FastAPI()
+    app.add_middleware(ReadYourWritesMiddleware, window=5)
+
+    @app.post("/ok")
+    def ok():
+        return {}
+
+    @app.post("/fail", status_code=400)
+    def fail():
+        return {}
+
+    @app.get("/read")
+    def read():
+        return {}
+
+    client = TestClient(app)
+    written = client.post("/ok")
+    until = float(written.cookies[READ_PRIMARY_COOKIE])
+    assert time.time() < until <= time.time() + 5
+    assert READ_PRIMARY_COOKIE not in client.post("/fail").headers.get("set-cookie", "")
+    assert "set-cookie" not in client.get("/read").headers
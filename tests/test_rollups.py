@@ -0,0 +1,46 @@
+import pytest
+from datetime import date, datetime, timedelta, timezone
+from unittest.mock import AsyncMock, MagicMock
+from sqlalchemy.dialects import sqlite
+from app import rollups, schemas
+
+
+def _session():
+    db = MagicMock()
+    db.get_bind.return_value.dialect.name = "sqlite"
+    db.execute = AsyncMock()
+    return db
+
+
+def _values(stmt):
+    params = stmt.compile(dialect=sqlite.dialect()).params
+    rows = len([k for k in params if k.startswith("orders_m")])
+    return [tuple(params[f"{c}_m{i}"] for c in ("orders", "units", "revenue")) for i in range(rows)]
+
+
+def test_utc_day_converts_aware_datetimes():
+    late = datetime(2025, 8, 1, 22, 30, tzinfo=timezone(timedelta(hours=-3)))
+    assert rollups.utc_day(late) == date(2025, 8, 2)
+    assert rollups.utc_day(datetime(2025, 8, 1, 23, 59)) == date(2025, 8, 1)
+
+
+@pytest.mark.asyncio
+async def test_record_orders_aggregates_before_upserting():
+    db = _session()
+    t = datetime(2025, 8, 1, 12, tzinfo=timezone.utc)
+    orders = [
+        (t, schemas.OrderCreate(customer_id=1, items=[
+            schemas.OrderItemCreate(product_id=2, quantity=1),
+            schemas.OrderItemCreate(product_id=1, quantity=3),
+        ])),
+        (t + timedelta(days=1), schemas.OrderCreate(customer_id=1, items=[
+            schemas.OrderItemCreate(product_id=1, quantity=2),
+        ])),
+    ]
+    await rollups.record_orders(db, orders, {1: 2.0, 2: 5.0})
+
+    # Un upsert por tabla para todo el lote, con claves ordenadas
+    daily, products = (call.args[0] for call in db.execute.await_args_list)
+    assert _values(daily) == [(1, 4, 11.0), (1, 2, 4.0)]
+    assert _values(products) == [(2, 5, 10.0), (1, 1, 5.0)]
+    assert "ON CONFLICT" in str(daily.compile(dialect=sqlite.dialect()))
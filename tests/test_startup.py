@@ -0,0 +1,145 @@
+import os
+import subprocess
+import sys
+import pytest
+import pytest_asyncio
+from sqlalchemy import event, inspect, select
+from sqlalchemy.ext.asyncio import create_async_engine
+from app import migrations, models
+from app.models import warm_pool
+
+pytest.importorskip("aiosqlite")
+
+
+@pytest_asyncio.fixture
+async def engine(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/startup.db")
+    yield engine
+    await engine.dispose()
+
+
+def _count_statements(engine) -> list:
+    statements = []
+    event.listen(engine.sync_engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    return statements
+
+
+@pytest.mark.asyncio
+async def test_current_schema_is_checked_with_a_single_read(engine):
+    assert await migrations.current_version(engine) == 0
+    assert await migrations.ensure_schema(engine) == migrations.LATEST
+
+    statements = _count_statements(engine)
+    assert await migrations.ensure_schema(engine) == migrations.LATEST
+    assert len(statements) == 1 and "schema_version" in statements[0]
+    assert await migrations.migrate(engine) == []
+
+
+@pytest.mark.asyncio
+async def test_migrations_upgrade_a_database_created_before_them(engine):
+    async with engine.begin() as conn:
+        await conn.exec_driver_sql("CREATE TABLE orders (id INTEGER PRIMARY KEY, customer_id INTEGER, created_at DATETIME)")
+        await conn.exec_driver_sql("INSERT INTO orders (id, customer_id) VALUES (1, 1)")
+
+    with pytest.raises(RuntimeError):
+        await migrations.ensure_schema(engine, apply=False)
+    assert await migrations.migrate(engine) == [1, 2]
+
+    async with engine.connect() as conn:
+        row = (await conn.execute(select(models.Order.status, models.Order.total))).one()
+        versions = (await conn.execute(select(models.SchemaVersion.version))).scalars().all()
+    assert tuple(row) == (models.ORDER_PENDING, None)
+    assert versions == [1, 2]
+
+
+# Tablas e índices tal como los creaba create_all con los modelos originales
+BASELINE_TABLES = (
+    "CREATE TABLE customers (id INTEGER NOT NULL, full_name VARCHAR NOT NULL, email VARCHAR NOT NULL, "
+    "PRIMARY KEY (id), UNIQUE (email))",
+    "CREATE INDEX ix_customers_id ON customers (id)",
+    "CREATE TABLE products (id INTEGER NOT NULL, name VARCHAR NOT NULL, price FLOAT NOT NULL, "
+    "PRIMARY KEY (id), UNIQUE (name))",
+    "CREATE TABLE users (id INTEGER NOT NULL, username VARCHAR NOT NULL, hashed_password VARCHAR NOT NULL, "
+    "PRIMARY KEY (id), UNIQUE (username))",
+    "CREATE INDEX ix_users_id ON users (id)",
+    'CREATE TABLE api_keys (id INTEGER NOT NULL, "key" VARCHAR NOT NULL, user_id INTEGER, '
+    "PRIMARY KEY (id), FOREIGN KEY(user_id) REFERENCES users (id))",
+    'CREATE UNIQUE INDEX ix_api_keys_key ON api_keys ("key")',
+    "CREATE TABLE orders (id INTEGER NOT NULL, customer_id INTEGER, created_at DATETIME DEFAULT CURRENT_TIMESTAMP, "
+    "PRIMARY KEY (id), FOREIGN KEY(customer_id) REFERENCES customers (id))",
+    "CREATE TABLE order_items (id INTEGER NOT NULL, order_id INTEGER, product_id INTEGER, quantity INTEGER NOT NULL, "
+    "PRIMARY KEY (id), FOREIGN KEY(order_id) REFERENCES orders (id), FOREIGN KEY(product_id) REFERENCES products (id))",
+)
+
+
+@pytest.mark.asyncio
+async def test_migrations_upgrade_a_baseline_database(engine):
+    async with engine.begin() as conn:
+        for ddl in BASELINE_TABLES:
+            await conn.exec_driver_sql(ddl)
+        await conn.exec_driver_sql("INSERT INTO users (id, username, hashed_password) VALUES (1, 'ana', 'x')")
+        await conn.exec_driver_sql("INSERT INTO customers (id, full_name, email) VALUES (1, 'Ana', 'ana@x.com')")
+        await conn.exec_driver_sql("INSERT INTO orders (id, customer_id) VALUES (1, 1)")
+
+    assert await migrations.ensure_schema(engine) == migrations.LATEST
+
+    async with engine.connect() as conn:
+        user = (await conn.execute(select(models.User.username, models.User.token_version))).one()
+        order = (await conn.execute(select(models.Order.id, models.Order.status))).one()
+        indexes = await conn.run_sync(lambda sync_conn: {
+            index["name"] for table in ("orders", "order_items") for index in inspect(sync_conn).get_indexes(table)
+        })
+    assert tuple(user) == ("ana", 0)
+    assert tuple(order) == (1, models.ORDER_PENDING)
+    assert {"ix_orders_customer_created_id", "ix_order_items_order_id"} <= indexes
+
+
+@pytest.mark.asyncio
+async def test_migrations_cover_every_model_column_and_index(engine):
+    # Una columna o índice nuevo en una tabla existente necesita su migración: create_all no altera tablas
+    async with engine.begin() as conn:
+        for ddl in BASELINE_TABLES:
+            await conn.exec_driver_sql(ddl)
+    await migrations.migrate(engine)
+
+    def schema(sync_conn):
+        inspector = inspect(sync_conn)
+        return {
+            table: (
+                {column["name"] for column in inspector.get_columns(table)},
+                {index["name"] for index in inspector.get_indexes(table)},
+            )
+            for table in inspector.get_table_names()
+        }
+
+    async with engine.connect() as conn:
+        found = await conn.run_sync(schema)
+    for table in models.Base.metadata.sorted_tables:
+        columns, indexes = found[table.name]
+        assert {column.name for column in table.columns} <= columns, table.name
+        assert {index.name for index in table.indexes} <= indexes, table.name
+
+
+@pytest.mark.asyncio
+async def test_newer_schema_does_not_block_startup(engine):
+    await migrations.migrate(engine)
+    async with engine.begin() as conn:
+        await conn.execute(models.SchemaVersion.__table__.insert().values(version=99, description="futura"))
+    assert await migrations.ensure_schema(engine, apply=False) == 99
+
+
+@pytest.mark.asyncio
+async def test_warm_pool_opens_connections_up_to_pool_size(engine):
+    assert await warm_pool(engine, 3) == 3
+    assert engine.pool.checkedin() == 3
+    assert await warm_pool(engine, 100) == engine.pool.size()
+
+
+def test_app_import_does_not_load_broker_http_or_hashing_clients():
+    code = "import sys, app.main; print(sorted(m for m in ('aio_pika', 'httpx', 'passlib') if m in sys.modules))"
+    env = {**os.environ, "ENV": "testing"}
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, env=env, cwd=root, check=True
+    )
+    assert result.stdout.strip() == "[]"
@@ -0,0 +1,301 @@
+import asyncio
+import json
+from collections import deque
+import aio_pika
+import pytest
+import pytest_asyncio
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from app import models, worker as worker_module
+from app.worker import DEAD_LETTER_QUEUE, RETRY_HEADER, OrderWorker, retry_count
+
+pytest.importorskip("aiosqlite")
+
+
+class FakeMessage:
+    def __init__(self, queue, body: bytes, headers=None):
+        self.queue = queue
+        self.body = body
+        self.content_type = "application/json"
+        self.headers = headers or {}
+        self.redelivered = False
+        self.processed = False
+
+    async def ack(self):
+        assert not self.processed
+        self.processed = True
+        self.queue.settle(self)
+        self.queue.acked += 1
+
+    async def nack(self, requeue=True):
+        assert not self.processed
+        self.processed = True
+        self.queue.settle(self)
+        if requeue:
+            # Como aio_pika: la reentrega es un mensaje nuevo
+            redelivery = FakeMessage(self.queue, self.body, self.headers)
+            redelivery.redelivered = True
+            self.queue.messages.appendleft(redelivery)
+            self.queue.ready.set()
+
+
+class FakeQueue:
+    """Cola en memoria que respeta el prefetch: no entrega más de `prefetch` mensajes sin ack."""
+
+    def __init__(self, name, channel):
+        self.name = name
+        self.channel = channel
+        self.messages: deque[FakeMessage] = deque()
+        self.unacked = 0
+        self.max_unacked = 0
+        self.acked = 0
+        self.ready = asyncio.Event()
+        self._consumer: asyncio.Task | None = None
+
+    def put(self, message):
+        self.messages.append(message)
+        self.ready.set()
+
+    def settle(self, message):
+        self.unacked -= 1
+        self.ready.set()
+
+    async def consume(self, callback):
+        self._consumer = asyncio.create_task(self._deliver(callback))
+        return "ctag"
+
+    async def _deliver(self, callback):
+        while True:
+            while not self.messages or self.unacked >= self.channel.prefetch:
+                self.ready.clear()
+                await self.ready.wait()
+            self.unacked += 1
+            self.max_unacked = max(self.max_unacked, self.unacked)
+            await callback(self.messages.popleft())
+
+    async def cancel(self, tag):
+        self._consumer.cancel()
+
+
+class FakeBroker:
+    def __init__(self):
+        self.queues: dict[str, FakeQueue] = {}
+        self.prefetch = 0
+        self.default_exchange = self
+
+    def publish_json(self, payload):
+        queue = self.queues.setdefault("orders", FakeQueue("orders", self))
+        body = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+        queue.put(FakeMessage(queue, body))
+
+    # Conexión y canal de aio_pika
+    async def connect_robust(self, url):
+        return self
+
+    async def channel(self, publisher_confirms=True):
+        return self
+
+    async def set_qos(self, prefetch_count):
+        self.prefetch = prefetch_count
+
+    async def declare_queue(self, name, durable=False):
+        return self.queues.setdefault(name, FakeQueue(name, self))
+
+    async def publish(self, message, routing_key):
+        queue = self.queues[routing_key]
+        queue.put(FakeMessage(queue, message.body, message.headers))
+
+    async def close(self):
+        pass
+
+
+@pytest.fixture
+def broker(monkeypatch):
+    fake = FakeBroker()
+    monkeypatch.setattr(aio_pika, "connect_robust", fake.connect_robust)
+    return fake
+
+
+@pytest_asyncio.fixture
+async def session_factory(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/worker.db")
+    async with engine.begin() as conn:
+        await conn.run_sync(models.Base.metadata.create_all)
+    yield sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    await engine.dispose()
+
+
+async def _create_orders(session_factory, count):
+    async with session_factory() as db:
+        await db.execute(insert(models.Order), [{"id": i, "customer_id": 1} for i in range(1, count + 1)])
+        await db.commit()
+
+
+async def _statuses(session_factory):
+    async with session_factory() as db:
+        result = await db.execute(select(models.Order.status, models.Order.id))
+        return {id: status for status, id in result.all()}
+
+
+async def _drain(broker, timeout=5):
+    async def settled():
+        orders = broker.queues["orders"]
+        while orders.messages or orders.unacked:
+            await asyncio.sleep(0.005)
+    await asyncio.wait_for(settled(), timeout)
+
+
+@pytest.mark.asyncio
+async def test_worker_confirms_orders_in_batches_within_prefetch(broker, session_factory):
+    await _create_orders(session_factory, 600)
+    broker.publish_json({"order_id": 1})  # Reentrega: confirmar dos veces no cambia nada
+    for i in range(1, 601):
+        broker.publish_json({"order_id": i, "customer_id": 1, "items": []})
+
+    worker = OrderWorker("amqp://fake/", session_factory, prefetch=100, concurrency=2, batch_size=50)
+    await worker.start()
+    await _drain(broker)
+    await worker.stop(timeout=1)
+
+    assert set((await _statuses(session_factory)).values()) == {models.ORDER_CONFIRMED}
+    assert worker.processed == broker.queues["orders"].acked == 601
+    # Un UPDATE y un commit por lote, no por mensaje
+    assert worker.batches <= 601 // 25
+    assert broker.queues["orders"].max_unacked <= 100
+    assert worker.dead_lettered == 0
+
+
+@pytest.mark.asyncio
+async def test_poison_messages_go_to_dead_letter_queue(broker, session_factory):
+    await _create_orders(session_factory, 1)
+    broker.publish_json(b"no es json")
+    broker.publish_json({"order_id": "1"})
+    broker.publish_json({"order_id": 999})
+    broker.publish_json({"order_id": 2**31})  # No entra en orders.id: haría fallar todo el lote
+    broker.publish_json({"order_id": 1})
+
+    worker = OrderWorker("amqp://fake/", session_factory, batch_size=10)
+    await worker.start()
+    await _drain(broker)
+    await worker.stop(timeout=1)
+
+    dead = broker.queues[DEAD_LETTER_QUEUE].messages
+    assert sorted(m.headers["x-error"] for m in dead) == [
+        "invalid_json", "invalid_order_id", "invalid_order_id", "unknown_order",
+    ]
+    assert dead[0].body == b"no es json" and dead[0].headers["x-original-queue"] == "orders"
+    assert broker.queues["orders"].acked == 5 and worker.dead_lettered == 4
+    assert (await _statuses(session_factory)) == {1: models.ORDER_CONFIRMED}
+
+
+@pytest.mark.asyncio
+async def test_failed_commit_is_retried_by_halves(broker, session_factory, monkeypatch):
+    await _create_orders(session_factory, 3)
+    for i in (1, 2, 3):
+        broker.publish_json({"order_id": i})
+    real_confirm = worker_module.confirm_orders
+    calls = []
+
+    async def flaky_confirm(db, order_ids):
+        calls.append(list(order_ids))
+        if len(calls) == 1:
+            raise RuntimeError("base caída")
+        return await real_confirm(db, order_ids)
+
+    monkeypatch.setattr(worker_module, "confirm_orders", flaky_confirm)
+    worker = OrderWorker("amqp://fake/", session_factory, batch_size=10, retry_delay=0)
+    await worker.start()
+    await _drain(broker)
+    await worker.stop(timeout=1)
+
+    # El lote que falló se reintentó en partes más chicas y se confirmó sin ir a la cola de muertos
+    assert len(calls) >= 2 and sorted(id for ids in calls[1:] for id in ids) == [1, 2, 3]
+    assert worker.processed == 3 and worker.dead_lettered == 0
+    assert broker.queues["orders"].unacked == 0
+    assert set((await _statuses(session_factory)).values()) == {models.ORDER_CONFIRMED}
+
+
+@pytest.mark.asyncio
+async def test_message_that_keeps_failing_is_dead_lettered_after_max_retries(broker, session_factory, monkeypatch):
+    await _create_orders(session_factory, 3)
+    for i in (1, 2, 3):
+        broker.publish_json({"order_id": i})
+    real_confirm = worker_module.confirm_orders
+
+    async def rejects_order_2(db, order_ids):
+        if 2 in order_ids:
+            raise RuntimeError("la base rechaza el pedido 2")
+        return await real_confirm(db, order_ids)
+
+    monkeypatch.setattr(worker_module, "confirm_orders", rejects_order_2)
+    worker = OrderWorker("amqp://fake/", session_factory, batch_size=10, retry_delay=0, max_retries=2)
+    await worker.start()
+    await _drain(broker)
+    await worker.stop(timeout=1)
+
+    # Solo el mensaje que falla solo se reintenta y termina en la cola de muertos
+    dead = broker.queues[DEAD_LETTER_QUEUE].messages
+    assert len(dead) == 1 and json.loads(dead[0].body) == {"order_id": 2}
+    assert dead[0].headers["x-error"] == "max_retries" and dead[0].headers[RETRY_HEADER] == 2
+    assert worker.processed == 2 and worker.retried == 2 and worker.dead_lettered == 1
+    assert broker.queues["orders"].unacked == 0
+    assert (await _statuses(session_factory)) == {
+        1: models.ORDER_CONFIRMED, 2: models.ORDER_PENDING, 3: models.ORDER_CONFIRMED,
+    }
+
+
+def test_retry_count_uses_header_or_redelivered():
+    message = FakeMessage(None, b"{}")
+    assert retry_count(message) == 0
+    message.redelivered = True
+    assert retry_count(message) == 1
+    message.headers = {RETRY_HEADER: 3}
+    assert retry_count(message) == 3
+
+
+@pytest.mark.asyncio
+async def test_failed_dead_letter_publish_requeues_unsettled_messages(broker, session_factory, monkeypatch):
+    await _create_orders(session_factory, 2)
+    broker.publish_json(b"no es json")
+    broker.publish_json({"order_id": 1})
+    broker.publish_json({"order_id": 2})
+    real_publish = broker.publish
+    attempts = []
+
+    async def unconfirmed_once(message, routing_key):
+        attempts.append(routing_key)
+        if len(attempts) == 1:
+            raise RuntimeError("publish sin confirmar")
+        await real_publish(message, routing_key)
+
+    monkeypatch.setattr(broker, "publish", unconfirmed_once)
+    worker = OrderWorker("amqp://fake/", session_factory, prefetch=3, batch_size=10, retry_delay=0)
+    await worker.start()
+    await _drain(broker)
+    await worker.stop(timeout=1)
+
+    # Ningún mensaje quedó sin resolver ocupando el prefetch: se reintentaron y se procesaron
+    orders = broker.queues["orders"]
+    assert orders.unacked == 0 and not orders.messages
+    assert attempts.count(DEAD_LETTER_QUEUE) == 2 and len(broker.queues[DEAD_LETTER_QUEUE].messages) == 1
+    assert worker.processed == 2 and worker.dead_lettered == 1
+    assert set((await _statuses(session_factory)).values()) == {models.ORDER_CONFIRMED}
+
+
+@pytest.mark.asyncio
+async def test_stop_finishes_delivered_batches_and_leaves_the_rest_queued(broker, session_factory):
+    await _create_orders(session_factory, 50)
+    for i in range(1, 51):
+        broker.publish_json({"order_id": i})
+
+    worker = OrderWorker("amqp://fake/", session_factory, prefetch=10, concurrency=1, batch_size=5)
+    await worker.start()
+    await asyncio.sleep(0)
+    await worker.stop(timeout=1)
+
+    orders = broker.queues["orders"]
+    assert orders.unacked == 0
+    assert orders.acked + len(orders.messages) == 50 and orders.acked >= 1
+    confirmed = [id for id, status in (await _statuses(session_factory)).items() if status == models.ORDER_CONFIRMED]
+    assert len(confirmed) == orders.acked